@@ -0,0 +1,251 @@
+"""
+Per-stage and end-to-end benchmarks for the pipeline, runnable in mock mode on any CPU.
+
+    python benchmarks/bench_pipeline.py --output bench.json
+    python benchmarks/bench_pipeline.py --baseline benchmarks/baseline.json --threshold 0.2
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import platform
+import tempfile
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.detection.detector import ObjectDetector
+from src.segmentation.segmenter import VideoSegmenter
+from src.clustering.identifier import VisualIdentifier
+from src.events.analyzer import EventAnalyzer
+from src.visualization.drawer import PipelineVisualizer
+from src.pipeline.engine import Pipeline
+from src.pipeline.crops import CropPool
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "4k": (3840, 2160)}
+
+
+def parse_resolution(name: str) -> tuple:
+    """
+    Accepts a preset name (720p, 1080p, 4k) or WIDTHxHEIGHT.
+    """
+    if name.lower() in RESOLUTIONS:
+        return RESOLUTIONS[name.lower()]
+    width, height = name.lower().split("x")
+    return int(width), int(height)
+
+
+def synthetic_detections(num_objects: int, width: int, height: int, seed: int = 0) -> list:
+    """
+    Deterministic person-sized boxes spread over the frame.
+    """
+    rng = np.random.default_rng(seed)
+    box_w = max(width // 20, 2)
+    box_h = max(height // 8, 2)
+    xs = rng.integers(0, width - box_w, num_objects)
+    ys = rng.integers(0, height - box_h, num_objects)
+    return [
+        {"bbox": [int(x), int(y), int(x) + box_w, int(y) + box_h], "label": "person", "score": 0.9, "class_id": 0}
+        for x, y in zip(xs, ys)
+    ]
+
+
+def time_call(fn, repeats: int, warmup: int = 1) -> dict:
+    """
+    Runs `fn` `warmup + repeats` times and summarizes the timed runs in milliseconds.
+    """
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples[i] = (time.perf_counter() - start) * 1000.0
+    return {
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "repeats": repeats
+    }
+
+
+def bench_stages(width: int, height: int, num_objects: int, repeats: int) -> dict:
+    """
+    Times every stage in isolation on one synthetic frame with `num_objects` tracks.
+    """
+    frame = np.random.default_rng(0).integers(0, 50, (height, width, 3), dtype=np.uint8)
+    detections = synthetic_detections(num_objects, width, height)
+
+    detector = ObjectDetector()
+    segmenter = VideoSegmenter()
+    identifier = VisualIdentifier()
+    visualizer = PipelineVisualizer()
+
+    tracks = segmenter.track_objects(0, frame, detections)
+    bboxes = [t['bbox'] for t in tracks]
+    pool = CropPool()
+    crops = pool.batch(frame, bboxes).extract()
+    embeddings = identifier.extract_embeddings(crops)
+
+    def extract_crops():
+        batch = pool.batch(frame, bboxes)
+        batch.extract()
+        batch.release()
+
+    # The analyzer is stateful: keep stepping frame indices so its rules see history
+    analyzer = EventAnalyzer()
+    frame_counter = iter(range(10 ** 9))
+
+    results = {
+        "detect": time_call(lambda: detector.detect(frame), repeats),
+        "track_objects": time_call(lambda: segmenter.track_objects(0, frame, detections), repeats),
+        "extract_crops": time_call(extract_crops, repeats),
+        "extract_embeddings": time_call(lambda: identifier.extract_embeddings(crops), repeats),
+        "cluster_embeddings": time_call(lambda: identifier.cluster_embeddings(embeddings), repeats),
+        "events_update": time_call(lambda: analyzer.update(tracks, next(frame_counter)), repeats),
+        "draw": time_call(lambda: visualizer.draw(frame, tracks, []), repeats),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = cv2.VideoWriter(os.path.join(tmp, "bench.mp4"), cv2.VideoWriter_fourcc(*"mp4v"), 30, (width, height))
+        try:
+            results["encode"] = time_call(lambda: writer.write(frame), repeats)
+        finally:
+            writer.release()
+    return results
+
+
+class _FixedDetector:
+    """Mock detector returning the same synthetic boxes every frame"""
+
+    def __init__(self, detections: list):
+        self.detections = detections
+
+    def detect(self, frame):
+        return [dict(d) for d in self.detections]
+
+
+def bench_end_to_end(width: int, height: int, num_objects: int, num_frames: int) -> dict:
+    """
+    Runs the full threaded pipeline (including encoding) over `num_frames` frames.
+    """
+    from src.pipeline.stages import build_stages
+    from src.ocr.reader import SceneTextReader
+
+    frame = np.random.default_rng(0).integers(0, 50, (height, width, 3), dtype=np.uint8)
+    stages = build_stages(
+        _FixedDetector(synthetic_detections(num_objects, width, height)),
+        VideoSegmenter(), VisualIdentifier(online_clustering=True), SceneTextReader(),
+        EventAnalyzer(), PipelineVisualizer()
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = cv2.VideoWriter(os.path.join(tmp, "bench.mp4"), cv2.VideoWriter_fourcc(*"mp4v"), 30, (width, height))
+        try:
+            start = time.perf_counter()
+            processed = Pipeline(stages).run((frame for _ in range(num_frames)), lambda ctx: writer.write(ctx["out_frame"]))
+            elapsed = time.perf_counter() - start
+        finally:
+            writer.release()
+
+    return {
+        "frames": processed,
+        "fps": processed / elapsed,
+        "mean_ms": elapsed * 1000.0 / max(processed, 1)
+    }
+
+
+def run_benchmarks(resolutions: list, object_counts: list, repeats: int = 20, num_frames: int = 30) -> dict:
+    """
+    Benchmarks every (resolution, object count) combination.
+
+    Returns:
+        {"meta": {...}, "results": {"<res>/<n>obj/<stage>": {"mean_ms", "p50_ms", ...}}}
+    """
+    results = {}
+    for name in resolutions:
+        width, height = parse_resolution(name)
+        for num_objects in object_counts:
+            prefix = f"{name}/{num_objects}obj"
+            for stage, stats in bench_stages(width, height, num_objects, repeats).items():
+                results[f"{prefix}/{stage}"] = stats
+            if num_frames > 0:
+                results[f"{prefix}/end_to_end"] = bench_end_to_end(width, height, num_objects, num_frames)
+
+    meta = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare_results(current: dict, baseline: dict, threshold: float = 0.2, metric: str = "p50_ms") -> list:
+    """
+    Lists benchmarks slower than the baseline by more than `threshold` (0.2 = 20%).
+    Falls back to "mean_ms" for entries without `metric` (e.g. end-to-end runs).
+    """
+    regressions = []
+    for key, stats in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            continue
+        name = metric if metric in stats and metric in base else "mean_ms"
+        if base[name] <= 0:
+            continue
+        ratio = stats[name] / base[name]
+        if ratio > 1.0 + threshold:
+            regressions.append({"benchmark": key, "metric": name, "baseline": base[name],
+                                "current": stats[name], "ratio": ratio})
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="AI Vision Pipeline benchmarks")
+    parser.add_argument("--resolutions", nargs="+", default=["720p", "1080p", "4k"], help="Presets or WIDTHxHEIGHT")
+    parser.add_argument("--objects", nargs="+", type=int, default=[2, 20, 100], help="Objects per frame")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed runs per stage")
+    parser.add_argument("--frames", type=int, default=30, help="Frames per end-to-end run (0 to skip)")
+    parser.add_argument("--output", type=str, default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", type=str, default=None, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before failing (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite --baseline with these results")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logger = logging.getLogger("Benchmarks")
+
+    report = run_benchmarks(args.resolutions, args.objects, args.repeats, args.frames)
+    for key, stats in report["results"].items():
+        extra = f"  ({stats['fps']:.1f} fps)" if "fps" in stats else ""
+        print(f"{key:40s} {stats['mean_ms']:9.2f} ms{extra}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.warning(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['benchmark']}: {r['metric']} {r['baseline']:.2f} -> {r['current']:.2f} ({r['ratio']:.2f}x)")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
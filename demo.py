@@ -3,20 +3,32 @@ import os
 import sys
 import argparse
 import logging
-import cv2
 import numpy as np
-from tqdm import tqdm
 
 # Ensure src is in path
 sys.path.append(os.path.join(os.path.dirname(__file__), "."))
 
 from src.detection.detector import ObjectDetector
+from src.detection.batching import MicroBatcher
+from src.detection.keyframes import KeyframeScheduler
 from src.segmentation.segmenter import VideoSegmenter
 from src.clustering.identifier import VisualIdentifier
+from src.clustering.cache import EmbeddingCache
 from src.ocr.reader import SceneTextReader
+from src.ocr.service import OCRService
 from src.homography.transformer import PerspectiveTransformer
 from src.events.analyzer import EventAnalyzer
 from src.visualization.drawer import PipelineVisualizer
+from src.pipeline.engine import Pipeline
+from src.pipeline.metrics import PipelineMetrics, MetricsReporter
+from src.pipeline.stages import build_stages, build_graph, resolve_stages, STAGE_DEPENDENCIES
+from src.pipeline.graph import load_stage_graph
+from src.pipeline.result_cache import StageResultCache, video_fingerprint, config_hash, module_config
+from src.export.columnar import ColumnarWriter
+from src.export.trajectories import TrajectoryWriter
+from src.pipeline.video_io import read_video, mock_frames, video_fps, LiveSource, VideoWriterSink
+from src.pipeline.shared_frames import SharedFrameSource
+from src.pipeline.synthetic import SyntheticScene, SyntheticDetector
 
 def setup_logging():
     logging.basicConfig(
@@ -33,6 +45,34 @@ def main():
     parser.add_argument("--mock", action="store_true", default=True, help="Use mock weights (default True for portfolio demo)")
     parser.add_argument("--output_path", type=str, default="output.mp4", help="Path to save processed video")
     parser.add_argument("--max_frames", type=int, default=50, help="Maximum frames to process (default 50 for quick demo)")
+    parser.add_argument("--queue_size", type=int, default=8, help="Capacity of the queues between pipeline stages")
+    parser.add_argument("--render_workers", type=int, default=2, help="Threads used to annotate frames")
+    parser.add_argument("--detect_batch_size", type=int, default=1, help="Frames per detector call (1 disables micro-batching)")
+    parser.add_argument("--detect_max_wait_ms", type=float, default=10.0, help="Longest a frame waits for its detection batch to fill")
+    parser.add_argument("--synthetic_objects", type=int, default=0, help="Without a video, render a seeded synthetic scene with this many moving objects (1-1000) and detect them from ground truth")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic scene")
+    parser.add_argument("--keyframe_interval", type=int, default=1, help="Run detection every K frames and propagate tracks in between (1 detects every frame)")
+    parser.add_argument("--latency_budget_ms", type=float, default=None, help="Adapt the keyframe interval to keep per-frame detect+track latency under this budget")
+    parser.add_argument("--motion_threshold", type=float, default=None, help="Force a keyframe when the scene changes by more than this mean grey-level difference")
+    parser.add_argument("--embed_refresh", type=int, default=30, help="Frames before a cached track embedding is recomputed")
+    parser.add_argument("--minimap", action="store_true", help="Overlay the top-down map view on the output video")
+    parser.add_argument("--realtime", action="store_true", help="Replay the source at its native frame rate, keeping only the freshest frame")
+    parser.add_argument("--decode_process", action="store_true", help="Decode the video in a separate process into shared-memory frame slots (not with --realtime)")
+    parser.add_argument("--deadline_ms", type=float, default=None, help="In real-time mode, drop frames older than this before they finish")
+    parser.add_argument("--stages", type=str, default=",".join(STAGE_DEPENDENCIES),
+                        help="Comma-separated stages to run (dependencies are added); models of other stages are never built")
+    parser.add_argument("--stage_graph", type=str, default=None,
+                        help="YAML stage graph (dependencies, rates, parallel branches), e.g. configs/stage_graph.yaml")
+    parser.add_argument("--cache_dir", type=str, default=None,
+                        help="Cache detection, tracking, embedding and OCR results here and replay them on re-runs")
+    parser.add_argument("--headless", action="store_true", help="Skip rendering and video encoding (use with --export_dir)")
+    parser.add_argument("--export_dir", type=str, default=None, help="Stream tracks and events to chunked .npz files in this directory")
+    parser.add_argument("--trajectory_dir", type=str, default=None, help="Append every track position to a memory-mapped trajectory store in this directory")
+    parser.add_argument("--export_masks", action="store_true", help="Include run-length encoded masks in the export")
+    parser.add_argument("--metrics_path", type=str, default=None, help="Export per-stage metrics to this file")
+    parser.add_argument("--metrics_format", type=str, default="prometheus", choices=["prometheus", "jsonl"], help="Metrics export format")
+    parser.add_argument("--metrics_interval", type=float, default=10.0, help="Seconds between metrics exports")
+    parser.add_argument("--trace_allocations", action="store_true", help="Record approximate per-stage Python allocations (tracemalloc, slower)")
     parser.add_argument("--debug", action="store_true", help="Enable debug mode with verbose logging")
     
     args = parser.parse_args()
@@ -40,116 +80,195 @@ def main():
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
 
-    # Initialize Modules
-    logger.info("Initializing Pipeline Modules...")
+    requested = [name.strip() for name in args.stages.split(",") if name.strip()]
+    if args.minimap:
+        requested.append("homography")
+    if args.export_dir or args.trajectory_dir or args.keyframe_interval > 1 or args.latency_budget_ms is not None:
+        requested.append("track")
+    try:
+        enabled = resolve_stages(requested)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Initialize Modules (only those of enabled stages; models load on first use)
+    logger.info(f"Initializing Pipeline Modules for stages: {', '.join(sorted(enabled))}...")
     
-    detector = ObjectDetector()
-    segmenter = VideoSegmenter()
-    identifier = VisualIdentifier()
-    reader = SceneTextReader()
+    detector = ObjectDetector(lazy=True)
+    segmenter = VideoSegmenter(lazy=True) if "track" in enabled else None
+    identifier = None
+    if "cluster" in enabled:
+        identifier = VisualIdentifier(online_clustering=True, cache=EmbeddingCache(refresh_interval=args.embed_refresh),
+                                      lazy=True)
+    reader = SceneTextReader(lazy=True) if "ocr" in enabled else None
+    ocr_service = OCRService(reader) if reader else None
     # Mock points for homography: src (video quadrilateral), dst (top-down rect)
     transformer = PerspectiveTransformer(
         src_points=np.array([[0,0], [1280,0], [1280,720], [0,720]], dtype=np.float32), 
         dst_points=np.array([[0,0], [100,0], [100,200], [0,200]], dtype=np.float32)
     )
-    analyzer = EventAnalyzer()
-    visualizer = PipelineVisualizer()
+    # Proximity rules run in map units (the mock map is 100 x 200)
+    analyzer = EventAnalyzer(transformer=transformer, proximity_distance=5.0, crowd_radius=10.0) if "events" in enabled else None
+    visualizer = None
+    if "visualize" in enabled and not args.headless:
+        visualizer = PipelineVisualizer(in_place=True)  # frames are not reused after rendering
 
     # Video Source
+    fps = 30.0
+    video_key = None  # identifies the frames for the stage result cache
+    run_name = "mock"  # labels this run in the trajectory store
     if args.video_path and os.path.exists(args.video_path):
-        cap = cv2.VideoCapture(args.video_path)
+        run_name = args.video_path
+        if args.decode_process and not args.realtime:
+            # Frames stay in shared memory until the sink releases them; the slots bound the frames in flight
+            source = SharedFrameSource(args.video_path, num_slots=max(16, 2 * args.queue_size))
+        else:
+            source = read_video(args.video_path)
+        fps = video_fps(args.video_path)
+        if args.cache_dir:
+            video_key = video_fingerprint(args.video_path)
+    elif args.synthetic_objects:
+        logger.info(f"Using synthetic scene with {args.synthetic_objects} objects (seed {args.seed}).")
+        scene = SyntheticScene(args.synthetic_objects, num_frames=args.max_frames, seed=args.seed)
+        detector = SyntheticDetector(scene)
+        video_key = run_name = "synthetic-" + config_hash(module_config(scene))
+        # Frames carry their index in a timecode pixel, so a live replay only needs the images
+        source = scene.frames() if not args.realtime else (item["frame"] for item in scene.frames())
     else:
         logger.warning("No video provided or file not found. Using Mock Video Stream (Black Frames).")
-        cap = None
+        source = mock_frames(args.max_frames)  # Use max_frames parameter
+    frame_source = source if isinstance(source, SharedFrameSource) else None
+    if args.decode_process and frame_source is None:
+        logger.warning("--decode_process needs a video file and no --realtime; decoding in the pipeline.")
 
-    # Video Writer
-    writer = None
-    
-    # Processing Loop
-    logger.info("Starting Processing Loop...")
-    
-    frame_idx = 0
-    while True:
-        if cap:
-            ret, frame = cap.read()
-            if not ret:
-                break
-        else:
-            # Generate dummy frame
-            frame = np.zeros((720, 1280, 3), dtype=np.uint8)
-            # Add noise to make it look alive
-            noise = np.random.randint(0, 50, (720, 1280, 3), dtype=np.uint8)
-            frame = cv2.addWeighted(frame, 0.8, noise, 0.2, 0)
-            if frame_idx >= args.max_frames: # Use max_frames parameter
-                break
-        
-        # Initialize Writer once we know frame size
-        if writer is None:
-            h, w = frame.shape[:2]
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v') # Be careful with codecs
-            writer = cv2.VideoWriter(args.output_path, fourcc, 30, (w, h))
-
-        # 1. Detection
-        detections = detector.detect(frame)
-        
-        # 2. Segmentation & Tracking
-        tracks = segmenter.track_objects(frame_idx, frame, detections)
-        
-        # 3. Clustering (Extract embeddings for tracks)
-        crops = []
-        for t in tracks:
-            bbox = t['bbox']
-            # Crop logic
-            if bbox[3] > bbox[1] and bbox[2] > bbox[0]:
-                crop = frame[bbox[1]:bbox[3], bbox[0]:bbox[2]]
-                if crop.size > 0:
-                    crops.append(crop)
-                else:
-                    crops.append(np.zeros((10, 10, 3), dtype=np.uint8))
-            else:
-                 crops.append(np.zeros((10, 10, 3), dtype=np.uint8))
-        
-        embeddings = identifier.extract_embeddings(crops)
-        cluster_labels = identifier.cluster_embeddings(embeddings)
-        
-        # updates tracks with cluster info
-        for i, t in enumerate(tracks):
-            if i < len(cluster_labels):
-                t['cluster_id'] = int(cluster_labels[i])
-                
-        # 4. OCR (On demand, e.g. every 30 frames or if missing)
-        if frame_idx % 30 == 0:
-            for t in tracks:
-                # Mock crop read
-                bbox = t['bbox']
-                if bbox[3] > bbox[1] and bbox[2] > bbox[0]:
-                    crop = frame[bbox[1]:bbox[3], bbox[0]:bbox[2]]
-                    text = reader.read_text(crop)
-                    if text:
-                        t['ocr_text'] = text
-        
-        # 5. Events
-        events = analyzer.update(tracks, frame_idx)
-        
-        # 6. Visualization
-        out_frame = visualizer.draw(frame, tracks, events)
-        
-        # Write Frame
-        if writer:
-            writer.write(out_frame)
+    if args.headless and not args.export_dir:
+        logger.warning("Headless mode without --export_dir: results are only logged.")
 
+    # Video Writer (opened once the frame size is known)
+    writer = VideoWriterSink(args.output_path, fps=30) if visualizer else None
+    exporter = ColumnarWriter(args.export_dir, include_masks=args.export_masks) if args.export_dir else None
+    trajectories = TrajectoryWriter(args.trajectory_dir, run_name=run_name) if args.trajectory_dir else None
+
+    def sink(ctx):
+        if writer:
+            writer(ctx)
+        if exporter:
+            exporter(ctx)
+        if trajectories is not None:
+            trajectories(ctx)
+        if frame_source is not None:
+            frame_source.release(ctx)  # the frame's slot may be rewritten from here on
         # Show/Save logic
         # For this demo script, we just log progress
-        if frame_idx % 10 == 0:
-            logger.info(f"Frame {frame_idx}: Processed {len(tracks)} objects. Events: {len(events)}")
+        if ctx["frame_idx"] % 10 == 0:
+            objects = ctx.get("tracks", ctx["detections"] or [])
+            logger.info(f"Frame {ctx['frame_idx']}: Processed {len(objects)} objects. Events: {len(ctx.get('events', []))}")
 
-        frame_idx += 1
+    batcher = None
+    if args.detect_batch_size > 1:
+        batcher = MicroBatcher(detector, max_batch_size=args.detect_batch_size, max_wait_ms=args.detect_max_wait_ms)
+
+    keyframes = None
+    if args.keyframe_interval > 1 or args.latency_budget_ms is not None:
+        keyframes = KeyframeScheduler(interval=args.keyframe_interval, latency_budget_ms=args.latency_budget_ms,
+                                      motion_threshold=args.motion_threshold)
+
+    metrics = None
+    reporter = None
+    if args.metrics_path or args.realtime:
+        metrics = PipelineMetrics(trace_allocations=args.trace_allocations)
+
+    result_cache = None
+    cache_configs = None
+    if args.cache_dir and (video_key is None or args.realtime):
+        logger.warning("--cache_dir needs a video file or synthetic scene and no --realtime; caching disabled.")
+    elif args.cache_dir:
+        result_cache = StageResultCache(args.cache_dir, video_key)
+        # Settings each stage's output depends on (upstream stages are chained in automatically)
+        cache_configs = {
+            "detect": module_config(detector, keyframes),
+            "track": module_config(segmenter),
+            "cluster": module_config(identifier, identifier.online if identifier else None),
+            "ocr": dict(module_config(reader), async_service=ocr_service is not None),
+        }
+
+    graph_config = load_stage_graph(args.stage_graph) if args.stage_graph else None
+    stages = build_stages(batcher or detector, segmenter, identifier, reader, analyzer, visualizer,
+                          render_workers=args.render_workers, detect_workers=args.detect_batch_size,
+                          ocr_service=ocr_service, transformer=transformer if "homography" in enabled else None,
+                          minimap_size=(100, 200) if args.minimap else None, keyframes=keyframes,
+                          graph=graph_config, result_cache=result_cache, cache_configs=cache_configs)
+    try:
+        graph = build_graph(stages, graph_config, metrics) if graph_config else None
+    except ValueError as e:
+        parser.error(f"{args.stage_graph}: {e}")
+    if graph is not None:
+        stages = graph.to_stages()
+    replay = result_cache.replay_source() if result_cache else None
+    if replay is not None:
+        logger.info("Every pixel stage is cached: replaying results without decoding the video.")
+        source = replay
+    logger.info(f"Stages: {' -> '.join(s.name for s in stages)}")
+    if args.metrics_path:
+        reporter = MetricsReporter(metrics, args.metrics_path, args.metrics_format, args.metrics_interval).start()
+
+    queue_size = max(args.queue_size, args.detect_batch_size)
+    if args.realtime:
+        # Live feed: frames arrive at the native rate and stale ones are dropped at the
+        # source, so keep the inter-stage queues as short as the detector batch allows
+        source = LiveSource(source, fps=fps, metrics=metrics)
+        queue_size = max(1, args.detect_batch_size)
+
+    pipeline = Pipeline(stages, queue_size=queue_size, metrics=metrics,
+                        deadline_ms=args.deadline_ms if args.realtime else None)
+
+    # Processing Loop
+    logger.info("Starting Processing Loop...")
+    try:
+        processed = pipeline.run(source, sink)
+        if result_cache:
+            result_cache.close()
+        if trajectories is not None:
+            logger.info(f"Stored run {trajectories.run} ({run_name}) in {args.trajectory_dir}, "
+                        f"{len(trajectories)} track positions in total")
+    except BaseException:
+        if result_cache:
+            result_cache.abort()
+        raise
+    finally:
+        if graph is not None:
+            graph.close()
+        if frame_source is not None:
+            frame_source.close()
+        if writer:
+            writer.close()
+        if exporter:
+            exporter.close()
+            logger.info(f"Exported {exporter.frames_written} frames in {len(exporter.chunks)} chunks to {args.export_dir}")
+        if trajectories is not None:
+            trajectories.close()
+        if reporter:
+            reporter.stop()
+        if ocr_service:
+            ocr_service.close()
+        if batcher:
+            batcher.close()
+            logger.info(f"Detector mean batch size: {batcher.mean_batch_size:.1f}")
 
-    logger.info("Processing Complete.")
-    if cap:
-        cap.release()
-    if writer:
-        writer.release()
+    if args.realtime:
+        e2e = metrics.snapshot()["stages"].get("end_to_end", {})
+        logger.info(f"Real-time: {source.dropped}/{source.captured} frames dropped at the source ({source.drop_rate:.1%}), "
+                    f"{metrics.counters.get('frames_late', 0)} past the deadline, "
+                    f"end-to-end p50 {e2e.get('p50_ms', 0.0):.1f} ms, p95 {e2e.get('p95_ms', 0.0):.1f} ms")
+    if keyframes:
+        logger.info(f"Keyframes: {keyframes.keyframes}/{keyframes.frames} frames detected, final interval {keyframes.interval}")
+    if identifier:
+        logger.info(f"Embedding cache: {identifier.cache.stats()}")
+    if ocr_service:
+        logger.info(f"OCR: {ocr_service.queries} crops read in {ocr_service.batches} batches")
+    if metrics:
+        for name, stats in metrics.snapshot()["stages"].items():
+            logger.info(f"Stage {name}: p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
+    logger.info(f"Processing Complete. {processed} frames written.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,112 @@
+import logging
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+
+
+def bbox_iou(a, b) -> float:
+    """
+    Intersection over union of two xyxy boxes. Identical boxes always score 1.
+    """
+    if list(a) == list(b):
+        return 1.0
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class EmbeddingCache:
+    """
+    Track-id keyed store of running-average embeddings.
+    A track is re-embedded only when it is new, its bbox moved or resized substantially
+    (IoU below `iou_threshold`), or its embedding is older than `refresh_interval` frames.
+    Tracks unseen for `ttl_frames` are evicted, and the least recently used entries go
+    first when more than `max_entries` tracks are cached.
+    """
+    def __init__(self, refresh_interval: int = 30, iou_threshold: float = 0.5, momentum: float = 0.8,
+                 ttl_frames: int = 90, max_entries: int = 1024):
+        self.logger = logging.getLogger(__name__)
+        self.refresh_interval = refresh_interval
+        self.iou_threshold = iou_threshold
+        self.momentum = momentum
+        self.ttl_frames = ttl_frames
+        self.max_entries = max_entries
+
+        self.entries = OrderedDict()  # track_id -> {"embedding", "bbox", "refreshed", "seen"}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, track_id: int, bbox, frame_idx: int) -> Optional[np.ndarray]:
+        """
+        Returns the cached embedding if it is still valid for `bbox`, else None (a miss).
+        """
+        entry = self.entries.get(track_id)
+        if entry is not None:
+            entry["seen"] = frame_idx
+            self.entries.move_to_end(track_id)
+            if self.is_valid(track_id, bbox, frame_idx):
+                self.hits += 1
+                return entry["embedding"]
+        self.misses += 1
+        return None
+
+    def is_valid(self, track_id: int, bbox, frame_idx: int) -> bool:
+        """
+        Whether `lookup` would hit, without touching the statistics or LRU order.
+        """
+        entry = self.entries.get(track_id)
+        return (entry is not None
+                and frame_idx - entry["refreshed"] < self.refresh_interval
+                and bbox_iou(entry["bbox"], bbox) >= self.iou_threshold)
+
+    def store(self, track_id: int, embedding: np.ndarray, bbox, frame_idx: int) -> np.ndarray:
+        """
+        Folds a freshly computed embedding into the track's running average.
+        """
+        entry = self.entries.get(track_id)
+        if entry is None:
+            entry = {"embedding": np.asarray(embedding, dtype=np.float32).copy()}
+            self.entries[track_id] = entry
+        else:
+            entry["embedding"] = self.momentum * entry["embedding"] + (1 - self.momentum) * embedding
+            self.entries.move_to_end(track_id)
+        entry["bbox"] = list(bbox)
+        entry["refreshed"] = frame_idx
+        entry["seen"] = frame_idx
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return entry["embedding"]
+
+    def evict(self, frame_idx: int) -> int:
+        """
+        Drops tracks not seen for more than `ttl_frames`. Returns how many were removed.
+        """
+        stale = [tid for tid, e in self.entries.items() if frame_idx - e["seen"] > self.ttl_frames]
+        for tid in stale:
+            del self.entries[tid]
+        self.evictions += len(stale)
+        return len(stale)
+
+    def clear(self):
+        """
+        Drops every entry, e.g. before a new video whose track ids start over.
+        """
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
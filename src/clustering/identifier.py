@@ -1,18 +1,25 @@
 
 import logging
 import numpy as np
-from sklearn.cluster import KMeans
+from src.clustering.online import OnlineKMeans
+from src.clustering.cache import EmbeddingCache
+from src.pipeline.crops import CropPool, CropBatch
+from src.pipeline.lazy import LazyModelMixin
 # import umap
 # from transformers import AutoProcessor, AutoModel
 # import torch
 
-class VisualIdentifier:
+class VisualIdentifier(LazyModelMixin):
     """
     Extracts visual embeddings from object crops and clusters them to identify groups
     (e.g., Team A vs Team B, or specific individuals).
     Uses SigLIP for embeddings and UMAP + KMeans for clustering.
+    With `lazy`, SigLIP is loaded on the first embedding call instead of here.
     """
-    def __init__(self, model_name: str = "google/siglip-base-patch16-224", device: str = "cuda"):
+    def __init__(self, model_name: str = "google/siglip-base-patch16-224", device: str = "cuda",
+                 online_clustering: bool = False, n_clusters: int = 2, warmup_samples: int = 64,
+                 n_components: int = None, update_interval: int = 10, cache: EmbeddingCache = None,
+                 lazy: bool = False):
         self.logger = logging.getLogger(__name__)
         self.device = device
         self.model_name = model_name
@@ -20,8 +27,33 @@ class VisualIdentifier:
         self.processor = None
         self.umap_reducer = None
         self.kmeans = None
+
+        # Optional per-track embedding cache used by embed_tracks
+        self.cache = cache
+        # Crops resized to the model input, when no shared CropBatch is passed in
+        self.crop_pool = CropPool(size=224)
+
+        # Persistent clustering model: fitted once after warm-up, then nearest-centroid
+        self.online = None
+        if online_clustering:
+            self.online = OnlineKMeans(
+                n_clusters=n_clusters,
+                warmup_samples=warmup_samples,
+                n_components=n_components,
+                update_interval=update_interval
+            )
         
-        self._load_model()
+        self._init_model(lazy)
+
+    def reset(self):
+        """
+        Forgets per-video state (cached embeddings and the online clustering model);
+        the embedding model itself stays loaded.
+        """
+        if self.cache is not None:
+            self.cache.clear()
+        if self.online is not None:
+            self.online.reset()
 
     def _load_model(self):
         self.logger.info(f"Loading embedding model: {self.model_name}...")
@@ -40,6 +72,7 @@ class VisualIdentifier:
         """
         if not crops:
             return np.array([])
+        self.ensure_loaded()
             
         if self.mock_mode:
             # Return random embeddings of size 768 (SigLIP base)
@@ -51,11 +84,56 @@ class VisualIdentifier:
         #     image_features = self.model.get_image_features(**inputs)
         # return image_features.cpu().numpy()
 
+    def embed_tracks(self, frame: np.ndarray, tracks: list, frame_idx: int, crops: CropBatch = None) -> np.ndarray:
+        """
+        Returns one embedding per track (N, D) from the track crops.
+        With a cache, only new, moved or stale tracks are cropped and embedded.
+        `crops` is the frame's shared `CropBatch` (aligned with `tracks`); without it
+        the crops are extracted here.
+        """
+        if not tracks:
+            return np.array([])
+
+        own_crops = crops is None
+        if own_crops:
+            crops = self.crop_pool.batch(frame, [t['bbox'] for t in tracks])
+        try:
+            if self.cache is None:
+                return self.extract_embeddings(crops.extract())
+
+            embeddings = [self.cache.lookup(t['id'], t['bbox'], frame_idx) for t in tracks]
+            misses = [i for i, e in enumerate(embeddings) if e is None]
+            if misses:
+                fresh = self.extract_embeddings(crops.extract(misses))
+                for i, embedding in zip(misses, fresh):
+                    embeddings[i] = self.cache.store(tracks[i]['id'], embedding, tracks[i]['bbox'], frame_idx)
+        finally:
+            if own_crops:
+                crops.release()
+
+        self.cache.evict(frame_idx)
+        return np.stack(embeddings)
+
+    def tracks_to_embed(self, tracks: list, frame_idx: int) -> list:
+        """
+        Indices of the tracks `embed_tracks` will need crops for in this frame.
+        """
+        if self.cache is None:
+            return list(range(len(tracks)))
+        return [i for i, t in enumerate(tracks) if not self.cache.is_valid(t['id'], t['bbox'], frame_idx)]
+
     def cluster_embeddings(self, embeddings: np.ndarray, n_clusters: int = 2) -> np.ndarray:
         """
         Clusters embeddings to assign group IDs (e.g. 0 or 1 for teams).
         Uses UMAP for dimensionality reduction before K-Means if embeddings are high-dim.
+        With online clustering enabled, labels come from the persistent model (and its
+        own `n_clusters`) as soon as its warm-up window is full.
         """
+        if self.online is not None:
+            labels = self.online.partial_fit_predict(embeddings)
+            if labels is not None:
+                return labels
+
         if len(embeddings) < n_clusters:
             return np.zeros(len(embeddings))
 
@@ -66,6 +144,7 @@ class VisualIdentifier:
         # else:
         #    reduced = embeddings
 
+        from sklearn.cluster import KMeans  # deferred: importing sklearn takes over a second
         self.kmeans = KMeans(n_clusters=n_clusters, n_init=10)
         labels = self.kmeans.fit_predict(embeddings)
         return labels
@@ -0,0 +1,130 @@
+import logging
+from typing import Optional
+import numpy as np
+
+
+class OnlineKMeans:
+    """
+    K-Means fitted once on a warm-up window, then used incrementally.
+    New embeddings are assigned to the nearest centroid (one matrix multiply) and the
+    centroids follow the data through periodic mini-batch updates. Label order is fixed
+    after warm-up, so group IDs do not flip between frames.
+    """
+    def __init__(self, n_clusters: int = 2, warmup_samples: int = 64, n_components: Optional[int] = None,
+                 update_interval: int = 10, random_state: int = 0):
+        """
+        Args:
+            n_clusters: Number of groups.
+            warmup_samples: Embeddings to collect before the initial fit.
+            n_components: If set, project embeddings to this many PCA components first.
+            update_interval: Calls to `partial_fit_predict` between centroid updates.
+            random_state: Seed for the initial K-Means fit.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.n_clusters = n_clusters
+        self.warmup_samples = max(warmup_samples, n_clusters)
+        self.n_components = n_components
+        self.update_interval = update_interval
+        self.random_state = random_state
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the fitted model; the next calls fill a new warm-up window.
+        """
+        self.centroids = None      # (K, D') in reduced space
+        self.counts = None         # samples absorbed per centroid
+        self.projection = None     # (D, D') PCA components, or None
+        self.mean = None           # (D,) PCA centering vector
+
+        self._warmup = []
+        self._warmup_size = 0
+        self._pending = []         # (reduced embeddings, labels) since last update
+        self._calls = 0
+
+    @property
+    def fitted(self) -> bool:
+        return self.centroids is not None
+
+    def partial_fit_predict(self, embeddings: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Assigns labels to `embeddings` and schedules them for the next centroid update.
+        Returns None while the warm-up window is still being filled.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if not self.fitted:
+            if len(embeddings):
+                self._warmup.append(embeddings)
+                self._warmup_size += len(embeddings)
+            if self._warmup_size < self.warmup_samples:
+                return None
+            self._fit(np.concatenate(self._warmup))
+            self._warmup = []
+
+        if len(embeddings) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        reduced = self._reduce(embeddings)
+        labels = self._assign(reduced)
+
+        self._pending.append((reduced, labels))
+        self._calls += 1
+        if self._calls % self.update_interval == 0:
+            self._update()
+        return labels
+
+    def predict(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Nearest-centroid labels without updating the model.
+        """
+        if not self.fitted:
+            raise RuntimeError("OnlineKMeans has not finished its warm-up")
+        return self._assign(self._reduce(np.asarray(embeddings, dtype=np.float32)))
+
+    def _fit(self, samples: np.ndarray):
+        # sklearn is only needed once, at the end of the warm-up; importing it takes over a second
+        from sklearn.cluster import KMeans
+        from sklearn.decomposition import PCA
+
+        if self.n_components and self.n_components < samples.shape[1]:
+            pca = PCA(n_components=self.n_components, random_state=self.random_state).fit(samples)
+            self.mean = pca.mean_.astype(np.float32)
+            self.projection = pca.components_.T.astype(np.float32)
+
+        reduced = self._reduce(samples)
+        kmeans = KMeans(n_clusters=self.n_clusters, n_init=10, random_state=self.random_state)
+        labels = kmeans.fit_predict(reduced)
+
+        # Canonical label order: sort centroids lexicographically by coordinates
+        order = np.lexsort(kmeans.cluster_centers_.T[::-1])
+        self.centroids = kmeans.cluster_centers_[order].astype(np.float32)
+        self.counts = np.bincount(labels, minlength=self.n_clusters)[order].astype(np.float64)
+        self.logger.info(f"Online clustering fitted on {len(samples)} warm-up embeddings.")
+
+    def _reduce(self, embeddings: np.ndarray) -> np.ndarray:
+        if self.projection is None:
+            return embeddings
+        return (embeddings - self.mean) @ self.projection
+
+    def _assign(self, reduced: np.ndarray) -> np.ndarray:
+        # argmin ||x - c||^2 == argmin (||c||^2 - 2 x.c); ||x||^2 is constant per row
+        scores = reduced @ self.centroids.T
+        scores = (self.centroids ** 2).sum(axis=1) - 2 * scores
+        return scores.argmin(axis=1)
+
+    def _update(self):
+        """
+        Mini-batch K-Means step: each centroid moves to the running mean of its samples.
+        """
+        reduced = np.concatenate([r for r, _ in self._pending])
+        labels = np.concatenate([l for _, l in self._pending])
+        self._pending = []
+
+        batch_counts = np.bincount(labels, minlength=self.n_clusters).astype(np.float64)
+        sums = np.zeros_like(self.centroids, dtype=np.float64)
+        np.add.at(sums, labels, reduced)
+
+        self.counts += batch_counts
+        touched = batch_counts > 0
+        step = (sums[touched] - batch_counts[touched, None] * self.centroids[touched]) / self.counts[touched, None]
+        self.centroids[touched] += step.astype(np.float32)
@@ -0,0 +1,105 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+import numpy as np
+
+
+def collect_batch(items: queue.Queue, max_batch_size: int, max_wait: float, poll: float = 0.05) -> list:
+    """
+    Takes up to `max_batch_size` items from `items`: waits up to `poll` seconds for the
+    first one, then up to `max_wait` seconds more for the batch to fill. Returns [] if
+    nothing arrived, so a worker loop can re-check its stop condition.
+    """
+    try:
+        batch = [items.get(timeout=poll)]
+    except queue.Empty:
+        return []
+
+    deadline = time.monotonic() + max_wait
+    while len(batch) < max_batch_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(items.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+class MicroBatcher:
+    """
+    Collects frames submitted from several threads into batches for `ObjectDetector.detect_batch`.
+    A batch is dispatched as soon as `max_batch_size` frames are waiting or the oldest
+    waiting frame has been held for `max_wait_ms`. Results are handed back per frame.
+    """
+    def __init__(self, detector, max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be >= 1, got {max_batch_size}")
+        self.logger = logging.getLogger(__name__)
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.batches = 0
+        self.frames = 0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()  # orders submissions against close()
+        self._closed = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="detect-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, frame: np.ndarray) -> Future:
+        """
+        Queues a frame for detection. The future resolves to its list of detections.
+        """
+        future = Future()
+        with self._lock:
+            if self._closed.is_set():
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((frame, future))
+        return future
+
+    def detect(self, frame: np.ndarray) -> List[dict]:
+        """
+        Blocking drop-in for `ObjectDetector.detect`, batched with concurrent callers.
+        """
+        return self.submit(frame).result()
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.frames / self.batches if self.batches else 0.0
+
+    def close(self):
+        """
+        Stops the worker after the frames already submitted have been processed.
+        """
+        with self._lock:
+            self._closed.set()
+        self._worker.join()
+
+    def _run(self):
+        while not (self._closed.is_set() and self._queue.empty()):
+            batch = collect_batch(self._queue, self.max_batch_size, self.max_wait)
+            if not batch:
+                continue
+
+            frames = [frame for frame, _ in batch]
+            try:
+                results = self.detector.detect_batch(frames)
+                if len(results) != len(batch):
+                    raise RuntimeError(f"detect_batch returned {len(results)} results for {len(batch)} frames")
+            except Exception as e:
+                self.logger.error(f"Batched detection failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.frames += len(batch)
+            for (_, future), detections in zip(batch, results):
+                future.set_result(detections)
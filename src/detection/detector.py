@@ -1,26 +1,33 @@
 
 import logging
+import time
 from typing import List, Optional, Tuple, Any
 import numpy as np
 import cv2
+from src.pipeline.lazy import LazyModelMixin
 
 # import torch
 # from transformers import AutoImageProcessor, AutoModelForObjectDetection
 
-class ObjectDetector:
+class ObjectDetector(LazyModelMixin):
     """
     Wrapper for Object Detection models (targeted: RF-DETR / DETR-like).
     Provides a unified interface for detecting objects in video frames.
+    With `lazy`, the model is loaded on the first detection instead of here.
     """
-    def __init__(self, model_input: str = "rf-detr-resnet50", confidence_threshold: float = 0.5, device: str = "cuda"):
+    def __init__(self, model_input: str = "rf-detr-resnet50", confidence_threshold: float = 0.5, device: str = "cuda",
+                 mock_call_overhead_ms: float = 0.0, mock_per_frame_ms: float = 0.0, lazy: bool = False):
         self.logger = logging.getLogger(__name__)
         self.confidence_threshold = confidence_threshold
         self.device = device
         self.model_name = model_input
         self.model = None
         self.processor = None
+        # Simulated model cost in mock mode: fixed cost per call + cost per frame in the batch
+        self.mock_call_overhead_ms = mock_call_overhead_ms
+        self.mock_per_frame_ms = mock_per_frame_ms
         
-        self._load_model()
+        self._init_model(lazy)
 
     def _load_model(self):
         """
@@ -48,14 +55,41 @@ class ObjectDetector:
         Returns:
             List of dictionaries containing 'bbox', 'label', 'score'.
         """
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames: List[np.ndarray]) -> List[List[dict]]:
+        """
+        Performs object detection on several frames with a single model call.
+
+        Args:
+            frames: List of numpy arrays (H, W, C) - BGR images.
+
+        Returns:
+            One list of detection dicts (same format as `detect`) per input frame.
+        """
+        if not frames:
+            return []
+        self.ensure_loaded()
+
         if self.mock_mode:
-            return self._mock_inference(frame)
+            self._simulate_latency(len(frames))
+            return [self._mock_inference(frame) for frame in frames]
 
         # Real inference logic would go here:
-        # inputs = self.processor(images=frame, return_tensors="pt").to(self.device)
+        # inputs = self.processor(images=frames, return_tensors="pt").to(self.device)
         # outputs = self.model(**inputs)
-        # ... process outputs to bounding boxes ...
-        return []
+        # target_sizes = [frame.shape[:2] for frame in frames]
+        # results = self.processor.post_process_object_detection(outputs, self.confidence_threshold, target_sizes)
+        # ... split results into per-frame bounding boxes ...
+        return [[] for _ in frames]
+
+    def _simulate_latency(self, batch_size: int):
+        """
+        Sleeps for the configured mock model cost so batching trade-offs can be measured.
+        """
+        delay_ms = self.mock_call_overhead_ms + self.mock_per_frame_ms * batch_size
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
 
     def _mock_inference(self, frame: np.ndarray) -> List[dict]:
         """
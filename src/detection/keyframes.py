@@ -0,0 +1,105 @@
+import logging
+import threading
+import cv2
+import numpy as np
+
+
+class KeyframeScheduler:
+    """
+    Decides which frames run the object detector; the tracker propagates the rest.
+    A frame is a keyframe every `interval` frames, or earlier when the tracked
+    objects' confidence drops below `confidence_threshold` or the scene changed by
+    more than `motion_threshold` since the last keyframe (new motion appearing).
+    With a `latency_budget_ms`, `interval` is adapted at runtime from the per-frame
+    latencies passed to `report_latency`.
+    """
+    def __init__(self, interval: int = 5, min_interval: int = 1, max_interval: int = 30,
+                 latency_budget_ms: float = None, confidence_threshold: float = 0.3,
+                 motion_threshold: float = None, smoothing: float = 0.1):
+        """
+        Args:
+            interval: Initial number of frames between keyframes (K).
+            min_interval, max_interval: Bounds for K when it is adapted.
+            latency_budget_ms: Target mean per-frame latency; K grows while it is exceeded
+                and shrinks again once latency falls well below it.
+            confidence_threshold: Force a keyframe when track confidence falls below this.
+            motion_threshold: Force a keyframe when the mean absolute difference (0-255)
+                of a downscaled grey frame against the last keyframe exceeds this.
+            smoothing: Weight of the newest sample in the latency moving average.
+        """
+        if not 1 <= min_interval <= max_interval:
+            raise ValueError(f"Invalid keyframe interval bounds [{min_interval}, {max_interval}]")
+        self.logger = logging.getLogger(__name__)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = int(np.clip(interval, min_interval, max_interval))
+        self.latency_budget_ms = latency_budget_ms
+        self.confidence_threshold = confidence_threshold
+        self.motion_threshold = motion_threshold
+        self.smoothing = smoothing
+
+        self.latency_ms = None  # moving average of reported latencies
+        self.keyframes = 0
+        self.frames = 0
+        self._last_keyframe = None
+        self._reference = None  # thumbnail of the last keyframe
+        self._lock = threading.Lock()
+
+    def is_keyframe(self, frame_idx: int, frame: np.ndarray = None, track_confidence: float = None) -> bool:
+        """
+        Returns True if the detector should run on this frame, and records it if so.
+        """
+        thumb = None
+        if self.motion_threshold is not None and frame is not None:
+            thumb = self._thumbnail(frame)
+
+        with self._lock:
+            self.frames += 1
+            due = (
+                self._last_keyframe is None
+                or frame_idx - self._last_keyframe >= self.interval
+                or (track_confidence is not None and track_confidence < self.confidence_threshold)
+                or (thumb is not None and self._reference is not None
+                    and float(cv2.absdiff(thumb, self._reference).mean()) > self.motion_threshold)
+            )
+            if due:
+                self.keyframes += 1
+                self._last_keyframe = frame_idx if self._last_keyframe is None else max(self._last_keyframe, frame_idx)
+                if thumb is not None:
+                    self._reference = thumb
+            return due
+
+    def set_interval(self, interval: int):
+        """
+        Changes K at runtime (clamped to the configured bounds).
+        """
+        with self._lock:
+            self.interval = int(np.clip(interval, self.min_interval, self.max_interval))
+
+    def report_latency(self, latency_ms: float):
+        """
+        Feeds one frame's processing latency. Against a latency budget, K is increased
+        while the moving average exceeds the budget and decreased once it drops below
+        80% of it, one step per report.
+        """
+        with self._lock:
+            if self.latency_ms is None:
+                self.latency_ms = latency_ms
+            else:
+                self.latency_ms += self.smoothing * (latency_ms - self.latency_ms)
+            if self.latency_budget_ms is None:
+                return
+            if self.latency_ms > self.latency_budget_ms and self.interval < self.max_interval:
+                self.interval += 1
+                self.logger.debug(f"Latency {self.latency_ms:.1f} ms over budget, keyframe interval -> {self.interval}")
+            elif self.latency_ms < 0.8 * self.latency_budget_ms and self.interval > self.min_interval:
+                self.interval -= 1
+
+    @property
+    def keyframe_ratio(self) -> float:
+        return self.keyframes / self.frames if self.frames else 0.0
+
+    @staticmethod
+    def _thumbnail(frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
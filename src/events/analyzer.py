@@ -1,68 +1,248 @@
-
 import logging
-from collections import defaultdict
-import time
+from collections import deque
+import numpy as np
+from src.events.history import TrackHistory
+from src.events.zones import ZoneEngine
+from src.events.proximity import ProximityIndex, pair_keys, pair_distances
 
 class EventAnalyzer:
     """
     State machine for detecting temporal events based on object tracks.
-    Examples: Dwell time violation, zone entry/exit, fall detection.
+    Examples: Dwell time violation, zone entry/exit, line crossing, proximity, crowding.
+    Track history lives in fixed-size ring buffers (struct-of-arrays, one row per
+    track) and every rule is evaluated for all active tracks in one vectorized pass.
+    Tracks unseen for `max_track_age` frames are evicted, and events are debounced:
+    `update` only returns the events raised in the current frame.
     """
-    def __init__(self, fps: int = 30):
+    def __init__(self, fps: int = 30, history_size: int = None, max_track_age: int = None,
+                 stationary_radius: float = 50, event_log_size: int = 256, transformer=None,
+                 proximity_distance: float = None, crowd_radius: float = None, crowd_size: int = 5):
+        """
+        Args:
+            fps: Frame rate used to express time thresholds in frames.
+            history_size: Samples kept per track (defaults to twice the dwell window).
+            max_track_age: Frames a track may go unseen before it is evicted.
+            stationary_radius: Max displacement (pixels) still counted as stationary.
+            event_log_size: Number of recent events kept in `self.events`.
+            transformer: PerspectiveTransformer mapping foot points to map coordinates
+                for proximity rules (pixel coordinates are used without one).
+            proximity_distance: Raise PROXIMITY when two tracks get this close (map units).
+            crowd_radius: Radius (map units) for CROWD_DENSITY; disabled when None.
+            crowd_size: Tracks within `crowd_radius`, itself included, that make a crowd.
+        """
         self.logger = logging.getLogger(__name__)
         self.fps = fps
-        self.track_history = defaultdict(list) # id -> list of (x, y, timestamp)
-        self.events = []
-        
+
         # Configuration for "Dwell" event
         self.min_dwell_frames = fps * 3 # 3 seconds
+        self.stationary_radius = stationary_radius # Threshold in pixels
+
+        self.max_track_age = max_track_age if max_track_age is not None else fps * 2
+        self.track_history = TrackHistory(capacity=history_size or self.min_dwell_frames * 2)
+        self.track_history.register_state("stationary")
+        self.zones = ZoneEngine()
+        self.events = deque(maxlen=event_log_size) # most recent events only
+
+        # Proximity rules work on map coordinates
+        self.transformer = transformer
+        self.proximity_distance = proximity_distance
+        self.crowd_radius = crowd_radius
+        self.crowd_size = crowd_size
+        self.track_history.register_state("crowded")
+        self._close_pairs = np.zeros(0, dtype=np.int64) # sorted pair keys from the last frame
+
+    def add_zone(self, name: str, polygon):
+        """
+        Adds a polygon zone (image coordinates) raising ZONE_ENTER / ZONE_EXIT events.
+        Configure zones before streaming: adding one clears the current zone state.
+        """
+        self.zones.add_zone(name, polygon)
+        self.track_history.register_state("in_zone", width=self.zones.num_zones)
+
+    def add_line(self, name: str, start, end):
+        """
+        Adds a tripwire (image coordinates) raising LINE_CROSS events.
+        """
+        self.zones.add_line(name, start, end)
 
-    def update(self, tracks: list, frame_idx: int):
+    def update(self, tracks: list, frame_idx: int) -> list:
         """
         Updates state with new tracks and detects events.
+        Frame indices may skip values (dropped frames); rules are expressed in frames.
+
+        Returns:
+            List of events raised in this frame.
         """
-        current_ids = set()
-        
-        for track in tracks:
-            obj_id = track['id']
-            bbox = track['bbox']
-            center = ((bbox[0] + bbox[2]) // 2, (bbox[1] + bbox[3]) // 2)
-            
-            self.track_history[obj_id].append((center[0], center[1], frame_idx))
-            current_ids.add(obj_id)
-            
-            self._check_dwell_event(obj_id, frame_idx)
+        # Cleanup lost tracks first, so a track returning after a long gap starts fresh
+        self.track_history.evict_stale(frame_idx, self.max_track_age)
 
-        # Cleanup lost tracks (optional, effectively handled by forgetting old ids in logic)
-        return self.events
+        new_events = []
+        if tracks:
+            ids = [track['id'] for track in tracks]
+            bboxes = np.array([track['bbox'] for track in tracks], dtype=np.int64)
+            centers = (bboxes[:, :2] + bboxes[:, 2:]) // 2
+            rows = self.track_history.append_many(ids, centers[:, 0], centers[:, 1], frame_idx)
 
-    def _check_dwell_event(self, obj_id: int, current_frame: int):
+            self._check_dwell_events(rows, frame_idx, new_events)
+            if self.zones.num_zones:
+                self._check_zone_events(rows, frame_idx, new_events)
+            if self.zones.num_lines:
+                self._check_line_events(rows, frame_idx, new_events)
+            if self.proximity_distance is not None or self.crowd_radius is not None:
+                self._check_proximity_events(tracks, bboxes, rows, frame_idx, new_events)
+        else:
+            self._close_pairs = self._close_pairs[:0]
+
+        self.events.extend(new_events)
+        return new_events
+
+    def recent_events(self, frame_idx: int, max_age: int) -> list:
         """
-        Checks if an object has stayed relatively stationary for too long.
-        This is a simplified example.
+        Logged events raised within the last `max_age` frames up to `frame_idx`, newest first.
         """
-        history = self.track_history[obj_id]
-        if len(history) < self.min_dwell_frames:
+        recent = []
+        for event in reversed(self.events):
+            if frame_idx - event['frame'] >= max_age:
+                break
+            if event['frame'] <= frame_idx:
+                recent.append(event)
+        return recent
+
+    def _check_dwell_events(self, rows: np.ndarray, current_frame: int, new_events: list):
+        """
+        Checks which objects have stayed relatively stationary for too long.
+        Compares each current position with the last position recorded at least
+        `min_dwell_frames` ago; the event fires once when an object becomes stationary.
+        """
+        history = self.track_history
+        valid = np.arange(history.capacity) < history.counts[rows, None]
+        old_enough = valid & (history.frames[rows] <= current_frame - self.min_dwell_frames)
+        has_anchor = old_enough.any(axis=1)
+
+        # Newest qualifying sample per row
+        anchor = np.where(old_enough, history.frames[rows], -1).argmax(axis=1)
+        start_x, start_y = history.xs[rows, anchor], history.ys[rows, anchor]
+        curr_x, curr_y, _ = history.latest(rows)
+        distance = np.hypot(curr_x - start_x, curr_y - start_y)
+        is_stationary = has_anchor & (distance < self.stationary_radius)
+
+        stationary = history.state["stationary"]
+        triggered = is_stationary & ~stationary[rows]
+        stationary[rows] = is_stationary
+
+        for row in rows[triggered]:
+            obj_id = int(history.ids[row])
+            # Trigger Event (debounced until the object moves again)
+            new_events.append({
+                "frame": current_frame,
+                "type": "STATIONARY_WARNING",
+                "object_id": obj_id,
+                "details": f"Object {obj_id} stationary for > {self.min_dwell_frames / self.fps:g}s"
+            })
+
+    def _check_zone_events(self, rows: np.ndarray, current_frame: int, new_events: list):
+        """
+        Zone membership for all tracks and zones; new tracks start outside every zone.
+        """
+        history = self.track_history
+        curr_x, curr_y, _ = history.latest(rows)
+        inside = self.zones.contains(np.stack([curr_x, curr_y], axis=1))
+
+        in_zone = history.state["in_zone"]
+        was_inside = in_zone[rows]
+        in_zone[rows] = inside
+
+        for i, z in zip(*np.nonzero(inside != was_inside)):
+            obj_id = int(history.ids[rows[i]])
+            zone = self.zones.zone_names[z]
+            entered = bool(inside[i, z])
+            new_events.append({
+                "frame": current_frame,
+                "type": "ZONE_ENTER" if entered else "ZONE_EXIT",
+                "object_id": obj_id,
+                "zone": zone,
+                "details": f"Object {obj_id} {'entered' if entered else 'left'} {zone}"
+            })
+
+    def _check_line_events(self, rows: np.ndarray, current_frame: int, new_events: list):
+        """
+        Line crossings between each track's previous and current sample.
+        """
+        history = self.track_history
+        rows = rows[history.counts[rows] >= 2]
+        if not len(rows):
             return
+        prev_x, prev_y, _ = history.latest(rows, back=1)
+        curr_x, curr_y, _ = history.latest(rows)
+        crossed = self.zones.crossings(np.stack([prev_x, prev_y], axis=1), np.stack([curr_x, curr_y], axis=1))
+
+        for i, l in zip(*np.nonzero(crossed)):
+            obj_id = int(history.ids[rows[i]])
+            line = self.zones.line_names[l]
+            direction = "forward" if crossed[i, l] > 0 else "backward"
+            new_events.append({
+                "frame": current_frame,
+                "type": "LINE_CROSS",
+                "object_id": obj_id,
+                "line": line,
+                "direction": direction,
+                "details": f"Object {obj_id} crossed {line} ({direction})"
+            })
 
-        # Check last N seconds
-        recent_history = history[-self.min_dwell_frames:]
-        start_frame = recent_history[0][2]
-        
-        if current_frame - start_frame >= self.min_dwell_frames:
-            # Check displacement
-            start_pos = np.array([recent_history[0][0], recent_history[0][1]])
-            curr_pos = np.array([recent_history[-1][0], recent_history[-1][1]])
-            distance = np.linalg.norm(curr_pos - start_pos)
-            
-            if distance < 50: # Threshold in pixels
-                # Trigger Event
-                self.events.append({
+    def map_positions(self, tracks: list, bboxes: np.ndarray) -> np.ndarray:
+        """
+        (N, 2) map coordinates of each track's foot point (bbox bottom-centre).
+        Uses the track's 'map_xy' when already projected.
+        """
+        if tracks and all('map_xy' in t for t in tracks):
+            return np.array([t['map_xy'] for t in tracks], dtype=np.float64)
+        feet = np.stack([(bboxes[:, 0] + bboxes[:, 2]) / 2.0, bboxes[:, 3]], axis=1).astype(np.float32)
+        if self.transformer is None:
+            return feet.astype(np.float64)
+        return np.asarray(self.transformer.transform_points(feet), dtype=np.float64).reshape(-1, 2)
+
+    def _check_proximity_events(self, tracks: list, bboxes: np.ndarray, rows: np.ndarray,
+                                current_frame: int, new_events: list):
+        """
+        Pairwise proximity and crowd density from a KD-tree over this frame's map positions.
+        Both are debounced: pairs fire once while they stay close, tracks once while crowded.
+        """
+        positions = self.map_positions(tracks, bboxes)
+        index = ProximityIndex(positions)
+        ids = self.track_history.ids[rows]
+
+        if self.proximity_distance is not None:
+            pairs = index.close_pairs(self.proximity_distance)
+            keys = pair_keys(ids[pairs[:, 0]], ids[pairs[:, 1]])
+            is_new = ~np.isin(keys, self._close_pairs)
+            self._close_pairs = np.sort(keys)
+
+            new_pairs = pairs[is_new]
+            for (i, j), distance in zip(new_pairs, pair_distances(positions, new_pairs)):
+                a, b = sorted((int(ids[i]), int(ids[j])))
+                distance = float(distance)
+                new_events.append({
                     "frame": current_frame,
-                    "type": "STATIONARY_WARNING",
+                    "type": "PROXIMITY",
+                    "object_id": a,
+                    "other_id": b,
+                    "distance": distance,
+                    "details": f"Objects {a} and {b} within {distance:.1f} map units"
+                })
+
+        if self.crowd_radius is not None:
+            counts = index.neighbour_counts(self.crowd_radius)
+            is_crowded = counts >= self.crowd_size
+            crowded = self.track_history.state["crowded"]
+            triggered = is_crowded & ~crowded[rows]
+            crowded[rows] = is_crowded
+
+            for i in np.flatnonzero(triggered):
+                obj_id = int(ids[i])
+                new_events.append({
+                    "frame": current_frame,
+                    "type": "CROWD_DENSITY",
                     "object_id": obj_id,
-                    "details": f"Object {obj_id} stationary for > 3s"
+                    "count": int(counts[i]),
+                    "details": f"Object {obj_id} in a crowd of {int(counts[i])}"
                 })
-                # Debounce: Clear history or mark as reported to avoid spam
-                # For simplicity, we just log it.
-import numpy as np
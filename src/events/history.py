@@ -0,0 +1,139 @@
+import numpy as np
+
+
+class TrackHistory:
+    """
+    Fixed-capacity ring buffers of (x, y, frame) samples, one row per track.
+    All tracks share preallocated NumPy arrays; rows of evicted tracks are recycled,
+    so memory is bounded by the number of concurrently active tracks.
+    """
+    def __init__(self, capacity: int = 180, initial_tracks: int = 64):
+        self.capacity = capacity
+        self.row_of = {}  # track_id -> row
+        self._free = []
+        self.state = {}   # name -> per-row rule state, reset when a row is reassigned
+
+        self.xs = np.zeros((0, capacity), dtype=np.float32)
+        self.ys = np.zeros((0, capacity), dtype=np.float32)
+        self.frames = np.zeros((0, capacity), dtype=np.int64)
+        self.heads = np.zeros(0, dtype=np.int64)      # next write position per row
+        self.counts = np.zeros(0, dtype=np.int64)     # valid samples per row
+        self.last_seen = np.zeros(0, dtype=np.int64)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.active = np.zeros(0, dtype=bool)
+        self._grow(initial_tracks)
+
+    def __len__(self):
+        return len(self.row_of)
+
+    def __contains__(self, track_id):
+        return track_id in self.row_of
+
+    def row(self, track_id: int) -> int:
+        """
+        Row of `track_id`, allocating an empty one for new tracks.
+        """
+        row = self.row_of.get(track_id)
+        if row is None:
+            if not self._free:
+                self._grow(len(self.ids))
+            row = self._free.pop()
+            self.row_of[track_id] = row
+            self.ids[row] = track_id
+            self.active[row] = True
+            self.heads[row] = 0
+            self.counts[row] = 0
+            for array in self.state.values():
+                array[row] = 0
+        return row
+
+    def register_state(self, name: str, dtype=bool, width: int = None) -> np.ndarray:
+        """
+        Allocates (or re-allocates, cleared) a per-row state array of shape (rows,) or (rows, width).
+        """
+        shape = (len(self.ids),) if width is None else (len(self.ids), width)
+        self.state[name] = np.zeros(shape, dtype=dtype)
+        return self.state[name]
+
+    def append(self, track_id: int, x: float, y: float, frame_idx: int) -> int:
+        """
+        Records a sample, overwriting the oldest one once the row is full. Returns the row.
+        """
+        row = self.row(track_id)
+        head = self.heads[row]
+        self.xs[row, head] = x
+        self.ys[row, head] = y
+        self.frames[row, head] = frame_idx
+        self.heads[row] = (head + 1) % self.capacity
+        self.counts[row] = min(self.counts[row] + 1, self.capacity)
+        self.last_seen[row] = frame_idx
+        return row
+
+    def append_many(self, track_ids: list, xs: np.ndarray, ys: np.ndarray, frame_idx: int) -> np.ndarray:
+        """
+        Records one sample per track for the same frame. Returns the rows, aligned with `track_ids`.
+        """
+        rows = np.fromiter((self.row(tid) for tid in track_ids), dtype=np.int64, count=len(track_ids))
+        heads = self.heads[rows]
+        self.xs[rows, heads] = xs
+        self.ys[rows, heads] = ys
+        self.frames[rows, heads] = frame_idx
+        self.heads[rows] = (heads + 1) % self.capacity
+        self.counts[rows] = np.minimum(self.counts[rows] + 1, self.capacity)
+        self.last_seen[rows] = frame_idx
+        return rows
+
+    def latest(self, rows: np.ndarray, back: int = 0) -> tuple:
+        """
+        (x, y, frame) arrays of the sample `back` steps before the newest one, per row.
+        Only meaningful where `counts[rows] > back`.
+        """
+        idx = (self.heads[rows] - 1 - back) % self.capacity
+        return self.xs[rows, idx], self.ys[rows, idx], self.frames[rows, idx]
+
+    def samples(self, track_id: int) -> np.ndarray:
+        """
+        Chronological (N, 3) array of the track's (x, y, frame) samples.
+        """
+        row = self.row_of.get(track_id)
+        if row is None:
+            return np.zeros((0, 3), dtype=np.float64)
+        order = self._chronological(row)
+        return np.stack([self.xs[row, order], self.ys[row, order], self.frames[row, order]], axis=1)
+
+    def evict_stale(self, frame_idx: int, max_age: int) -> list:
+        """
+        Frees the rows of tracks not seen for more than `max_age` frames. Returns their ids.
+        """
+        stale_rows = np.flatnonzero(self.active & (frame_idx - self.last_seen > max_age))
+        evicted = []
+        for row in stale_rows:
+            track_id = int(self.ids[row])
+            del self.row_of[track_id]
+            self.active[row] = False
+            self.counts[row] = 0
+            self._free.append(int(row))
+            evicted.append(track_id)
+        return evicted
+
+    def _chronological(self, row: int) -> np.ndarray:
+        count = self.counts[row]
+        start = (self.heads[row] - count) % self.capacity
+        return (start + np.arange(count)) % self.capacity
+
+    def _grow(self, extra: int):
+        extra = max(extra, 1)
+        old = len(self.ids)
+        pad = ((0, extra), (0, 0))
+        self.xs = np.pad(self.xs, pad)
+        self.ys = np.pad(self.ys, pad)
+        self.frames = np.pad(self.frames, pad)
+        self.heads = np.pad(self.heads, (0, extra))
+        self.counts = np.pad(self.counts, (0, extra))
+        self.last_seen = np.pad(self.last_seen, (0, extra))
+        self.ids = np.pad(self.ids, (0, extra))
+        self.active = np.pad(self.active, (0, extra))
+        for name, array in self.state.items():
+            self.state[name] = np.pad(array, ((0, extra),) + ((0, 0),) * (array.ndim - 1))
+        # Pop from the end: lowest rows are handed out first
+        self._free.extend(range(old + extra - 1, old - 1, -1))
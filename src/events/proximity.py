@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class ProximityIndex:
+    """
+    KD-tree over one frame's map positions, rebuilt every frame.
+    Pair and density queries cost O(N log N) instead of the O(N^2) all-pairs check.
+    With `groups` (e.g. the frame of each point), points of different groups are never
+    paired or counted, so one tree can serve many frames at once; queries must then
+    stay within `max_distance`.
+    """
+    def __init__(self, points: np.ndarray, groups: np.ndarray = None, max_distance: float = 0.0):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.max_distance = max_distance
+        tree_points = self.points
+        if groups is not None:
+            # A third axis that puts groups further apart than any query distance
+            stride = 2.0 * max_distance + 1.0
+            tree_points = np.column_stack([self.points, np.asarray(groups, dtype=np.float64) * stride])
+        self._grouped = groups is not None
+        from scipy.spatial import cKDTree  # deferred: scipy is slow to import
+        self.tree = cKDTree(tree_points) if len(self.points) else None
+
+    def close_pairs(self, distance: float) -> np.ndarray:
+        """
+        (P, 2) index pairs (i < j) of points closer than or equal to `distance`, sorted.
+        """
+        self._check_distance(distance)
+        if self.tree is None:
+            return np.zeros((0, 2), dtype=np.int64)
+        pairs = self.tree.query_pairs(distance, output_type='ndarray').astype(np.int64).reshape(-1, 2)
+        return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+    def neighbour_counts(self, radius: float) -> np.ndarray:
+        """
+        Number of points within `radius` of each point, the point itself included.
+        """
+        self._check_distance(radius)
+        if self.tree is None:
+            return np.zeros(0, dtype=np.int64)
+        # Counting close pairs visits each pair once, unlike a ball query per point
+        pairs = self.tree.query_pairs(radius, output_type='ndarray')
+        return 1 + np.bincount(pairs.ravel(), minlength=len(self.points)).astype(np.int64)
+
+    def _check_distance(self, distance: float):
+        if self._grouped and distance > self.max_distance:
+            raise ValueError(f"Query distance {distance} exceeds the grouped index's max_distance {self.max_distance}")
+
+
+def pair_keys(ids_a: np.ndarray, ids_b: np.ndarray) -> np.ndarray:
+    """
+    Order-independent int64 key per id pair (ids must fit in 31 bits).
+    """
+    lo = np.minimum(ids_a, ids_b).astype(np.int64)
+    hi = np.maximum(ids_a, ids_b).astype(np.int64)
+    return (lo << 32) | hi
+
+
+def pair_distances(points: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    """
+    Euclidean distance of each (i, j) index pair of `points`.
+    """
+    delta = points[pairs[:, 0]] - points[pairs[:, 1]]
+    return np.hypot(delta[:, 0], delta[:, 1])
@@ -0,0 +1,255 @@
+import logging
+import numpy as np
+from src.events.proximity import ProximityIndex, pair_keys, pair_distances
+
+# Order in which EventAnalyzer.update raises the rules' events within a frame
+_DWELL, _ZONE, _LINE, _PROXIMITY, _CROWD = range(5)
+
+
+class EventReplay:
+    """
+    Offline counterpart of `EventAnalyzer.update`: evaluates the analyzer's dwell, zone,
+    line, proximity and crowd rules over complete stored trajectories at once and
+    returns the events the online analyzer would have raised, in the same order.
+
+    Instead of stepping the ring buffers frame by frame, rows are sorted per track and
+    split into segments wherever the online analyzer would have evicted the track (a gap
+    longer than `max_track_age`). Each rule then becomes array arithmetic over segments:
+    the dwell anchor is a binary search `min_dwell_frames` back, bounded by the history
+    capacity; zone and line rules compare each sample with the previous one of its
+    segment; proximity and crowding query one KD-tree per block of frames. Rule
+    changes can be backtested by configuring a fresh analyzer and replaying:
+
+        analyzer = EventAnalyzer(fps=30, proximity_distance=2.0)
+        analyzer.add_zone("gate", polygon)
+        events = EventReplay(analyzer).run_export(ColumnarReader("run1/"))
+    """
+    def __init__(self, analyzer, chunk_rows: int = 262144):
+        """
+        Args:
+            analyzer: Configured EventAnalyzer whose rules (thresholds, zones, lines,
+                transformer) are replayed; its own state is neither used nor changed.
+            chunk_rows: Rows evaluated per block by the zone, line and proximity rules,
+                bounding their temporary arrays.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.analyzer = analyzer
+        self.chunk_rows = chunk_rows
+
+    def run_export(self, reader) -> list:
+        """
+        Replays the tracks of a `ColumnarWriter` export (see `ColumnarReader`).
+        """
+        columns = {k: [] for k in ("frames", "frame_idx", "id", "bbox", "map_xy")}
+        for chunk in reader.chunks():
+            for k, v in columns.items():
+                v.append(chunk[k])
+        if not columns["frames"]:
+            return []
+        columns = {k: np.concatenate(v) for k, v in columns.items()}
+        return self.run(columns["frame_idx"], columns["id"], columns["bbox"],
+                        map_xy=columns["map_xy"].astype(np.float64), frames=columns["frames"])
+
+    def run(self, frame_idx: np.ndarray, ids: np.ndarray, bboxes: np.ndarray,
+            map_xy: np.ndarray = None, frames: np.ndarray = None) -> list:
+        """
+        Events for trajectories given as one row per track and frame.
+
+        Args:
+            frame_idx: (N,) frame of each row; rows of a frame keep their pipeline order.
+            ids: (N,) track ids.
+            bboxes: (N, 4) boxes (x1, y1, x2, y2).
+            map_xy: Optional (N, 2) map coordinates, NaN where unprojected; like the online
+                analyzer, a frame uses them only if all of its tracks have them.
+            frames: Every processed frame index, including frames without tracks
+                (defaults to the frames that have rows). Only proximity debouncing
+                depends on empty frames.
+
+        Returns:
+            Event dicts ordered as the online analyzer raises them.
+        """
+        analyzer = self.analyzer
+        order = np.argsort(np.asarray(frame_idx, dtype=np.int64), kind="stable")
+        frame_idx = np.asarray(frame_idx, dtype=np.int64)[order]
+        ids = np.asarray(ids, dtype=np.int64)[order]
+        bboxes = np.asarray(bboxes, dtype=np.int64).reshape(-1, 4)[order]
+        if map_xy is not None:
+            map_xy = np.asarray(map_xy, dtype=np.float64).reshape(-1, 2)[order]
+        if not len(ids):
+            return []
+
+        centers = (bboxes[:, :2] + bboxes[:, 2:]) // 2
+        # Same precision as the online history buffers
+        xs, ys = centers[:, 0].astype(np.float32), centers[:, 1].astype(np.float32)
+        by_track, prev = self._segments(ids, frame_idx)
+
+        found = [self._dwell(frame_idx, xs, ys, by_track, prev)]
+        if analyzer.zones.num_zones:
+            found.append(self._zones(xs, ys, prev))
+        if analyzer.zones.num_lines:
+            found.append(self._lines(xs, ys, prev))
+        if analyzer.proximity_distance is not None or analyzer.crowd_radius is not None:
+            frames = np.unique(frame_idx) if frames is None else np.union1d(np.asarray(frames, dtype=np.int64), frame_idx)
+            found.extend(self._proximity(frame_idx, ids, bboxes, map_xy, frames, prev))
+
+        # Columns: rule, row, sub-index (zone/line/other row), value
+        rule, row, sub, value = (np.concatenate(c) for c in zip(*found))
+        ranked = np.lexsort((sub, row, rule, frame_idx[row]))
+        events = [self._event(int(rule[k]), int(row[k]), int(sub[k]), value[k], frame_idx, ids) for k in ranked]
+        self.logger.info(f"Replayed {len(ids)} track rows over {len(np.unique(frame_idx))} frames: {len(events)} events")
+        return events
+
+    def _segments(self, ids: np.ndarray, frame_idx: np.ndarray) -> tuple:
+        """
+        Track-ordered row indices and, per row, the previous row of its segment (-1 at a
+        segment start). A segment ends where the online analyzer evicts the track.
+        """
+        by_track = np.lexsort((frame_idx, ids))
+        t_ids, t_frames = ids[by_track], frame_idx[by_track]
+        continues = np.zeros(len(ids), dtype=bool)
+        continues[1:] = (t_ids[1:] == t_ids[:-1]) & (t_frames[1:] - t_frames[:-1] <= self.analyzer.max_track_age)
+        prev = np.full(len(ids), -1, dtype=np.int64)
+        prev[by_track[1:][continues[1:]]] = by_track[:-1][continues[1:]]
+        return by_track, prev
+
+    @staticmethod
+    def _changes(flags: np.ndarray, prev: np.ndarray) -> np.ndarray:
+        """
+        Per row, whether `flags` differ from the previous row of the segment (False before a start).
+        """
+        before = np.zeros_like(flags)
+        has_prev = prev >= 0
+        before[has_prev] = flags[prev[has_prev]]
+        return flags != before
+
+    def _dwell(self, frame_idx, xs, ys, by_track, prev) -> tuple:
+        analyzer = self.analyzer
+        capacity = analyzer.track_history.capacity
+        # Segment number and position within the track-ordered rows
+        t_prev = prev[by_track]
+        segment = np.cumsum(t_prev < 0) - 1
+        t_frames = frame_idx[by_track]
+        span = int(t_frames.max() - t_frames.min()) + 1
+        keys = segment * span + (t_frames - t_frames.min())
+
+        # Newest sample at least `min_dwell_frames` old, if still within the ring buffer
+        anchor = np.searchsorted(keys, keys - analyzer.min_dwell_frames, side="right") - 1
+        positions = np.arange(len(by_track))
+        has_anchor = (anchor >= 0) & (segment[np.maximum(anchor, 0)] == segment) & (positions - anchor < capacity)
+        anchor_rows = by_track[np.maximum(anchor, 0)]
+        distance = np.hypot(xs[by_track] - xs[anchor_rows], ys[by_track] - ys[anchor_rows])
+
+        stationary = np.zeros(len(xs), dtype=bool)
+        stationary[by_track] = has_anchor & (distance < analyzer.stationary_radius)
+        rows = np.flatnonzero(stationary & self._changes(stationary, prev))
+        return self._found(_DWELL, rows)
+
+    def _zones(self, xs, ys, prev) -> tuple:
+        zones = self.analyzer.zones
+        inside = np.zeros((len(xs), zones.num_zones), dtype=bool)
+        for start in range(0, len(xs), self.chunk_rows):
+            end = start + self.chunk_rows
+            inside[start:end] = zones.contains(np.stack([xs[start:end], ys[start:end]], axis=1))
+        rows, z = np.nonzero(self._changes(inside, prev))
+        return self._found(_ZONE, rows, z, inside[rows, z])
+
+    def _lines(self, xs, ys, prev) -> tuple:
+        zones = self.analyzer.zones
+        moved = np.flatnonzero(prev >= 0)
+        rows, lines, directions = [], [], []
+        for start in range(0, len(moved), self.chunk_rows):
+            chunk = moved[start:start + self.chunk_rows]
+            before = prev[chunk]
+            crossed = zones.crossings(np.stack([xs[before], ys[before]], axis=1), np.stack([xs[chunk], ys[chunk]], axis=1))
+            i, l = np.nonzero(crossed)
+            rows.append(chunk[i])
+            lines.append(l)
+            directions.append(crossed[i, l] > 0)
+        if not rows:
+            return self._found(_LINE, moved[:0])
+        return self._found(_LINE, np.concatenate(rows), np.concatenate(lines), np.concatenate(directions))
+
+    def _positions(self, frame_idx, bboxes, map_xy) -> np.ndarray:
+        """
+        Map positions per row, as `EventAnalyzer.map_positions` computes them frame by frame.
+        """
+        feet = np.stack([(bboxes[:, 0] + bboxes[:, 2]) / 2.0, bboxes[:, 3]], axis=1).astype(np.float32)
+        transformer = self.analyzer.transformer
+        positions = feet.astype(np.float64) if transformer is None else \
+            np.asarray(transformer.transform_points(feet), dtype=np.float64).reshape(-1, 2)
+        if map_xy is not None:
+            starts = np.flatnonzero(np.r_[True, frame_idx[1:] != frame_idx[:-1]])
+            projected = np.logical_and.reduceat(~np.isnan(map_xy).any(axis=1), starts)
+            use_map = np.repeat(projected, np.diff(np.r_[starts, len(frame_idx)]))
+            positions[use_map] = map_xy[use_map]
+        return positions
+
+    def _proximity(self, frame_idx, ids, bboxes, map_xy, frames, prev) -> list:
+        analyzer = self.analyzer
+        positions = self._positions(frame_idx, bboxes, map_xy)
+        rank = np.searchsorted(frames, frame_idx)
+        max_distance = max(d for d in (analyzer.proximity_distance, analyzer.crowd_radius) if d is not None)
+
+        pairs, counts = [], []
+        # Blocks of about `chunk_rows` rows cut at frame starts, each searched with one grouped KD-tree
+        starts = np.flatnonzero(np.r_[True, frame_idx[1:] != frame_idx[:-1]])
+        cuts = np.searchsorted(starts, np.arange(0, len(ids), self.chunk_rows))
+        bounds = np.unique(np.r_[starts[np.minimum(cuts, len(starts) - 1)], len(ids)])
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            index = ProximityIndex(positions[start:end], groups=rank[start:end], max_distance=max_distance)
+            if analyzer.proximity_distance is not None:
+                pairs.append(index.close_pairs(analyzer.proximity_distance) + start)
+            if analyzer.crowd_radius is not None:
+                counts.append(index.neighbour_counts(analyzer.crowd_radius))
+
+        found = []
+        if analyzer.proximity_distance is not None:
+            pairs = np.concatenate(pairs)
+            keys = pair_keys(ids[pairs[:, 0]], ids[pairs[:, 1]])
+            pair_rank = rank[pairs[:, 0]]
+            # A pair is new unless it was also close in the previous processed frame
+            by_key = np.lexsort((pair_rank, keys))
+            repeated = np.zeros(len(pairs), dtype=bool)
+            repeated[by_key[1:]] = (keys[by_key[1:]] == keys[by_key[:-1]]) & \
+                (pair_rank[by_key[1:]] == pair_rank[by_key[:-1]] + 1)
+            new_pairs = pairs[~repeated]
+            found.append(self._found(_PROXIMITY, new_pairs[:, 0], new_pairs[:, 1], pair_distances(positions, new_pairs)))
+        if analyzer.crowd_radius is not None:
+            counts = np.concatenate(counts)
+            crowded = counts >= analyzer.crowd_size
+            rows = np.flatnonzero(crowded & self._changes(crowded, prev))
+            found.append(self._found(_CROWD, rows, value=counts[rows]))
+        return found
+
+    @staticmethod
+    def _found(rule: int, rows: np.ndarray, sub: np.ndarray = None, value: np.ndarray = None) -> tuple:
+        n = len(rows)
+        return (np.full(n, rule, dtype=np.int64), np.asarray(rows, dtype=np.int64),
+                np.zeros(n, dtype=np.int64) if sub is None else np.asarray(sub, dtype=np.int64),
+                np.zeros(n, dtype=np.float64) if value is None else np.asarray(value, dtype=np.float64))
+
+    def _event(self, rule: int, row: int, sub: int, value: float, frame_idx, ids) -> dict:
+        analyzer = self.analyzer
+        frame = int(frame_idx[row])
+        obj_id = int(ids[row])
+        if rule == _DWELL:
+            return {"frame": frame, "type": "STATIONARY_WARNING", "object_id": obj_id,
+                    "details": f"Object {obj_id} stationary for > {analyzer.min_dwell_frames / analyzer.fps:g}s"}
+        if rule == _ZONE:
+            zone = analyzer.zones.zone_names[sub]
+            entered = bool(value)
+            return {"frame": frame, "type": "ZONE_ENTER" if entered else "ZONE_EXIT", "object_id": obj_id,
+                    "zone": zone, "details": f"Object {obj_id} {'entered' if entered else 'left'} {zone}"}
+        if rule == _LINE:
+            line = analyzer.zones.line_names[sub]
+            direction = "forward" if value else "backward"
+            return {"frame": frame, "type": "LINE_CROSS", "object_id": obj_id, "line": line,
+                    "direction": direction, "details": f"Object {obj_id} crossed {line} ({direction})"}
+        if rule == _PROXIMITY:
+            a, b = sorted((obj_id, int(ids[sub])))
+            distance = float(value)
+            return {"frame": frame, "type": "PROXIMITY", "object_id": a, "other_id": b, "distance": distance,
+                    "details": f"Objects {a} and {b} within {distance:.1f} map units"}
+        count = int(value)
+        return {"frame": frame, "type": "CROWD_DENSITY", "object_id": obj_id, "count": count,
+                "details": f"Object {obj_id} in a crowd of {count}"}
@@ -0,0 +1,113 @@
+import numpy as np
+
+
+class ZoneEngine:
+    """
+    Polygon zones and tripwire lines evaluated for many points at once.
+    Polygons are packed into padded edge arrays when added; queries use a
+    bounding-box prefilter followed by a vectorized crossing-number test.
+    """
+    def __init__(self):
+        self.zone_names = []
+        self.line_names = []
+        self._polygons = []
+        # Packed zone edges (Z, V) and bounding boxes (Z, 4)
+        self._x1 = self._y1 = self._x2 = self._y2 = np.zeros((0, 0), dtype=np.float64)
+        self._bounds = np.zeros((0, 4), dtype=np.float64)
+        # Lines (L, 4): x1, y1, x2, y2
+        self._lines = np.zeros((0, 4), dtype=np.float64)
+
+    @property
+    def num_zones(self) -> int:
+        return len(self.zone_names)
+
+    @property
+    def num_lines(self) -> int:
+        return len(self.line_names)
+
+    def add_zone(self, name: str, polygon):
+        """
+        Registers a polygon zone given as (V, 2) vertices, in the analyzer's coordinates.
+        """
+        polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+        if len(polygon) < 3:
+            raise ValueError(f"Zone '{name}' needs at least 3 vertices, got {len(polygon)}")
+        self.zone_names.append(name)
+        self._polygons.append(polygon)
+        self._pack()
+
+    def add_line(self, name: str, start, end):
+        """
+        Registers a tripwire from `start` to `end`. Crossing it left-to-right (seen from
+        `start` looking at `end`) is 'forward'.
+        """
+        line = np.array([[start[0], start[1], end[0], end[1]]], dtype=np.float64)
+        self.line_names.append(name)
+        self._lines = np.concatenate([self._lines, line])
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        """
+        (N, Z) boolean membership of each point in each zone.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        inside = np.zeros((len(points), self.num_zones), dtype=bool)
+        if not len(points) or not self.num_zones:
+            return inside
+
+        px, py = points[:, 0:1], points[:, 1:2]
+        b = self._bounds
+        candidates = (px >= b[:, 0]) & (px <= b[:, 2]) & (py >= b[:, 1]) & (py <= b[:, 3])
+        p_idx, z_idx = np.nonzero(candidates)
+        if not len(p_idx):
+            return inside
+
+        x1, y1, x2, y2 = self._x1[z_idx], self._y1[z_idx], self._x2[z_idx], self._y2[z_idx]
+        cx, cy = px[p_idx], py[p_idx]
+        straddles = (y1 > cy) != (y2 > cy)
+        dy = np.where(straddles, y2 - y1, 1.0)
+        x_cross = x1 + (cy - y1) * (x2 - x1) / dy
+        crossings = np.count_nonzero(straddles & (cx < x_cross), axis=1)
+        inside[p_idx, z_idx] = crossings % 2 == 1
+        return inside
+
+    def crossings(self, prev: np.ndarray, curr: np.ndarray) -> np.ndarray:
+        """
+        (N, L) int8 line crossings of the moves prev[i] -> curr[i]:
+        1 forward, -1 backward, 0 none.
+        """
+        prev = np.asarray(prev, dtype=np.float64).reshape(-1, 2)
+        curr = np.asarray(curr, dtype=np.float64).reshape(-1, 2)
+        if not len(prev) or not self.num_lines:
+            return np.zeros((len(prev), self.num_lines), dtype=np.int8)
+
+        lx1, ly1, lx2, ly2 = (self._lines[:, i] for i in range(4))
+        ldx, ldy = lx2 - lx1, ly2 - ly1
+        # Side of the line before/after the move (sign of the cross product)
+        side_prev = ldx * (prev[:, 1:2] - ly1) - ldy * (prev[:, 0:1] - lx1)
+        side_curr = ldx * (curr[:, 1:2] - ly1) - ldy * (curr[:, 0:1] - lx1)
+        # Side of the move for both line endpoints
+        mdx, mdy = (curr - prev)[:, 0:1], (curr - prev)[:, 1:2]
+        end_a = mdx * (ly1 - prev[:, 1:2]) - mdy * (lx1 - prev[:, 0:1])
+        end_b = mdx * (ly2 - prev[:, 1:2]) - mdy * (lx2 - prev[:, 0:1])
+
+        # Half-open sides: a point exactly on the line counts as the positive side
+        hits = ((side_prev >= 0) != (side_curr >= 0)) & (end_a * end_b <= 0)
+        # Image coordinates (y down): a negative-to-positive side change is left-to-right
+        return np.where(hits, np.where(side_curr >= 0, 1, -1), 0).astype(np.int8)
+
+    def _pack(self):
+        max_vertices = max(len(p) for p in self._polygons)
+        shape = (len(self._polygons), max_vertices)
+        self._x1, self._y1 = np.zeros(shape), np.zeros(shape)
+        self._x2, self._y2 = np.zeros(shape), np.zeros(shape)
+        self._bounds = np.zeros((len(self._polygons), 4))
+        for z, polygon in enumerate(self._polygons):
+            # Pad with the last vertex: zero-length edges never straddle a scanline
+            n = len(polygon)
+            padded = np.concatenate([polygon, np.repeat(polygon[-1:], max_vertices - n, axis=0)])
+            nxt = padded.copy()
+            nxt[:n - 1] = polygon[1:]
+            nxt[n - 1] = polygon[0]
+            self._x1[z], self._y1[z] = padded[:, 0], padded[:, 1]
+            self._x2[z], self._y2[z] = nxt[:, 0], nxt[:, 1]
+            self._bounds[z] = [*polygon.min(axis=0), *polygon.max(axis=0)]
@@ -0,0 +1,257 @@
+import os
+import json
+import logging
+from typing import Iterator
+import numpy as np
+from src.segmentation.masks import CompactMask
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+
+# Events keep their type-specific fields (zone, line, other_id, ...) in a JSON column
+_EVENT_COLUMNS = ("frame", "type", "object_id", "details")
+
+
+class ColumnarWriter:
+    """
+    Pipeline sink streaming tracks and events into a directory of chunked .npz files.
+    Rows are buffered in memory and written every `chunk_frames` frames as one
+    chunk of column arrays; `manifest.json` is rewritten after each chunk, so the
+    export can be read while the pipeline is still running.
+
+    Track columns: frame_idx, id, bbox (N, 4), class_id, label, confidence, cluster_id
+    (-1 if unknown), ocr_text ("" if none), map_xy (N, 2, NaN if unprojected) and,
+    with `include_masks`, run-length encoded masks (mask_bbox, mask_offsets, mask_counts).
+    """
+    def __init__(self, directory: str, chunk_frames: int = 256, include_masks: bool = False, compress: bool = False):
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory
+        self.chunk_frames = chunk_frames
+        self.include_masks = include_masks
+        self.compress = compress
+        os.makedirs(directory, exist_ok=True)
+
+        self.chunks = []
+        self.frame_shape = None
+        self.frames_written = 0
+        self._reset_buffers()
+
+    def _reset_buffers(self):
+        self._frames = []
+        self._tracks = {k: [] for k in ("frame_idx", "id", "bbox", "class_id", "label", "confidence",
+                                        "cluster_id", "ocr_text", "map_xy")}
+        self._masks = []
+        self._events = {k: [] for k in _EVENT_COLUMNS + ("extra",)}
+
+    def __call__(self, ctx: dict):
+        # Contexts replayed from a stage result cache carry no frame, only its shape
+        shape = ctx["frame"].shape if ctx.get("frame") is not None else ctx.get("frame_shape")
+        self.write(ctx["frame_idx"], ctx["tracks"], ctx.get("events", []), shape[:2] if shape else None)
+
+    def write(self, frame_idx: int, tracks: list, events: list, frame_shape: tuple = None):
+        """
+        Buffers one frame's tracks and events, flushing a chunk when it is full.
+        """
+        if self.frame_shape is None and frame_shape is not None:
+            self.frame_shape = [int(v) for v in frame_shape]
+
+        self._frames.append(frame_idx)
+        cols = self._tracks
+        for t in tracks:
+            cols["frame_idx"].append(frame_idx)
+            cols["id"].append(t['id'])
+            cols["bbox"].append(t['bbox'])
+            cols["class_id"].append(t.get('class_id', -1))
+            cols["label"].append(t.get('label', ""))
+            cols["confidence"].append(t.get('confidence', np.nan))
+            cols["cluster_id"].append(t.get('cluster_id', -1))
+            cols["ocr_text"].append(t.get('ocr_text') or "")
+            cols["map_xy"].append(t.get('map_xy', (np.nan, np.nan)))
+            if self.include_masks:
+                mask = t.get('mask')
+                if mask is not None and not isinstance(mask, CompactMask):
+                    mask = CompactMask.from_full(mask)
+                self._masks.append(mask)
+
+        for e in events:
+            for k in _EVENT_COLUMNS:
+                self._events[k].append(e.get(k, -1 if k in ("frame", "object_id") else ""))
+            extra = {k: v for k, v in e.items() if k not in _EVENT_COLUMNS}
+            self._events["extra"].append(json.dumps(extra, default=json_default))
+
+        if len(self._frames) >= self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered frames as a new chunk (no-op when empty).
+        """
+        if not self._frames:
+            return
+        cols = self._tracks
+        n = len(cols["id"])
+        arrays = {
+            "frames": np.asarray(self._frames, dtype=np.int64),
+            "frame_idx": np.asarray(cols["frame_idx"], dtype=np.int64),
+            "id": np.asarray(cols["id"], dtype=np.int64),
+            "bbox": np.asarray(cols["bbox"], dtype=np.int32).reshape(n, 4),
+            "class_id": np.asarray(cols["class_id"], dtype=np.int32),
+            "label": np.asarray(cols["label"], dtype=str),
+            "confidence": np.asarray(cols["confidence"], dtype=np.float32),
+            "cluster_id": np.asarray(cols["cluster_id"], dtype=np.int32),
+            "ocr_text": np.asarray(cols["ocr_text"], dtype=str),
+            "map_xy": np.asarray(cols["map_xy"], dtype=np.float32).reshape(n, 2),
+            "event_frame": np.asarray(self._events["frame"], dtype=np.int64),
+            "event_type": np.asarray(self._events["type"], dtype=str),
+            "event_object_id": np.asarray(self._events["object_id"], dtype=np.int64),
+            "event_details": np.asarray(self._events["details"], dtype=str),
+            "event_extra": np.asarray(self._events["extra"], dtype=str),
+        }
+        if self.include_masks:
+            arrays.update(self._encode_masks())
+
+        name = f"chunk_{len(self.chunks):05d}.npz"
+        path = os.path.join(self.directory, name)
+        tmp = f"{path}.tmp.npz"
+        (np.savez_compressed if self.compress else np.savez)(tmp, **arrays)
+        os.replace(tmp, path)
+
+        self.chunks.append({"file": name, "first_frame": int(arrays["frames"][0]),
+                            "last_frame": int(arrays["frames"][-1]), "frames": len(self._frames), "tracks": n})
+        self.frames_written += len(self._frames)
+        self._write_manifest()
+        self._reset_buffers()
+
+    def close(self):
+        self.flush()
+        self._write_manifest()
+
+    def _encode_masks(self) -> dict:
+        offsets = np.zeros(len(self._masks) + 1, dtype=np.int64)
+        boxes = np.full((len(self._masks), 4), -1, dtype=np.int32)
+        counts = []
+        for i, mask in enumerate(self._masks):
+            rle = mask.to_rle() if mask is not None else {"bbox": [-1] * 4, "counts": np.zeros(0, dtype=np.int32)}
+            boxes[i] = rle["bbox"]
+            counts.append(rle["counts"])
+            offsets[i + 1] = offsets[i] + len(rle["counts"])
+        return {
+            "mask_bbox": boxes,
+            "mask_offsets": offsets,
+            "mask_counts": np.concatenate(counts).astype(np.int32) if counts else np.zeros(0, dtype=np.int32)
+        }
+
+    def _write_manifest(self):
+        manifest = {
+            "version": FORMAT_VERSION,
+            "frame_shape": self.frame_shape,
+            "include_masks": self.include_masks,
+            "frames": self.frames_written,
+            "chunks": self.chunks
+        }
+        path = os.path.join(self.directory, MANIFEST)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+
+class ColumnarReader:
+    """
+    Reads an export written by `ColumnarWriter`, one chunk at a time.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported export version: {self.manifest.get('version')}")
+        self.frame_shape = self.manifest["frame_shape"]
+
+    def __len__(self):
+        return self.manifest["frames"]
+
+    def chunks(self) -> Iterator[dict]:
+        """
+        Yields each chunk as a dict of column arrays.
+        """
+        for chunk in self.manifest["chunks"]:
+            with np.load(os.path.join(self.directory, chunk["file"])) as data:
+                yield {k: data[k] for k in data.files}
+
+    def tracks(self) -> dict:
+        """
+        All track rows as concatenated column arrays.
+        """
+        columns = {}
+        for chunk in self.chunks():
+            for k, v in chunk.items():
+                if not k.startswith(("event_", "mask_")) and k != "frames":
+                    columns.setdefault(k, []).append(v)
+        return {k: np.concatenate(v) for k, v in columns.items()}
+
+    def events(self) -> list:
+        events = []
+        for chunk in self.chunks():
+            events += _chunk_events(chunk)
+        return events
+
+    def iter_frames(self) -> Iterator[tuple]:
+        """
+        Yields (frame_idx, tracks, events) per exported frame, with tracks rebuilt as
+        the pipeline's track dicts ('mask' as CompactMask when masks were exported).
+        """
+        for chunk in self.chunks():
+            rows = np.searchsorted(chunk["frame_idx"], chunk["frames"], side="left")
+            ends = np.searchsorted(chunk["frame_idx"], chunk["frames"], side="right")
+            events = _chunk_events(chunk)
+            event_frames = np.asarray([e["frame"] for e in events], dtype=np.int64)
+            for frame_idx, start, end in zip(chunk["frames"], rows, ends):
+                tracks = [self._track(chunk, i) for i in range(start, end)]
+                frame_events = [events[i] for i in np.flatnonzero(event_frames == frame_idx)]
+                yield int(frame_idx), tracks, frame_events
+
+    def _track(self, chunk: dict, i: int) -> dict:
+        t = {
+            "id": int(chunk["id"][i]),
+            "bbox": chunk["bbox"][i].tolist(),
+            "class_id": int(chunk["class_id"][i]),
+            "label": str(chunk["label"][i]),
+        }
+        if not np.isnan(chunk["confidence"][i]):
+            t["confidence"] = float(chunk["confidence"][i])
+        if chunk["cluster_id"][i] >= 0:
+            t["cluster_id"] = int(chunk["cluster_id"][i])
+        if chunk["ocr_text"][i]:
+            t["ocr_text"] = str(chunk["ocr_text"][i])
+        if not np.isnan(chunk["map_xy"][i]).any():
+            t["map_xy"] = tuple(float(v) for v in chunk["map_xy"][i])
+        if "mask_bbox" in chunk and chunk["mask_bbox"][i][0] >= 0:
+            counts = chunk["mask_counts"][chunk["mask_offsets"][i]:chunk["mask_offsets"][i + 1]]
+            t["mask"] = CompactMask.from_rle({"size": self.frame_shape, "bbox": chunk["mask_bbox"][i].tolist(),
+                                              "counts": counts})
+        return t
+
+
+def _chunk_events(chunk: dict) -> list:
+    events = []
+    for i in range(len(chunk["event_frame"])):
+        event = {
+            "frame": int(chunk["event_frame"][i]),
+            "type": str(chunk["event_type"][i]),
+            "object_id": int(chunk["event_object_id"][i]),
+            "details": str(chunk["event_details"][i]),
+        }
+        event.update(json.loads(str(chunk["event_extra"][i])))
+        events.append(event)
+    return events
+
+
+def json_default(value):
+    """
+    `json.dumps` fallback for NumPy scalars and arrays.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
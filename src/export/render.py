@@ -0,0 +1,41 @@
+from collections import deque
+from typing import Iterable
+import numpy as np
+from src.export.columnar import ColumnarReader
+from src.pipeline.video_io import VideoWriterSink
+
+
+def render_export(export_dir: str, frames: Iterable[np.ndarray], output_path: str, visualizer=None,
+                  fps: float = 30, fourcc: str = "mp4v") -> int:
+    """
+    Renders the annotated video after the fact from a headless export and the
+    original frames (e.g. `read_video` of the same file). Frames missing from the
+    export, such as frames dropped in real-time mode, are skipped.
+
+    Returns:
+        Number of frames written.
+    """
+    if visualizer is None:
+        from src.visualization.drawer import PipelineVisualizer
+        visualizer = PipelineVisualizer(in_place=True)
+
+    exported = ColumnarReader(export_dir).iter_frames()
+    current = next(exported, None)
+    recent = deque(maxlen=256)  # event log for the recent-events overlay
+    writer = VideoWriterSink(output_path, fps=fps, fourcc=fourcc)
+    written = 0
+    try:
+        for frame_idx, frame in enumerate(frames):
+            while current is not None and current[0] < frame_idx:
+                current = next(exported, None)
+            if current is None:
+                break
+            if current[0] != frame_idx:
+                continue
+            _, tracks, events = current
+            recent.extend(events)
+            writer({"out_frame": visualizer.draw(frame, tracks, list(recent), frame_idx)})
+            written += 1
+    finally:
+        writer.close()
+    return written
@@ -0,0 +1,348 @@
+import os
+import json
+import logging
+import numpy as np
+from src.events.zones import ZoneEngine
+
+FORMAT_VERSION = 2
+META = "meta.json"
+OCR_TEXT = "ocr_text.jsonl"
+
+# Fixed-width row columns: name -> (dtype, per-row shape)
+COLUMNS = {
+    "run": (np.int32, ()),  # writer session the row belongs to, see `TrajectoryReader.runs`
+    "frame": (np.int64, ()),
+    "id": (np.int64, ()),
+    "bbox": (np.int32, (4,)),
+    "map_xy": (np.float32, (2,)),
+    "cluster_id": (np.int32, ()),
+    "ocr": (np.int32, ()),  # index into the OCR text table, -1 if none
+}
+# Spatial index: one record per flushed block, postings sorted by (cell, row) within a block
+BLOCK_FIELDS = ("first_row", "end_row", "first_frame", "last_frame", "postings_start", "postings_end")
+_CELL_OFFSET = 1 << 30  # keeps (cy << 32) | cx within int64
+
+
+def _cell_keys(cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+    """
+    Sortable int64 key per grid cell; the cells of one grid row are contiguous.
+    """
+    cx = np.clip(cx, -_CELL_OFFSET, _CELL_OFFSET - 1).astype(np.int64) + _CELL_OFFSET
+    cy = np.clip(cy, -_CELL_OFFSET, _CELL_OFFSET - 1).astype(np.int64) + _CELL_OFFSET
+    return (cy << 32) | cx
+
+
+def _centers(bboxes: np.ndarray) -> np.ndarray:
+    # Integer centres, as EventAnalyzer uses for zones
+    bboxes = np.asarray(bboxes, dtype=np.int64).reshape(-1, 4)
+    return (bboxes[:, :2] + bboxes[:, 2:]) // 2
+
+
+def _read_meta(directory: str) -> dict:
+    with open(os.path.join(directory, META)) as f:
+        meta = json.load(f)
+    if meta.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported trajectory store version: {meta.get('version')}")
+    return meta
+
+
+class TrajectoryWriter:
+    """
+    Pipeline sink appending every track of every frame to a memory-mappable trajectory
+    store: one raw binary file per column (run, frame, id, bbox, map_xy, cluster_id, OCR
+    text index) plus a coarse spatial grid index over bbox centres.
+
+    Each writer appends a new run (e.g. one per video or demo invocation) whose rows are
+    contiguous and whose frame indices may restart at 0. Within a run frames must
+    arrive in order, so its slice of the frame column is sorted and doubles as the
+    time index.
+
+    Rows are buffered up to `flush_rows` and then appended as one block; the block's
+    rows are also written to the grid index as (cell, row) postings sorted by cell.
+    `meta.json` is replaced atomically after each block and is the commit record:
+    bytes past its row counts (an interrupted flush) are truncated when the store is
+    reopened for appending, and readers never see them. RAM stays bounded by one block
+    plus the distinct OCR texts.
+    """
+    def __init__(self, directory: str, run_name: str = None, cell_size: float = 64.0, flush_rows: int = 65536):
+        """
+        Args:
+            directory: Store directory; an existing store gets a new run appended.
+            run_name: Label of this run (e.g. the video path), kept in `runs`.
+            cell_size: Grid cell size in image pixels (fixed when the store is created).
+            flush_rows: Rows buffered in memory before a block is written.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory
+        self.flush_rows = flush_rows
+        os.makedirs(directory, exist_ok=True)
+
+        if os.path.exists(os.path.join(directory, META)):
+            self.meta = _read_meta(directory)
+            self._truncate()
+        else:
+            self.meta = {"version": FORMAT_VERSION, "cell_size": float(cell_size), "rows": 0, "postings": 0,
+                         "blocks": 0, "ocr_texts": 0, "runs": []}
+            self._write_meta()
+        self.cell_size = self.meta["cell_size"]
+        # Listed in the metadata with its first block, so empty runs leave no trace
+        self.run = len(self.meta["runs"])
+        self._run_meta = {"name": run_name, "first_row": self.meta["rows"], "rows": 0}
+        self._last_frame = None
+        self._ocr_index = {}
+        path = os.path.join(directory, OCR_TEXT)
+        if os.path.exists(path):
+            with open(path) as f:
+                lines = f.readlines()
+            committed = lines[:self.meta["ocr_texts"]]
+            if len(committed) < len(lines):
+                with open(path, "w") as f:
+                    f.writelines(committed)
+            self._ocr_index = {json.loads(line): i for i, line in enumerate(committed)}
+        self._new_texts = []
+        self._files = {name: open(self._path(name), "ab") for name in
+                       list(COLUMNS) + ["grid_cell", "grid_row", "blocks"]}
+        self._reset_buffers()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def _truncate(self):
+        # Drop whatever an interrupted flush appended past the last commit
+        sizes = {name: self.meta["rows"] * np.dtype(dtype).itemsize * int(np.prod(shape))
+                 for name, (dtype, shape) in COLUMNS.items()}
+        sizes.update(grid_cell=self.meta["postings"] * 8, grid_row=self.meta["postings"] * 8,
+                     blocks=self.meta["blocks"] * 8 * len(BLOCK_FIELDS))
+        for name, size in sizes.items():
+            if os.path.exists(self._path(name)):
+                os.truncate(self._path(name), size)
+
+    def _reset_buffers(self):
+        self._buffers = {name: [] for name in COLUMNS}
+
+    def __len__(self):
+        return self.meta["rows"] + len(self._buffers["frame"])
+
+    def __call__(self, ctx: dict):
+        self.append(ctx["frame_idx"], ctx["tracks"])
+
+    def append(self, frame_idx: int, tracks: list):
+        """
+        Buffers one frame's tracks, writing a block once `flush_rows` rows are buffered.
+        """
+        last = self._buffers["frame"][-1] if self._buffers["frame"] else self._last_frame
+        if last is not None and frame_idx < last:
+            raise ValueError(f"Frames of a run must be appended in order: {frame_idx} after {last}")
+        cols = self._buffers
+        for t in tracks:
+            cols["run"].append(self.run)
+            cols["frame"].append(frame_idx)
+            cols["id"].append(t['id'])
+            cols["bbox"].append(t['bbox'])
+            cols["map_xy"].append(t.get('map_xy', (np.nan, np.nan)))
+            cols["cluster_id"].append(t.get('cluster_id', -1))
+            cols["ocr"].append(self._text_index(t.get('ocr_text')))
+        if len(cols["frame"]) >= self.flush_rows:
+            self.flush()
+
+    def _text_index(self, text) -> int:
+        if not text:
+            return -1
+        index = self._ocr_index.get(text)
+        if index is None:
+            index = self._ocr_index[text] = len(self._ocr_index)
+            self._new_texts.append(text)
+        return index
+
+    def flush(self):
+        """
+        Appends the buffered rows as one block and commits it (no-op when empty).
+        """
+        n = len(self._buffers["frame"])
+        if not n:
+            return
+        arrays = {name: np.asarray(self._buffers[name], dtype=dtype).reshape((n,) + shape)
+                  for name, (dtype, shape) in COLUMNS.items()}
+        for name, array in arrays.items():
+            self._files[name].write(array.tobytes())
+
+        first_row = self.meta["rows"]
+        cells = np.floor_divide(_centers(arrays["bbox"]), self.cell_size).astype(np.int64)
+        keys = _cell_keys(cells[:, 0], cells[:, 1])
+        rows = first_row + np.arange(n, dtype=np.int64)
+        order = np.lexsort((rows, keys))
+        self._files["grid_cell"].write(keys[order].tobytes())
+        self._files["grid_row"].write(rows[order].tobytes())
+        postings = self.meta["postings"]
+        block = np.array([first_row, first_row + n, arrays["frame"][0], arrays["frame"][-1],
+                          postings, postings + n], dtype=np.int64)
+        self._files["blocks"].write(block.tobytes())
+
+        if self._new_texts:
+            with open(os.path.join(self.directory, OCR_TEXT), "a") as f:
+                f.writelines(json.dumps(text) + "\n" for text in self._new_texts)
+        for f in self._files.values():
+            f.flush()
+
+        if not self._run_meta["rows"]:
+            self.meta["runs"].append(self._run_meta)
+        self._run_meta["rows"] += n
+        self._last_frame = int(arrays["frame"][-1])
+        self.meta.update(rows=first_row + n, postings=postings + n, blocks=self.meta["blocks"] + 1,
+                         ocr_texts=len(self._ocr_index))
+        self._write_meta()
+        self._new_texts = []
+        self._reset_buffers()
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+
+    def _write_meta(self):
+        path = os.path.join(self.directory, META)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.meta, f)
+        os.replace(f"{path}.tmp", path)
+
+
+class TrajectoryReader:
+    """
+    Memory-mapped, read-only view of a store written by `TrajectoryWriter`.
+    Column attributes (`run`, `frame`, `id`, `bbox`, `map_xy`, `cluster_id`, `ocr`) are
+    np.memmap arrays, so only the pages a query touches are read. `runs` lists each
+    run's name and contiguous rows. Frame ranges are binary searches on a run's sorted
+    frame slice; zone and region queries read the grid postings of the cells overlapping
+    the shape, in the blocks overlapping the frame range, and test only those rows
+    exactly. A run's rows can be fed to `EventReplay`:
+
+        store = TrajectoryReader("trajectories/")
+        rows = store.select(start=9000, end=18000, zone=gate_polygon)  # all runs
+        print(np.unique(store.id[rows]))
+        rows = store.frame_range(-1)  # the latest run
+        events = EventReplay(analyzer).run(store.frame[rows], store.id[rows], store.bbox[rows],
+                                           map_xy=store.map_xy[rows])
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.meta = _read_meta(directory)
+        self.cell_size = self.meta["cell_size"]
+        self.runs = self.meta["runs"]
+        rows = self.meta["rows"]
+        for name, (dtype, shape) in COLUMNS.items():
+            setattr(self, name, self._map(name, dtype, (rows,) + shape))
+        self._grid_cell = self._map("grid_cell", np.int64, (self.meta["postings"],))
+        self._grid_row = self._map("grid_row", np.int64, (self.meta["postings"],))
+        self.blocks = np.array(self._map("blocks", np.int64, (self.meta["blocks"], len(BLOCK_FIELDS))))
+        self._ocr_texts = None
+
+    def _map(self, name: str, dtype, shape: tuple) -> np.ndarray:
+        if not shape[0]:
+            return np.zeros(shape, dtype=dtype)  # np.memmap cannot map zero bytes
+        return np.memmap(os.path.join(self.directory, f"{name}.bin"), dtype=dtype, mode="r", shape=shape)
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    @property
+    def ocr_texts(self) -> list:
+        """
+        The OCR text table that the `ocr` column indexes.
+        """
+        if self._ocr_texts is None:
+            self._ocr_texts = []
+            path = os.path.join(self.directory, OCR_TEXT)
+            if os.path.exists(path):
+                with open(path) as f:
+                    self._ocr_texts = [json.loads(line) for _, line in zip(range(self.meta["ocr_texts"]), f)]
+        return self._ocr_texts
+
+    def frame_range(self, run: int, start: int = None, end: int = None) -> slice:
+        """
+        Row slice of run `run`'s frames `start` through `end` (inclusive; None = unbounded).
+        Runs are indexed like `runs`, so -1 is the latest run; rows of several runs are
+        not one slice, see `select` for those.
+        """
+        if not self.runs:
+            return slice(0, 0)
+        info = self.runs[run]
+        r0, r1 = info["first_row"], info["first_row"] + info["rows"]
+        frames = self.frame[r0:r1]
+        first = r0 + (0 if start is None else int(np.searchsorted(frames, start, side="left")))
+        stop = r1 if end is None else r0 + int(np.searchsorted(frames, end, side="right"))
+        return slice(first, max(first, stop))
+
+    def select(self, start: int = None, end: int = None, zone=None, region: tuple = None,
+               run: int = None) -> np.ndarray:
+        """
+        Ascending row indices of the tracks between frames `start` and `end` (inclusive)
+        whose bbox centre lies in the polygon `zone` ((V, 2) image coordinates) and/or the
+        rectangle `region` (x1, y1, x2, y2, inclusive), in run `run` or, if None, every run.
+        """
+        runs = range(len(self.runs)) if run is None else [run]
+        found = [self._select(self.frame_range(r, start, end), zone, region) for r in runs]
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def _select(self, rows: slice, zone, region) -> np.ndarray:
+        if zone is None and region is None:
+            return np.arange(rows.start, rows.stop, dtype=np.int64)
+
+        bounds = [-np.inf, -np.inf, np.inf, np.inf]
+        if zone is not None:
+            engine = ZoneEngine()
+            engine.add_zone("query", zone)
+            polygon = np.asarray(zone, dtype=np.float64).reshape(-1, 2)
+            bounds = [*polygon.min(axis=0), *polygon.max(axis=0)]
+        if region is not None:
+            bounds = [max(bounds[0], region[0]), max(bounds[1], region[1]),
+                      min(bounds[2], region[2]), min(bounds[3], region[3])]
+        if bounds[0] > bounds[2] or bounds[1] > bounds[3]:
+            return np.zeros(0, dtype=np.int64)
+
+        candidates = self._grid_candidates(bounds, rows)
+        centers = _centers(self.bbox[candidates])
+        keep = (centers[:, 0] >= bounds[0]) & (centers[:, 0] <= bounds[2]) & \
+            (centers[:, 1] >= bounds[1]) & (centers[:, 1] <= bounds[3])
+        if zone is not None:
+            keep[keep] = engine.contains(centers[keep])[:, 0]
+        return candidates[keep]
+
+    def _grid_candidates(self, bounds: list, rows: slice) -> np.ndarray:
+        """
+        Rows within `rows` indexed under the grid cells overlapping `bounds`.
+        """
+        cx0, cy0, cx1, cy1 = (int(np.floor_divide(v, self.cell_size)) for v in bounds)
+        # Blocks overlapping the row range
+        first = int(np.searchsorted(self.blocks[:, 1], rows.start, side="right"))
+        last = int(np.searchsorted(self.blocks[:, 0], rows.stop, side="left"))
+        found = []
+        for first_row, end_row, _, _, p_start, p_end in self.blocks[first:last]:
+            keys = self._grid_cell[p_start:p_end]
+            # Each grid row's cells are one contiguous key range
+            lo = np.searchsorted(keys, _cell_keys(np.full(cy1 - cy0 + 1, cx0), np.arange(cy0, cy1 + 1)), side="left")
+            hi = np.searchsorted(keys, _cell_keys(np.full(cy1 - cy0 + 1, cx1), np.arange(cy0, cy1 + 1)), side="right")
+            for a, b in zip(lo, hi):
+                if b > a:
+                    found.append(self._grid_row[p_start + a:p_start + b])
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.sort(np.concatenate(found))
+        return candidates[(candidates >= rows.start) & (candidates < rows.stop)]
+
+    def columns(self, rows=None) -> dict:
+        """
+        Column arrays of the given rows (all rows if None), with 'ocr_text' as strings
+        ("" if none) instead of table indices.
+        """
+        rows = slice(None) if rows is None else rows
+        columns = {name: np.asarray(getattr(self, name)[rows]) for name in COLUMNS}
+        ocr = columns.pop("ocr")
+        texts = np.asarray(self.ocr_texts + [""], dtype=str)  # -1 selects the trailing ""
+        columns["ocr_text"] = texts[ocr] if len(ocr) else np.zeros(0, dtype=str)
+        return columns
+
+    def query(self, start: int = None, end: int = None, zone=None, region: tuple = None, run: int = None) -> dict:
+        """
+        Columns of the rows matching `select`.
+        """
+        return self.columns(self.select(start, end, zone=zone, region=region, run=run))
@@ -1,16 +1,20 @@
-
 import logging
+import threading
 import cv2
 import numpy as np
 
 class PerspectiveTransformer:
     """
     Handles Homography transformations to map 2D video coordinates to a 2D top-down map/court.
+    Top-down rendering uses cv2.remap lookup tables that are built once per homography and size.
     """
     def __init__(self, src_points: np.ndarray = None, dst_points: np.ndarray = None):
         self.logger = logging.getLogger(__name__)
         self.homography_matrix = None
-        
+        self.inverse_matrix = None
+        self._maps = {}  # (direction, width, height) -> remap tables
+        self._maps_lock = threading.Lock()
+
         if src_points is not None and dst_points is not None:
             self.compute_homography(src_points, dst_points)
 
@@ -20,14 +24,19 @@ class PerspectiveTransformer:
         Both arrays should be shape (4, 2) or (N, 2).
         """
         self.homography_matrix, status = cv2.findHomography(src_points, dst_points)
+        with self._maps_lock:
+            self._maps = {}
         if self.homography_matrix is None:
+            self.inverse_matrix = None
             self.logger.warning("Could not compute homography matrix.")
         else:
+            self.inverse_matrix = np.linalg.inv(self.homography_matrix)
             self.logger.info("Homography matrix computed successfully.")
 
     def transform_point(self, point: tuple) -> tuple:
         """
         Transforms a single (x, y) point from video space to map space.
+        Prefer `transform_points` for more than one point.
         """
         if self.homography_matrix is None:
             return point # Return original if no matrix (or logic to return None)
@@ -38,7 +47,7 @@ class PerspectiveTransformer:
         dst_pt = self.homography_matrix @ pt
         # Normalize
         dst_pt = dst_pt / (dst_pt[2] + 1e-6)
-        
+
         return (int(dst_pt[0]), int(dst_pt[1]))
 
     def transform_points(self, points: np.ndarray) -> np.ndarray:
@@ -47,9 +56,66 @@ class PerspectiveTransformer:
         """
         if self.homography_matrix is None:
             return points
-            
+
         if points.ndim == 1:
             points = points.reshape(1, -1)
-            
+
         transformed_points = cv2.perspectiveTransform(np.array([points], dtype=np.float32), self.homography_matrix)
         return transformed_points[0]
+
+    def project_tracks(self, tracks: list) -> np.ndarray:
+        """
+        Projects every track's foot point (bbox bottom-centre) in one call and stores
+        the result on the track as 'map_xy'.
+
+        Returns:
+            (N, 2) float32 array of map coordinates.
+        """
+        if not tracks:
+            return np.zeros((0, 2), dtype=np.float32)
+
+        bboxes = np.array([t['bbox'] for t in tracks], dtype=np.float32)
+        feet = np.stack([(bboxes[:, 0] + bboxes[:, 2]) / 2, bboxes[:, 3]], axis=1)
+        map_xy = np.asarray(self.transform_points(feet), dtype=np.float32).reshape(-1, 2)
+
+        for t, (x, y) in zip(tracks, map_xy):
+            t['map_xy'] = (float(x), float(y))
+        return map_xy
+
+    def warp_to_map(self, frame: np.ndarray, map_size: tuple) -> np.ndarray:
+        """
+        Renders the top-down view of `frame` as a (height, width) = map_size[::-1] image.
+        """
+        map1, map2 = self._remap_tables("to_map", map_size)
+        return cv2.remap(frame, map1, map2, interpolation=cv2.INTER_LINEAR)
+
+    def warp_to_frame(self, map_image: np.ndarray, frame_size: tuple) -> np.ndarray:
+        """
+        Projects a top-down image back into the camera view, `frame_size` = (width, height).
+        """
+        map1, map2 = self._remap_tables("to_frame", frame_size)
+        return cv2.remap(map_image, map1, map2, interpolation=cv2.INTER_LINEAR)
+
+    def _remap_tables(self, direction: str, size: tuple) -> tuple:
+        """
+        Fixed-point cv2.remap tables for the current homography, built on first use.
+        For "to_map" each output (map) pixel looks up its source in the frame through the
+        inverse homography; "to_frame" uses the forward homography.
+        """
+        if self.homography_matrix is None:
+            raise RuntimeError("Homography matrix has not been computed")
+
+        width, height = int(size[0]), int(size[1])
+        key = (direction, width, height)
+        with self._maps_lock:
+            tables = self._maps.get(key)
+            if tables is None:
+                matrix = self.inverse_matrix if direction == "to_map" else self.homography_matrix
+                xs, ys = np.meshgrid(np.arange(width, dtype=np.float64), np.arange(height, dtype=np.float64))
+                w = matrix[2, 0] * xs + matrix[2, 1] * ys + matrix[2, 2]
+                w = np.where(np.abs(w) < 1e-12, 1e-12, w)
+                map_x = ((matrix[0, 0] * xs + matrix[0, 1] * ys + matrix[0, 2]) / w).astype(np.float32)
+                map_y = ((matrix[1, 0] * xs + matrix[1, 1] * ys + matrix[1, 2]) / w).astype(np.float32)
+                tables = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+                self._maps[key] = tables
+        return tables
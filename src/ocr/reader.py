@@ -2,21 +2,23 @@
 import logging
 import cv2
 import numpy as np
+from src.pipeline.lazy import LazyModelMixin
 # from transformers import AutoProcessor, AutoModelForVision2Seq
 
-class SceneTextReader:
+class SceneTextReader(LazyModelMixin):
     """
     Uses a Vision-Language Model (like SmolVLM2) to read text from specific object crops.
     More robust than standard OCR for blurry or angled text (e.g., jersey numbers).
+    With `lazy`, the VLM is loaded on the first read instead of here.
     """
-    def __init__(self, model_name: str = "HuggingFaceTB/SmolVLM2-500M-Instruct", device: str = "cuda"):
+    def __init__(self, model_name: str = "HuggingFaceTB/SmolVLM2-500M-Instruct", device: str = "cuda", lazy: bool = False):
         self.logger = logging.getLogger(__name__)
         self.device = device
         self.model_name = model_name
         self.model = None
         self.processor = None
         
-        self._load_model()
+        self._init_model(lazy)
 
     def _load_model(self):
         self.logger.info(f"Loading VLM for OCR: {self.model_name}...")
@@ -33,6 +35,7 @@ class SceneTextReader:
         """
         Reads text from the image crop using the VLM.
         """
+        self.ensure_loaded()
         if self.mock_mode:
             # Randomly return a number or empty string
             if np.random.rand() > 0.7:
@@ -44,3 +47,20 @@ class SceneTextReader:
         # generated_ids = self.model.generate(**inputs, max_new_tokens=10)
         # generated_text = self.processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
         # return generated_text
+
+    def read_batch(self, crops: list, prompt: str = "What number is written on the jersey?") -> list:
+        """
+        Reads text from several crops with a single VLM call.
+        Returns one string per crop ("" when nothing was read).
+        """
+        if not crops:
+            return []
+        self.ensure_loaded()
+
+        if self.mock_mode:
+            return [self.read_text(crop, prompt) for crop in crops]
+
+        # Real inference
+        # inputs = self.processor(text=[prompt] * len(crops), images=crops, return_tensors="pt", padding=True).to(self.device)
+        # generated_ids = self.model.generate(**inputs, max_new_tokens=10)
+        # return self.processor.batch_decode(generated_ids, skip_special_tokens=True)
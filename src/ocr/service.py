@@ -0,0 +1,163 @@
+import logging
+import queue
+import threading
+from collections import Counter
+from typing import Optional, Tuple
+import numpy as np
+
+from src.detection.batching import collect_batch
+
+
+class TextVoteStore:
+    """
+    Accumulates OCR readings per track and settles on the majority reading.
+    A track is stable once its best reading has `min_votes` votes and at least
+    `min_agreement` of the non-empty readings; it is exhausted after `max_attempts` reads.
+    """
+    def __init__(self, min_votes: int = 3, min_agreement: float = 0.6, max_attempts: int = 8):
+        self.min_votes = min_votes
+        self.min_agreement = min_agreement
+        self.max_attempts = max_attempts
+        self.votes = {}     # track_id -> Counter(text -> votes)
+        self.attempts = {}  # track_id -> number of readings received
+
+    def add(self, track_id: int, text: str):
+        self.attempts[track_id] = self.attempts.get(track_id, 0) + 1
+        text = text.strip() if text else ""
+        if text:
+            self.votes.setdefault(track_id, Counter())[text] += 1
+
+    def best(self, track_id: int) -> Tuple[Optional[str], float]:
+        """
+        Returns (reading, share of non-empty votes), or (None, 0.0) if nothing was read.
+        """
+        counter = self.votes.get(track_id)
+        if not counter:
+            return None, 0.0
+        text, count = counter.most_common(1)[0]
+        return text, count / sum(counter.values())
+
+    def is_stable(self, track_id: int) -> bool:
+        text, agreement = self.best(track_id)
+        return text is not None and self.votes[track_id][text] >= self.min_votes and agreement >= self.min_agreement
+
+    def is_exhausted(self, track_id: int) -> bool:
+        return self.attempts.get(track_id, 0) >= self.max_attempts
+
+    def forget(self, track_id: int):
+        self.votes.pop(track_id, None)
+        self.attempts.pop(track_id, None)
+
+
+class OCRService:
+    """
+    Background OCR worker.
+    Crops are submitted per track, batched into a single `SceneTextReader.read_batch`
+    call, and the readings are voted per track. `annotate` attaches the current best
+    reading to tracks in later frames; tracks stop being queried once stable.
+    """
+    def __init__(self, reader, max_batch_size: int = 16, max_wait_ms: float = 20.0, retry_interval: int = 10,
+                 ttl_frames: int = 150, votes: TextVoteStore = None):
+        """
+        Args:
+            reader: SceneTextReader (anything with `read_batch(crops)`).
+            max_batch_size: Most crops per VLM call.
+            max_wait_ms: Longest the first queued crop waits for the batch to fill.
+            retry_interval: Minimum frames between two queries of the same track.
+            ttl_frames: Forget tracks not seen for this many frames.
+            votes: Vote store deciding when a reading is settled.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.reader = reader
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.retry_interval = retry_interval
+        self.ttl_frames = ttl_frames
+        self.votes = votes or TextVoteStore()
+
+        self.queries = 0
+        self.batches = 0
+
+        self._lock = threading.Lock()
+        self._pending = set()     # track ids with a crop in flight
+        self._last_query = {}     # track_id -> frame_idx of the last submission
+        self._last_seen = {}      # track_id -> frame_idx
+        self._queue = queue.Queue()
+        self._closed = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="ocr-service", daemon=True)
+        self._worker.start()
+
+    def should_query(self, track_id: int, frame_idx: int) -> bool:
+        with self._lock:
+            if track_id in self._pending:
+                return False
+            if self.votes.is_stable(track_id) or self.votes.is_exhausted(track_id):
+                return False
+            last = self._last_query.get(track_id)
+            return last is None or frame_idx - last >= self.retry_interval
+
+    def submit(self, track_id: int, crop: np.ndarray, frame_idx: int) -> bool:
+        """
+        Queues a crop for reading if the track still needs one. Returns True if queued.
+        """
+        if self._closed.is_set() or not self.should_query(track_id, frame_idx):
+            return False
+        # Copy: the frame buffer may be reused before the worker gets to it
+        crop = np.ascontiguousarray(crop).copy()
+        with self._lock:
+            # Under the lock, so close() cannot let the worker exit before this crop is queued
+            if self._closed.is_set():
+                return False
+            self._pending.add(track_id)
+            self._last_query[track_id] = frame_idx
+            self._queue.put((track_id, crop))
+        return True
+
+    def annotate(self, tracks: list, frame_idx: int):
+        """
+        Sets 'ocr_text' on tracks with a reading and forgets tracks gone for `ttl_frames`.
+        """
+        with self._lock:
+            for t in tracks:
+                self._last_seen[t['id']] = frame_idx
+                text, _ = self.votes.best(t['id'])
+                if text:
+                    t['ocr_text'] = text
+
+            gone = [tid for tid, seen in self._last_seen.items() if frame_idx - seen > self.ttl_frames]
+            for tid in gone:
+                if tid not in self._pending:
+                    del self._last_seen[tid]
+                    self._last_query.pop(tid, None)
+                    self.votes.forget(tid)
+
+    def close(self):
+        """
+        Stops the worker after the crops already queued have been read.
+        """
+        with self._lock:
+            self._closed.set()
+        self._worker.join()
+
+    def _run(self):
+        while not (self._closed.is_set() and self._queue.empty()):
+            batch = collect_batch(self._queue, self.max_batch_size, self.max_wait)
+            if not batch:
+                continue
+
+            try:
+                texts = self.reader.read_batch([crop for _, crop in batch])
+            except Exception as e:
+                self.logger.error(f"Batched OCR failed: {e}")
+                texts = [""] * len(batch)
+            if len(texts) != len(batch):
+                # Every crop counts as one reading, so its track leaves _pending either way
+                self.logger.error(f"read_batch returned {len(texts)} readings for {len(batch)} crops")
+                texts = (list(texts) + [""] * len(batch))[:len(batch)]
+
+            with self._lock:
+                self.batches += 1
+                self.queries += len(batch)
+                for (track_id, _), text in zip(batch, texts):
+                    self.votes.add(track_id, text)
+                    self._pending.discard(track_id)
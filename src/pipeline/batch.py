@@ -0,0 +1,353 @@
+"""
+Offline batch processing of many videos across CPU cores.
+
+    python -m src.pipeline.batch footage/ --output_dir results --workers 8
+    python -m src.pipeline.batch long_match.mp4 --output_dir results --segment_frames 3000
+
+Every worker process loads the models once and reuses them for all the videos it
+is handed. Results are written per video as JSON lines (one record per frame with
+its tracks and events). Long videos can be split into frame ranges that run in
+parallel; the ranges overlap so each segment's trackers and event rules are warmed
+up, and the overlap is used to stitch track ids back together at the seams.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+from src.detection.detector import ObjectDetector
+from src.segmentation.segmenter import VideoSegmenter, box_iou_matrix
+from src.clustering.identifier import VisualIdentifier
+from src.clustering.cache import EmbeddingCache
+from src.ocr.reader import SceneTextReader
+from src.events.analyzer import EventAnalyzer
+from src.export.columnar import json_default
+from src.pipeline.engine import Pipeline
+from src.pipeline.stages import build_stages, resolve_stages
+from src.pipeline.video_io import read_video, video_fps, video_frame_count
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v")
+TRACK_FIELDS = ("id", "bbox", "class_id", "label", "confidence", "cluster_id", "ocr_text", "map_xy")
+
+logger = logging.getLogger(__name__)
+
+# Models loaded once per worker process by `init_worker`
+_worker = {}
+
+
+def find_videos(paths: list) -> list:
+    """
+    Expands directories into the (sorted) video files they contain.
+    """
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            videos += sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith(VIDEO_EXTENSIONS)
+            )
+        else:
+            videos.append(path)
+    return videos
+
+
+def plan_jobs(video_paths: list, segment_frames: int = None, overlap: int = 90) -> list:
+    """
+    One job per video, or per `segment_frames` range of videos longer than that.
+    Segment k owns frames [own_start, end) but starts decoding `overlap` frames earlier.
+    """
+    jobs = []
+    for path in video_paths:
+        total = video_frame_count(path) if segment_frames else 0
+        if not segment_frames or total <= segment_frames:
+            jobs.append({"video_path": path, "segment": 0, "num_segments": 1, "start": 0, "own_start": 0, "end": None})
+            continue
+        starts = list(range(0, total, segment_frames))
+        for k, own_start in enumerate(starts):
+            jobs.append({
+                "video_path": path,
+                "segment": k,
+                "num_segments": len(starts),
+                "start": max(own_start - overlap, 0),
+                "own_start": own_start,
+                "end": min(own_start + segment_frames, total)
+            })
+    return jobs
+
+
+def result_path(output_dir: str, job: dict) -> str:
+    stem = os.path.splitext(os.path.basename(job["video_path"]))[0]
+    if job["num_segments"] == 1:
+        return os.path.join(output_dir, f"{stem}.jsonl")
+    return os.path.join(output_dir, f"{stem}.part{job['segment']:03d}.jsonl")
+
+
+def frame_record(ctx: dict) -> dict:
+    """
+    JSON-friendly summary of a finished frame (masks are not included).
+    """
+    return {
+        "frame_idx": int(ctx["frame_idx"]),
+        "tracks": [{k: t[k] for k in TRACK_FIELDS if k in t} for t in ctx["tracks"]],
+        "events": ctx.get("events", [])
+    }
+
+
+def init_worker(config: dict = None):
+    """
+    Process pool initializer: loads the models of the configured stages
+    (`config["stages"]`, default all; tracking always runs) once for the lifetime of the worker.
+    """
+    config = config or {}
+    logging.basicConfig(level=config.get("log_level", logging.WARNING))
+    enabled = resolve_stages(list(config.get("stages", ("cluster", "ocr", "events"))) + ["track"])
+    _worker.update(
+        detector=ObjectDetector(),
+        segmenter=VideoSegmenter(),
+        identifier=VisualIdentifier(online_clustering=True, cache=EmbeddingCache()) if "cluster" in enabled else None,
+        reader=SceneTextReader() if "ocr" in enabled else None,
+        events="events" in enabled,
+        config=config
+    )
+
+
+def process_job(job: dict, output_dir: str) -> dict:
+    """
+    Runs the pipeline (without rendering) over one job's frame range and writes its records.
+    """
+    if not _worker:
+        init_worker()
+    config = _worker["config"]
+    segmenter, identifier = _worker["segmenter"], _worker["identifier"]
+
+    # Models stay loaded; per-video state starts over
+    segmenter.reset()
+    if identifier is not None:
+        identifier.reset()
+    analyzer = None
+    if _worker["events"]:
+        analyzer = EventAnalyzer(fps=int(round(video_fps(job["video_path"]))), **config.get("analyzer", {}))
+
+    stages = build_stages(_worker["detector"], segmenter, identifier, _worker["reader"], analyzer, None,
+                          ocr_interval=config.get("ocr_interval", 30))
+
+    start = job["start"]
+    max_frames = job["end"] - start if job["end"] is not None else None
+    frames = read_video(job["video_path"], max_frames=max_frames, start_frame=start)
+    source = ({"frame_idx": start + i, "frame": frame} for i, frame in enumerate(frames))
+
+    path = result_path(output_dir, job)
+    started = time.perf_counter()
+    with open(path, "w") as f:
+        def sink(ctx):
+            f.write(json.dumps(frame_record(ctx), default=json_default) + "\n")
+        processed = Pipeline(stages, queue_size=config.get("queue_size", 8)).run(source, sink)
+
+    return dict(job, frames=processed, elapsed_s=time.perf_counter() - started, result_path=path)
+
+
+class TrackIdStitcher:
+    """
+    Maps the per-segment track ids of a split video onto ids that are consistent
+    across the whole video. Tracks of consecutive segments are matched by how often
+    their boxes overlap (IoU >= `iou_threshold`) on the frames both segments processed;
+    unmatched tracks get fresh ids.
+    """
+    def __init__(self, iou_threshold: float = 0.5):
+        self.iou_threshold = iou_threshold
+        self.next_id = 1
+        self.mapping = {}  # local id -> global id, for the current segment
+
+    def start_segment(self, previous: dict, overlap: dict):
+        """
+        Args:
+            previous: frame_idx -> tracks (already global ids) from the previous segment.
+            overlap: frame_idx -> tracks (local ids) of the new segment on the same frames.
+        """
+        votes = defaultdict(int)
+        for frame_idx, tracks in overlap.items():
+            prev = previous.get(frame_idx)
+            if not prev or not tracks:
+                continue
+            iou = box_iou_matrix(np.array([t["bbox"] for t in tracks], dtype=np.float64),
+                                 np.array([t["bbox"] for t in prev], dtype=np.float64))
+            for i, j in zip(*np.nonzero(iou >= self.iou_threshold)):
+                votes[(tracks[i]["id"], prev[j]["id"])] += 1
+
+        self.mapping = {}
+        used = set()
+        for (local, global_id), _ in sorted(votes.items(), key=lambda kv: -kv[1]):
+            if local in self.mapping or global_id in used:
+                continue
+            self.mapping[local] = global_id
+            used.add(global_id)
+
+    def global_id(self, local_id: int) -> int:
+        if local_id not in self.mapping:
+            self.mapping[local_id] = self.next_id
+            self.next_id += 1
+        return self.mapping[local_id]
+
+    def remap(self, record: dict) -> dict:
+        for t in record["tracks"]:
+            t["id"] = self.global_id(t["id"])
+        for e in record["events"]:
+            for key in ("object_id", "other_id"):
+                if key in e:
+                    e[key] = self.global_id(e[key])
+        return record
+
+
+def stitch_segments(jobs: list, output_path: str, iou_threshold: float = 0.5) -> int:
+    """
+    Concatenates the part files of one video (jobs sorted by segment) into `output_path`.
+    Each segment contributes the frames it owns; its warm-up frames are only used to
+    match its tracks to the previous segment's. Returns the number of frames written.
+    """
+    stitcher = TrackIdStitcher(iou_threshold)
+    written = 0
+    tail = {}  # frame_idx -> global tracks of the previous segment inside the next overlap
+    with open(output_path, "w") as out:
+        for k, job in enumerate(jobs):
+            next_start = jobs[k + 1]["start"] if k + 1 < len(jobs) else None
+            warmup = {}
+            new_tail = {}
+            started = False
+            with open(job["result_path"]) as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record["frame_idx"] < job["own_start"]:
+                        warmup[record["frame_idx"]] = record["tracks"]
+                        continue
+                    if not started:
+                        stitcher.start_segment(tail, warmup)
+                        started = True
+                    record = stitcher.remap(record)
+                    out.write(json.dumps(record) + "\n")
+                    written += 1
+                    if next_start is not None and record["frame_idx"] >= next_start:
+                        new_tail[record["frame_idx"]] = record["tracks"]
+            tail = new_tail
+    return written
+
+
+def run_batch(video_paths: list, output_dir: str, workers: int = None, segment_frames: int = None,
+              overlap: int = 90, config: dict = None, mp_context: str = "spawn") -> dict:
+    """
+    Processes every video on a process pool and writes one `<name>.jsonl` per video,
+    plus `summary.json` in `output_dir`.
+
+    Args:
+        video_paths: Video files and/or directories of videos.
+        workers: Worker processes (defaults to the CPU count).
+        segment_frames: Split videos longer than this into ranges processed in parallel.
+        overlap: Frames each segment re-processes before its range. Keep it at least
+            as long as the longest event window (e.g. the 3 s dwell rule) so events are
+            not raised twice at a seam.
+        config: Worker settings: "ocr_interval", "queue_size", "analyzer" (EventAnalyzer kwargs).
+        mp_context: Multiprocessing start method; "spawn" is safe with GPU models.
+
+    Returns:
+        Summary dict with frame counts, throughput, output files and failures. A video
+        with a failed job gets no output, and its part files are removed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    videos = find_videos(video_paths)
+    jobs = plan_jobs(videos, segment_frames, overlap)
+    logger.info(f"Processing {len(videos)} videos as {len(jobs)} jobs")
+
+    started = time.perf_counter()
+    results, failed = [], []
+    total_frames = 0
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(mp_context),
+                               initializer=init_worker, initargs=(config,))
+    with pool:
+        futures = {pool.submit(process_job, job, output_dir): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            job = futures[future]
+            name = os.path.basename(job["video_path"])
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"[{done}/{len(jobs)}] {name} segment {job['segment']} failed: {e}")
+                failed.append(dict(job, error=str(e)))
+                continue
+            results.append(result)
+            total_frames += result["frames"]
+            elapsed = time.perf_counter() - started
+            logger.info(f"[{done}/{len(jobs)}] {name} segment {job['segment'] + 1}/{job['num_segments']}: "
+                        f"{result['frames']} frames at {result['frames'] / max(result['elapsed_s'], 1e-9):.1f} fps "
+                        f"({total_frames / elapsed:.1f} fps overall)")
+
+    by_video = defaultdict(list)
+    for result in results:
+        by_video[result["video_path"]].append(result)
+    failed_videos = {job["video_path"] for job in failed}
+    # Part files of a failed video (finished or partial) must not pass for results
+    for job in jobs:
+        path = result_path(output_dir, job)
+        if job["video_path"] in failed_videos and os.path.exists(path):
+            os.remove(path)
+
+    outputs = {}
+    for path, parts in by_video.items():
+        if path in failed_videos:
+            continue
+        parts.sort(key=lambda r: r["segment"])
+        if parts[0]["num_segments"] == 1:
+            outputs[path] = parts[0]["result_path"]
+            continue
+        stem = os.path.splitext(os.path.basename(path))[0]
+        outputs[path] = os.path.join(output_dir, f"{stem}.jsonl")
+        stitch_segments(parts, outputs[path])
+        for part in parts:
+            os.remove(part["result_path"])
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "videos": len(videos),
+        "jobs": len(jobs),
+        "frames": total_frames,
+        "elapsed_s": elapsed,
+        "fps": total_frames / elapsed if elapsed > 0 else 0.0,
+        "outputs": outputs,
+        "failed": failed
+    }
+    with open(os.path.join(output_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Batch-process videos across CPU cores")
+    parser.add_argument("inputs", nargs="+", help="Video files or directories")
+    parser.add_argument("--output_dir", type=str, default="results", help="Where per-video results are written")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--segment_frames", type=int, default=None, help="Split videos longer than this into parallel ranges")
+    parser.add_argument("--overlap", type=int, default=90, help="Warm-up frames re-processed before each segment")
+    parser.add_argument("--ocr_interval", type=int, default=30, help="Run OCR every N frames")
+    parser.add_argument("--stages", type=str, default="cluster,ocr,events",
+                        help="Comma-separated stages to run after tracking; models of other stages are never loaded")
+    args = parser.parse_args(argv)
+    stages = [name.strip() for name in args.stages.split(",") if name.strip()]
+    try:
+        resolve_stages(stages)
+    except ValueError as e:
+        parser.error(str(e))
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    summary = run_batch(args.inputs, args.output_dir, args.workers, args.segment_frames, args.overlap,
+                        config={"ocr_interval": args.ocr_interval, "stages": stages})
+    logger.info(f"{summary['frames']} frames from {summary['videos']} videos in {summary['elapsed_s']:.1f}s "
+                f"({summary['fps']:.1f} fps), {len(summary['failed'])} failed jobs")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
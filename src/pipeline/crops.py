@@ -0,0 +1,121 @@
+import threading
+import weakref
+from typing import Iterable, List
+import cv2
+import numpy as np
+
+
+def clip_boxes(bboxes, frame_shape: tuple) -> tuple:
+    """
+    Clips (N, 4) xyxy boxes to the frame in one pass.
+
+    Returns:
+        (clipped int64 boxes, bool mask of boxes with a non-empty area)
+    """
+    boxes = np.asarray(bboxes, dtype=np.int64).reshape(-1, 4)
+    h, w = frame_shape[:2]
+    clipped = np.empty_like(boxes)
+    clipped[:, 0::2] = np.clip(boxes[:, 0::2], 0, w)
+    clipped[:, 1::2] = np.clip(boxes[:, 1::2], 0, h)
+    valid = (clipped[:, 2] > clipped[:, 0]) & (clipped[:, 3] > clipped[:, 1])
+    return clipped, valid
+
+
+class CropBatch:
+    """
+    The crops of one frame's tracks, resized to `size` x `size` into a pooled
+    (N, size, size, 3) buffer. Crops are extracted on first access, so consumers that
+    only need some tracks (cache misses, pending OCR queries) share one extraction.
+    Degenerate boxes yield a black crop. Views stay valid until the last of the
+    batch's `consumers` has called `release`; a batch dropped before that (e.g. a
+    consumer stage skipped the frame) returns its buffer when it is garbage collected.
+    """
+    def __init__(self, pool: "CropPool", buffer: np.ndarray, frame: np.ndarray, bboxes, consumers: int = 1):
+        self.pool = pool
+        self.frame = frame
+        self.boxes, self.valid = clip_boxes(bboxes, frame.shape)
+        self.images = buffer[:len(self.boxes)]
+        self._ready = np.zeros(len(self.boxes), dtype=bool)
+        self._consumers = consumers
+        self._lock = threading.Lock()
+        self._give_back = weakref.finalize(self, pool._give, buffer)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        if not self._ready[i]:
+            # Consumers may run concurrently (parallel stage-graph branches)
+            with self._lock:
+                if not self._ready[i]:
+                    self._extract_one(i)
+        return self.images[i]
+
+    def extract(self, indices: Iterable[int] = None) -> List[np.ndarray]:
+        """
+        Extracts the crops at `indices` (all by default) and returns them as views.
+        """
+        indices = range(len(self)) if indices is None else indices
+        return [self[i] for i in indices]
+
+    def release(self) -> bool:
+        """
+        Marks one consumer as done; the last one returns the buffer to the pool, after
+        which views into it must not be used. Returns True for that last release.
+        """
+        with self._lock:
+            self._consumers -= 1
+            if self._consumers > 0:
+                return False
+        self._give_back()
+        return True
+
+    def _extract_one(self, i: int):
+        dst = self.images[i]
+        if self.valid[i]:
+            x1, y1, x2, y2 = self.boxes[i]
+            src = self.frame[y1:y2, x1:x2]
+            size = self.pool.size
+            shrink = src.shape[0] > size or src.shape[1] > size
+            cv2.resize(src, (size, size), dst=dst, interpolation=cv2.INTER_AREA if shrink else cv2.INTER_LINEAR)
+        else:
+            dst[:] = 0
+        self._ready[i] = True
+
+
+class CropPool:
+    """
+    Hands out reusable crop buffers so per-frame crop extraction does not allocate.
+    A buffer holds `capacity` crops and grows (power of two) when a frame has more
+    tracks; released buffers are kept for the next frames, up to `max_free` of them
+    (one per frame in flight between the crop stage and its last consumer).
+    """
+    def __init__(self, size: int = 224, capacity: int = 32, max_free: int = 8):
+        self.size = size
+        self.capacity = capacity
+        self.max_free = max_free
+        self.allocations = 0
+        self._free = []
+        self._lock = threading.Lock()
+
+    def batch(self, frame: np.ndarray, bboxes, consumers: int = 1) -> CropBatch:
+        """
+        Clips `bboxes` against `frame` and reserves a buffer for their crops, shared by
+        `consumers` stages that each release it.
+        """
+        return CropBatch(self, self._take(len(bboxes)), frame, bboxes, consumers)
+
+    def _take(self, n: int) -> np.ndarray:
+        with self._lock:
+            for i, buffer in enumerate(self._free):
+                if len(buffer) >= n:
+                    return self._free.pop(i)
+            while self.capacity < n:
+                self.capacity *= 2
+            self.allocations += 1
+        return np.empty((self.capacity, self.size, self.size, 3), dtype=np.uint8)
+
+    def _give(self, buffer: np.ndarray):
+        with self._lock:
+            if len(buffer) >= self.capacity and len(self._free) < self.max_free:
+                self._free.append(buffer)
@@ -0,0 +1,204 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Iterable, List, Optional
+from src.pipeline.metrics import NullMetrics
+
+# Marks the end of the frame stream as it flows through the queues.
+_STOP = object()
+
+
+class Stage:
+    """
+    A named step of the pipeline.
+    `fn` receives the per-frame context dict, updates it and returns it.
+    Stages with `workers > 1` process frames concurrently; their output is
+    re-ordered before being handed to the next stage, so only stateless
+    stages (e.g. rendering) should use more than one worker.
+    `on_skip` is called with the context instead of `fn` when a stage graph's
+    rate skips the stage for a frame (e.g. to release shared resources).
+    """
+    def __init__(self, name: str, fn: Callable[[dict], dict], workers: int = 1,
+                 on_skip: Callable[[dict], None] = None):
+        if workers < 1:
+            raise ValueError(f"Stage '{name}' needs at least one worker, got {workers}")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.on_skip = on_skip
+
+
+class _StageState:
+    """
+    Book-keeping shared by the workers of a single stage.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}  # seq -> ctx, finished but not yet forwarded
+        self.next_seq = 0
+        self.finished_workers = 0
+
+
+class Pipeline:
+    """
+    Multi-threaded frame executor.
+    Decoding, every stage and the sink run on their own threads, connected by
+    bounded queues. Frames reach the sink in the order the source produced them.
+    Pass a `PipelineMetrics` to record per-stage latency, memory and queue depths.
+    With `deadline_ms`, frames older than the deadline (measured from their
+    'capture_ts') skip the remaining stages and never reach the sink.
+    """
+    def __init__(self, stages: List[Stage], queue_size: int = 8, metrics=None, deadline_ms: float = None):
+        self.logger = logging.getLogger(__name__)
+        self.stages = stages
+        self.queue_size = queue_size
+        self.metrics = metrics or NullMetrics()
+        self.deadline = deadline_ms / 1000.0 if deadline_ms is not None else None
+        self._abort = threading.Event()
+        self._error = None
+
+    def run(self, source: Iterable, sink: Optional[Callable[[dict], None]] = None) -> int:
+        """
+        Pushes every frame of `source` through the stages.
+
+        Args:
+            source: Iterable of frames (numpy arrays), or of dicts holding at least
+                'frame' and optionally 'frame_idx' (may skip values, e.g. after drops)
+                and 'capture_ts' (time.monotonic() at capture, for end-to-end latency).
+            sink: Called with each finished context dict, in frame order.
+
+        Returns:
+            Number of frames that reached the sink.
+        """
+        self._abort.clear()
+        self._error = None
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._decode, args=(source, queues[0]), name="decode", daemon=True)]
+
+        for i, stage in enumerate(self.stages):
+            state = _StageState()
+            for w in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(stage, state, queues[i], queues[i + 1]),
+                    name=f"{stage.name}-{w}",
+                    daemon=True
+                ))
+
+        counter = [0]
+        threads.append(threading.Thread(target=self._drain, args=(queues[-1], sink, counter), name="sink", daemon=True))
+
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        if self._error is not None:
+            raise self._error
+        return counter[0]
+
+    def _decode(self, source: Iterable, out_q: queue.Queue):
+        metrics = self.metrics
+        frames = None
+        try:
+            frames = iter(source)
+            seq = 0
+            while True:
+                start = time.perf_counter()
+                item = next(frames, _STOP)
+                if item is _STOP:
+                    break
+                metrics.observe("decode", (time.perf_counter() - start) * 1000.0)
+                if isinstance(item, dict):
+                    ctx = {"seq": seq, "frame_idx": seq, **item}
+                else:
+                    ctx = {"seq": seq, "frame_idx": seq, "frame": item}
+                if not self._put(out_q, ctx):
+                    return
+                seq += 1
+        except Exception as e:
+            self._fail("decode", e)
+        finally:
+            if frames is not None and hasattr(frames, "close"):
+                frames.close()
+        self._put(out_q, _STOP)
+
+    def _work(self, stage: Stage, state: _StageState, in_q: queue.Queue, out_q: queue.Queue):
+        while True:
+            ctx = self._get(in_q)
+            if ctx is None:
+                return
+            if ctx is _STOP:
+                with state.lock:
+                    state.finished_workers += 1
+                    last = state.finished_workers == stage.workers
+                # Wake the sibling workers, the last one forwards the end marker.
+                self._put(out_q if last else in_q, _STOP)
+                return
+
+            self.metrics.set_queue_depth(stage.name, in_q.qsize())
+            if not ctx.get("late") and self._past_deadline(ctx):
+                ctx["late"] = True
+            if not ctx.get("late"):
+                try:
+                    with self.metrics.time(stage.name):
+                        ctx = stage.fn(ctx)
+                except Exception as e:
+                    self._fail(stage.name, e)
+                    return
+
+            with state.lock:
+                state.pending[ctx["seq"]] = ctx
+                while state.next_seq in state.pending:
+                    if not self._put(out_q, state.pending.pop(state.next_seq)):
+                        return
+                    state.next_seq += 1
+
+    def _drain(self, in_q: queue.Queue, sink: Optional[Callable[[dict], None]], counter: list):
+        while True:
+            ctx = self._get(in_q)
+            if ctx is None or ctx is _STOP:
+                return
+            self.metrics.set_queue_depth("sink", in_q.qsize())
+            if ctx.get("late"):
+                self.metrics.inc("frames_late")
+                continue
+            try:
+                if sink is not None:
+                    with self.metrics.time("sink"):
+                        sink(ctx)
+            except Exception as e:
+                self._fail("sink", e)
+                return
+            counter[0] += 1
+            self.metrics.inc("frames_processed")
+            if "capture_ts" in ctx:
+                self.metrics.observe("end_to_end", (time.monotonic() - ctx["capture_ts"]) * 1000.0)
+
+    def _past_deadline(self, ctx: dict) -> bool:
+        return self.deadline is not None and "capture_ts" in ctx and time.monotonic() - ctx["capture_ts"] > self.deadline
+
+    def _fail(self, where: str, error: Exception):
+        self.logger.error(f"Pipeline stage '{where}' failed: {error}")
+        if self._error is None:
+            self._error = error
+        self._abort.set()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
@@ -0,0 +1,219 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Dict, List
+from src.pipeline.engine import Stage
+
+EVERY_FRAME = "every_frame"
+ON_NEW_TRACK = "on_new_track"
+ON_DEMAND = "on_demand"
+
+
+def load_stage_graph(path: str) -> dict:
+    """
+    Reads a stage graph config from YAML.
+    """
+    import yaml
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def parse_rate(name: str, rate):
+    """
+    Normalizes a node's `rate` to EVERY_FRAME, ON_NEW_TRACK, ON_DEMAND or an int N (every N frames).
+    """
+    if rate is None or rate == EVERY_FRAME:
+        return EVERY_FRAME
+    if rate in (ON_NEW_TRACK, ON_DEMAND):
+        return rate
+    if isinstance(rate, dict) and set(rate) == {"every"}:
+        rate = rate["every"]
+    if isinstance(rate, int) and not isinstance(rate, bool) and rate >= 1:
+        return EVERY_FRAME if rate == 1 else rate
+    raise ValueError(f"Stage '{name}': invalid rate {rate!r}, expected every_frame, on_new_track, "
+                     f"on_demand or {{every: N}}")
+
+
+class _Node:
+    def __init__(self, stage: Stage, rate, depends_on: List[str], workers: int):
+        self.stage = stage
+        self.name = stage.name
+        self.rate = rate
+        self.depends_on = depends_on
+        self.workers = workers
+        self._seen = set()  # track ids this node has run for (ON_NEW_TRACK)
+        self._lock = threading.Lock()
+
+    def due(self, ctx: dict) -> bool:
+        if self.rate == EVERY_FRAME:
+            return True
+        if self.rate == ON_DEMAND:
+            return self.name in ctx.get("run", ())
+        if self.rate == ON_NEW_TRACK:
+            ids = {t['id'] for t in ctx.get("tracks", ())}
+            with self._lock:
+                new = ids - self._seen
+                self._seen |= new
+            return bool(new)
+        return ctx["frame_idx"] % self.rate == 0
+
+
+class StageGraph:
+    """
+    Stage dependency graph built from a config (usually YAML, see `load_stage_graph`)
+    over named pipeline stages, e.g. those of `build_stages`:
+
+        stages:
+          detect: {workers: 4}
+          track: {depends_on: [detect]}
+          crops: {depends_on: [track]}
+          cluster: {depends_on: [crops]}
+          ocr: {depends_on: [crops], rate: {every: 30}}
+          events: {depends_on: [cluster, ocr]}
+
+    A node's `rate` is `every_frame` (default), `{every: N}` (frames whose index is a
+    multiple of N), `on_new_track` (frames with a track id the node has not seen) or
+    `on_demand` (frames whose context lists the node in its 'run' set, added by the
+    source or an earlier stage). A skipped node's `Stage.on_skip` hook, if any, runs
+    instead. `workers` overrides the stage's worker count.
+
+    `to_stages` turns the graph into the linear stages run by `Pipeline`: nodes are
+    grouped into dependency levels, and the nodes of one level (independent branches
+    such as clustering and OCR) run concurrently on a shared thread pool. They share
+    the frame's context dict, so they must update it in place and write different keys.
+    Configured nodes missing from `stages` (e.g. disabled modules) are skipped and
+    their dependents inherit their dependencies. Every one of `stages` must be in the
+    config: the stages of `build_stages` feed each other, so none can be left out.
+    """
+    def __init__(self, config: dict, stages: Dict[str, Stage], known: set = (), metrics=None):
+        """
+        Args:
+            config: {'stages': {name: {'depends_on': [...], 'rate': ..., 'workers': n}}}.
+            stages: Available stages by name.
+            known: Other stage names the config may use although they are not available.
+            metrics: Optional PipelineMetrics; nodes of parallel levels are timed individually.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.metrics = metrics
+        specs = (config or {}).get("stages")
+        if not isinstance(specs, dict) or not specs:
+            raise ValueError("Stage graph config needs a non-empty 'stages' mapping")
+
+        for name, spec in specs.items():
+            if name not in stages and name not in known:
+                raise ValueError(f"Unknown stage '{name}' in stage graph")
+            for dep in (spec or {}).get("depends_on", []):
+                if dep not in specs:
+                    raise ValueError(f"Stage '{name}' depends on '{dep}', which is not in the graph")
+        missing = [name for name in stages if name not in specs]
+        if missing:
+            raise ValueError(f"Stage graph does not place the built stages: {', '.join(missing)}")
+
+        self.nodes = {}
+        for name, spec in specs.items():
+            spec = spec or {}
+            if name not in stages:
+                continue
+            stage = stages[name]
+            deps = self._available_deps(name, specs, stages)
+            workers = spec.get("workers", stage.workers)
+            self.nodes[name] = _Node(stage, parse_rate(name, spec.get("rate")), deps, workers)
+        self.levels = self._levels()
+        width = max((len(level) for level in self.levels), default=1)
+        self._pool = ThreadPoolExecutor(max_workers=width, thread_name_prefix="stage-graph") if width > 1 else None
+
+    def _available_deps(self, name: str, specs: dict, stages: dict, visiting: tuple = ()) -> List[str]:
+        if name in visiting:
+            raise ValueError(f"Stage graph has a cycle through '{name}'")
+        deps = []
+        for dep in (specs[name] or {}).get("depends_on", []):
+            for d in ([dep] if dep in stages else self._available_deps(dep, specs, stages, visiting + (name,))):
+                if d not in deps:
+                    deps.append(d)
+        return deps
+
+    def _levels(self) -> List[List[str]]:
+        # Longest-path layering: a node runs one level after its deepest dependency
+        depth = {}
+        visiting = set()
+
+        def level_of(name):
+            if name in depth:
+                return depth[name]
+            if name in visiting:
+                raise ValueError(f"Stage graph has a cycle through '{name}'")
+            visiting.add(name)
+            depth[name] = 1 + max((level_of(d) for d in self.nodes[name].depends_on), default=-1)
+            return depth[name]
+
+        for name in self.nodes:
+            level_of(name)
+        levels = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+        for name in self.nodes:  # config order within a level
+            levels[depth[name]].append(name)
+        return levels
+
+    def to_stages(self) -> List[Stage]:
+        """
+        One pipeline stage per level; parallel levels are named 'a+b'.
+        """
+        stages = []
+        for level in self.levels:
+            nodes = [self.nodes[name] for name in level]
+            if len(nodes) == 1:
+                node = nodes[0]
+                stages.append(Stage(node.name, self._run_single(node), workers=node.workers))
+            else:
+                # Stateful nodes need frames in order, so the level runs one frame at a time
+                workers = min(node.workers for node in nodes)
+                stages.append(Stage("+".join(level), self._run_parallel(nodes), workers=workers))
+        return stages
+
+    def close(self):
+        """
+        Stops the thread pool of the parallel levels; call it once the pipeline has run.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _run_single(self, node: _Node):
+        fn = node.stage.fn
+        if node.rate == EVERY_FRAME:
+            return fn
+
+        def run(ctx):
+            if node.due(ctx):
+                return fn(ctx)
+            self._skip(node, ctx)
+            return ctx
+        return run
+
+    @staticmethod
+    def _skip(node: _Node, ctx: dict):
+        if node.stage.on_skip is not None:
+            node.stage.on_skip(ctx)
+
+    def _run_parallel(self, nodes: List[_Node]):
+        def run(ctx):
+            due = []
+            for node in nodes:
+                if node.due(ctx):
+                    due.append(node)
+                else:
+                    self._skip(node, ctx)
+            if len(due) <= 1:
+                return self._call(due[0], ctx) if due else ctx
+            futures = [self._pool.submit(self._call, node, ctx) for node in due]
+            for future in futures:
+                future.result()  # re-raises a branch's exception
+            return ctx
+        return run
+
+    def _call(self, node: _Node, ctx: dict) -> dict:
+        with self.metrics.time(node.name) if self.metrics is not None else nullcontext():
+            result = node.stage.fn(ctx)
+        if result is not ctx and result is not None:
+            ctx.update(result)
+        return ctx
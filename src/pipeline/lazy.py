@@ -0,0 +1,28 @@
+import threading
+
+
+class LazyModelMixin:
+    """
+    Defers a model wrapper's `_load_model` until the model is first used.
+    Subclasses call `_init_model(lazy)` at the end of `__init__` and
+    `ensure_loaded()` at the top of every method that runs the model; with
+    `lazy=False` the model is loaded right away, as before. Loading happens once,
+    even when several pipeline workers hit the model at the same time.
+    """
+    def _init_model(self, lazy: bool = False):
+        self._model_lock = threading.Lock()
+        self._model_loaded = False
+        if not lazy:
+            self.ensure_loaded()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model_loaded
+
+    def ensure_loaded(self):
+        if self._model_loaded:
+            return
+        with self._model_lock:
+            if not self._model_loaded:
+                self._load_model()
+                self._model_loaded = True
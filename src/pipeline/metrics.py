@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+import numpy as np
+
+
+def _rss_bytes() -> int:
+    """
+    Resident set size of this process (Linux /proc, else peak RSS from getrusage).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LatencyHistogram:
+    """
+    Fixed log-spaced buckets (0.01 ms .. ~100 s) for cheap streaming percentiles.
+    Quantiles are reported as the upper edge of the bucket they fall in (<= 12% error).
+    """
+    EDGES = 0.01 * 1.12 ** np.arange(142)
+
+    def __init__(self):
+        self.counts = np.zeros(len(self.EDGES) + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float):
+        self.counts[np.searchsorted(self.EDGES, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        self.max = max(self.max, value_ms)
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q * self.count))
+        return float(self.EDGES[bucket]) if bucket < len(self.EDGES) else self.max
+
+
+class PipelineMetrics:
+    """
+    Per-stage latency histograms, queue depths, counters and the process RSS.
+    Stages are timed with `with metrics.time("detect"): ...`. With `trace_allocations`,
+    each stage also sums the change in tracemalloc's traced size while it ran. That
+    size is process-wide and stages run on concurrent threads, so the figure is
+    approximate: it includes whatever other threads allocated meanwhile. The RSS is
+    sampled per snapshot, off the hot path. Snapshots export as Prometheus text or
+    JSON lines.
+    """
+    enabled = True
+
+    def __init__(self, trace_allocations: bool = False):
+        self.logger = logging.getLogger(__name__)
+        self.trace_allocations = trace_allocations
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        self._lock = threading.Lock()
+        self.latency = {}        # stage -> LatencyHistogram
+        self.alloc_delta = {}    # stage -> summed traced-allocation delta (bytes, approximate)
+        self.queue_depth = {}    # queue name -> last observed depth
+        self.counters = {}       # name -> int
+        self.started = time.monotonic()
+
+    @contextmanager
+    def time(self, stage: str):
+        traced = tracemalloc.get_traced_memory()[0] if self.trace_allocations else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            alloc_delta = tracemalloc.get_traced_memory()[0] - traced if self.trace_allocations else 0
+            with self._lock:
+                self.latency.setdefault(stage, LatencyHistogram()).observe(elapsed_ms)
+                self.alloc_delta[stage] = self.alloc_delta.get(stage, 0) + alloc_delta
+
+    def observe(self, stage: str, elapsed_ms: float):
+        with self._lock:
+            self.latency.setdefault(stage, LatencyHistogram()).observe(elapsed_ms)
+
+    def set_queue_depth(self, name: str, depth: int):
+        self.queue_depth[name] = depth
+
+    def inc(self, counter: str, amount: int = 1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def snapshot(self) -> dict:
+        """
+        Point-in-time view of every metric as plain Python types.
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            stages = {
+                name: {
+                    "count": h.count,
+                    "mean_ms": h.total / h.count if h.count else 0.0,
+                    "p50_ms": h.quantile(0.50),
+                    "p95_ms": h.quantile(0.95),
+                    "p99_ms": h.quantile(0.99),
+                    "max_ms": h.max,
+                    "alloc_delta_bytes": int(self.alloc_delta.get(name, 0)),
+                }
+                for name, h in self.latency.items()
+            }
+            counters = dict(self.counters)
+        return {
+            "timestamp": time.time(),
+            "uptime_s": elapsed,
+            "throughput_fps": counters.get("frames_processed", 0) / elapsed if elapsed > 0 else 0.0,
+            "rss_bytes": _rss_bytes(),
+            "stages": stages,
+            "queue_depth": dict(self.queue_depth),
+            "counters": counters,
+        }
+
+    def to_prometheus(self) -> str:
+        """
+        Renders the current snapshot in the Prometheus text exposition format.
+        """
+        snap = self.snapshot()
+        lines = [
+            "# HELP pipeline_stage_latency_ms Stage latency in milliseconds.",
+            "# TYPE pipeline_stage_latency_ms summary",
+        ]
+        for stage, s in snap["stages"].items():
+            for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                lines.append(f'pipeline_stage_latency_ms{{stage="{stage}",quantile="{q}"}} {s[key]:.4f}')
+            lines.append(f'pipeline_stage_latency_ms_sum{{stage="{stage}"}} {s["mean_ms"] * s["count"]:.4f}')
+            lines.append(f'pipeline_stage_latency_ms_count{{stage="{stage}"}} {s["count"]}')
+
+        if self.trace_allocations:
+            lines += ["# HELP pipeline_stage_alloc_delta_bytes Summed process-wide traced allocation change while "
+                      "the stage ran (approximate: includes concurrent stages).",
+                      "# TYPE pipeline_stage_alloc_delta_bytes counter"]
+            lines += [f'pipeline_stage_alloc_delta_bytes{{stage="{stage}"}} {s["alloc_delta_bytes"]}' for stage, s in snap["stages"].items()]
+
+        lines += ["# HELP pipeline_queue_depth Items waiting in the queue feeding a stage.",
+                  "# TYPE pipeline_queue_depth gauge"]
+        lines += [f'pipeline_queue_depth{{queue="{name}"}} {depth}' for name, depth in snap["queue_depth"].items()]
+
+        for name, value in snap["counters"].items():
+            lines += [f"# TYPE pipeline_{name}_total counter", f"pipeline_{name}_total {value}"]
+
+        lines += ["# TYPE pipeline_throughput_fps gauge", f"pipeline_throughput_fps {snap['throughput_fps']:.4f}",
+                  "# HELP pipeline_rss_bytes Resident set size of the process.",
+                  "# TYPE pipeline_rss_bytes gauge", f"pipeline_rss_bytes {snap['rss_bytes']}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """
+        Atomically replaces `path` (e.g. for the node_exporter textfile collector).
+        """
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def append_jsonl(self, path: str):
+        with open(path, "a") as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+    def export(self, path: str, fmt: str = "prometheus"):
+        if fmt == "prometheus":
+            self.write_prometheus(path)
+        elif fmt == "jsonl":
+            self.append_jsonl(path)
+        else:
+            raise ValueError(f"Unknown metrics format: {fmt}")
+
+
+class NullMetrics:
+    """
+    Drop-in for PipelineMetrics that records nothing, for near-zero overhead.
+    """
+    enabled = False
+    _NULL = nullcontext()
+
+    def time(self, stage: str):
+        return self._NULL
+
+    def observe(self, stage: str, elapsed_ms: float):
+        pass
+
+    def set_queue_depth(self, name: str, depth: int):
+        pass
+
+    def inc(self, counter: str, amount: int = 1):
+        pass
+
+
+class MetricsReporter:
+    """
+    Exports a PipelineMetrics snapshot to `path` every `interval` seconds on a daemon thread.
+    """
+    def __init__(self, metrics: PipelineMetrics, path: str, fmt: str = "prometheus", interval: float = 10.0):
+        self.logger = logging.getLogger(__name__)
+        self.metrics = metrics
+        self.path = path
+        self.fmt = fmt
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-reporter", daemon=True)
+
+    def start(self) -> "MetricsReporter":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the thread and writes a final snapshot.
+        """
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.metrics.export(self.path, self.fmt)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.metrics.export(self.path, self.fmt)
+            except OSError as e:
+                self.logger.error(f"Failed to export metrics to {self.path}: {e}")
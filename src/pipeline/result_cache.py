@@ -0,0 +1,396 @@
+"""
+Disk-backed cache of per-frame stage results, so downstream stages (e.g. events
+with new thresholds or zones) can be re-run without recomputing detection,
+tracking, embeddings and OCR.
+
+Entries are keyed by (video fingerprint, stage name, stage config hash); the
+hash of a stage also covers every cached stage before it, so changing the
+detector invalidates tracks, embeddings and OCR as well. Each entry is a
+directory of .npy column files (one row per detection or track plus a frame
+index) that is memory-mapped on replay, so cache size does not bound RAM.
+
+    cache = StageResultCache("cache/", video_fingerprint("match.mp4"))
+    stages = cache.wrap(stages, configs)   # or build_stages(..., result_cache=cache)
+    source = cache.replay_source() or read_video("match.mp4")
+    Pipeline(stages).run(source, sink)
+    cache.close()   # only after a complete run: commits newly recorded entries
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+from src.pipeline.engine import Stage
+
+# Per stage: context key holding its rows and the fields stored for each row
+CACHEABLE_STAGES = {
+    "detect": ("detections", ("bbox", "label", "score", "class_id")),
+    "track": ("tracks", ("id", "bbox", "label", "class_id", "confidence")),
+    "cluster": ("tracks", ("id", "cluster_id", "embedding")),
+    "ocr": ("tracks", ("id", "ocr_text")),
+}
+# Stages that read pixels; once these are all replayed, frames need not be decoded
+PIXEL_STAGES = {"detect", "track", "crops", "cluster", "ocr", "visualize"}
+
+_DTYPES = {"bbox": np.int32, "score": np.float32, "class_id": np.int32, "id": np.int64,
+           "confidence": np.float32, "cluster_id": np.int32, "embedding": np.float32}
+_MISSING = {"score": np.nan, "confidence": np.nan, "class_id": -1, "cluster_id": -1, "label": "", "ocr_text": ""}
+META = "meta.json"
+
+
+def video_fingerprint(path: str, chunk_bytes: int = 1 << 20) -> str:
+    """
+    Content hash of a whole video file, read in chunks of `chunk_bytes`. Any edit
+    (a re-mux, new metadata) changes the key, and blake2b hashes far faster than
+    the detector it lets a re-run skip.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def config_hash(config) -> str:
+    """
+    Stable short hash of a JSON-serializable config.
+    """
+    text = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def module_config(*modules) -> dict:
+    """
+    The public scalar settings of pipeline modules (thresholds, model names, intervals),
+    as a config to hash for their stage.
+    """
+    config = {}
+    for module in modules:
+        if module is None:
+            continue
+        settings = {k: v for k, v in vars(module).items()
+                    if not k.startswith("_") and isinstance(v, (bool, int, float, str))}
+        config[type(module).__name__] = settings
+    return config
+
+
+class _EntryWriter:
+    """
+    Records one stage's rows frame by frame and writes them as columns on commit.
+    Frames are appended in pipeline order (by 'seq', whatever order workers finish in)
+    and spilled to part files every `chunk_frames` frames, so RAM stays bounded.
+    """
+    def __init__(self, directory: str, stage: str, meta: dict, chunk_frames: int = 1024):
+        self.directory = directory
+        self.stage = stage
+        self.meta = meta
+        self.chunk_frames = chunk_frames
+        self.tmp = f"{directory}.tmp"
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        os.makedirs(self.tmp)
+        self.fields = CACHEABLE_STAGES[stage][1]
+        self.parts = 0
+        self.frame_shape = None
+        self._lock = threading.Lock()
+        self._pending = {}  # seq -> (frame_idx, keyframe, rows)
+        self._next_seq = 0
+        self._reset()
+
+    def _reset(self):
+        self._frames = []
+        self._ran = []
+        self._keyframe = []
+        self._counts = []
+        self._columns = {f: [] for f in self.fields}
+
+    def record(self, ctx: dict, ran: bool = True):
+        """
+        Records the stage's rows for a frame; `ran=False` marks a frame its stage graph
+        rate skipped, which replays as a no-op.
+        """
+        rows_key = CACHEABLE_STAGES[self.stage][0]
+        rows = ctx.get(rows_key) if ran else []
+        keyframe = rows is not None
+        rows = rows or []
+        values = {f: [self._value(f, r, i, ctx) for i, r in enumerate(rows)] for f in self.fields}
+        with self._lock:
+            if self.frame_shape is None and ctx.get("frame") is not None:
+                self.frame_shape = list(ctx["frame"].shape)
+            self._pending[ctx["seq"]] = (ctx["frame_idx"], ran, keyframe, len(rows), values)
+            while self._next_seq in self._pending:
+                self._append(*self._pending.pop(self._next_seq))
+                self._next_seq += 1
+
+    def _value(self, field: str, row: dict, i: int, ctx: dict):
+        if field == "embedding":
+            embeddings = ctx.get("embeddings")
+            return embeddings[i] if embeddings is not None and i < len(embeddings) else None
+        value = row.get(field)
+        return _MISSING.get(field) if value is None else value
+
+    def _append(self, frame_idx: int, ran: bool, keyframe: bool, count: int, values: dict):
+        self._frames.append(frame_idx)
+        self._ran.append(ran)
+        self._keyframe.append(keyframe)
+        self._counts.append(count)
+        for f, v in values.items():
+            self._columns[f].extend(v)
+        if len(self._frames) >= self.chunk_frames:
+            self._spill()
+
+    def _spill(self):
+        if not self._frames:
+            return
+        arrays = {"frames": np.asarray(self._frames, dtype=np.int64),
+                  "ran": np.asarray(self._ran, dtype=bool),
+                  "keyframe": np.asarray(self._keyframe, dtype=bool),
+                  "counts": np.asarray(self._counts, dtype=np.int64)}
+        for f, values in self._columns.items():
+            arrays[f] = self._column(f, values)
+        np.savez(os.path.join(self.tmp, f"part_{self.parts:05d}.npz"), **arrays)
+        self.parts += 1
+        self._reset()
+
+    def _column(self, field: str, values: list) -> np.ndarray:
+        if field in ("label", "ocr_text"):
+            return np.asarray(values, dtype=str) if values else np.zeros(0, dtype="<U1")
+        if field == "embedding":
+            dim = next((len(v) for v in values if v is not None), 0)
+            out = np.zeros((len(values), dim), dtype=np.float32)
+            for i, v in enumerate(values):
+                if v is not None:
+                    out[i] = v
+            return out
+        arr = np.asarray(values, dtype=_DTYPES[field])
+        return arr.reshape(-1, 4) if field == "bbox" else arr
+
+    def commit(self):
+        """
+        Merges the parts into one memory-mappable .npy file per column and publishes the entry.
+        """
+        with self._lock:
+            for seq in sorted(self._pending):  # frames that skipped this stage (late) leave gaps
+                self._append(*self._pending.pop(seq))
+            self._spill()
+        parts = [os.path.join(self.tmp, f"part_{i:05d}.npz") for i in range(self.parts)]
+        columns = ("frames", "ran", "keyframe", "counts") + self.fields
+        shapes = {c: [] for c in columns}
+        dtypes = {}
+        for path in parts:
+            with np.load(path) as data:
+                for c in columns:
+                    shapes[c].append(data[c].shape)
+                    dtypes[c] = np.promote_types(dtypes.get(c, data[c].dtype), data[c].dtype)
+        for c in columns:
+            widths = {s[1:] for s in shapes[c] if s[0]}
+            width = max(widths, default=(0,) if c == "embedding" else (4,) if c == "bbox" else ())
+            total = sum(s[0] for s in shapes[c])
+            dtype = dtypes.get(c, np.float32)
+            out = np.lib.format.open_memmap(os.path.join(self.tmp, f"{c}.npy"), mode="w+", dtype=dtype,
+                                            shape=(total,) + tuple(width))
+            pos = 0
+            for path, shape in zip(parts, shapes[c]):
+                # (a part without any embedding has width 0 and keeps zero rows)
+                if shape[0] and shape[1:] == tuple(width):
+                    with np.load(path) as data:
+                        out[pos:pos + shape[0]] = data[c]
+                pos += shape[0]
+            out.flush()
+            del out
+        for path in parts:
+            os.remove(path)
+
+        counts = np.load(os.path.join(self.tmp, "counts.npy"))
+        np.save(os.path.join(self.tmp, "offsets.npy"), np.concatenate([[0], np.cumsum(counts)]).astype(np.int64))
+        meta = dict(self.meta, frames=int(len(counts)), rows=int(counts.sum()), frame_shape=self.frame_shape)
+        with open(os.path.join(self.tmp, META), "w") as f:
+            json.dump(meta, f, indent=2)
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(self.tmp, self.directory)
+
+    def abort(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+class _EntryReader:
+    """
+    Memory-mapped view of a committed entry.
+    """
+    def __init__(self, directory: str, stage: str):
+        self.stage = stage
+        with open(os.path.join(directory, META)) as f:
+            self.meta = json.load(f)
+        load = lambda name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        self.frames = load("frames")
+        self.ran = load("ran")
+        self.keyframe = load("keyframe")
+        self.offsets = load("offsets")
+        self.columns = {f: load(f) for f in CACHEABLE_STAGES[stage][1]}
+
+    def rows(self, frame_idx: int) -> Optional[tuple]:
+        """
+        (ran, keyframe, {field: rows}) for a frame, or None if it was not recorded.
+        """
+        i = int(np.searchsorted(self.frames, frame_idx))
+        if i >= len(self.frames) or self.frames[i] != frame_idx:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return bool(self.ran[i]), bool(self.keyframe[i]), {f: col[start:end] for f, col in self.columns.items()}
+
+    def replay(self, ctx: dict) -> dict:
+        found = self.rows(ctx["frame_idx"])
+        if found is None:
+            raise KeyError(f"Frame {ctx['frame_idx']} is missing from the '{self.stage}' cache")
+        ran, keyframe, cols = found
+        if not ran:
+            return ctx  # the recording run skipped the stage on this frame
+        n = len(cols[CACHEABLE_STAGES[self.stage][1][0]])
+        if self.stage == "detect":
+            ctx["keyframe"] = keyframe
+            ctx["detections"] = [
+                {"bbox": cols["bbox"][i].tolist(), "label": str(cols["label"][i]),
+                 "score": float(cols["score"][i]), "class_id": int(cols["class_id"][i])}
+                for i in range(n)
+            ] if keyframe else None
+            ctx.setdefault("detect_ms", 0.0)
+        elif self.stage == "track":
+            tracks = []
+            for i in range(n):
+                t = {"id": int(cols["id"][i]), "bbox": cols["bbox"][i].tolist(),
+                     "label": str(cols["label"][i]), "class_id": int(cols["class_id"][i])}
+                if not np.isnan(cols["confidence"][i]):
+                    t["confidence"] = float(cols["confidence"][i])
+                tracks.append(t)
+            ctx["tracks"] = tracks
+        elif self.stage == "cluster":
+            rows = {int(track_id): i for i, track_id in enumerate(cols["id"])}
+            for t in ctx["tracks"]:
+                i = rows.get(t['id'])
+                if i is not None and cols["cluster_id"][i] >= 0:
+                    t['cluster_id'] = int(cols["cluster_id"][i])
+            ctx["embeddings"] = np.asarray(cols["embedding"])
+        elif self.stage == "ocr":
+            texts = {int(track_id): str(text) for track_id, text in zip(cols["id"], cols["ocr_text"])}
+            for t in ctx["tracks"]:
+                if texts.get(t['id']):
+                    t['ocr_text'] = texts[t['id']]
+        return ctx
+
+
+class StageResultCache:
+    """
+    Cache of stage results for one video under `root`/`video_key`/<stage>-<hash>/.
+    `wrap` replaces stages that have a committed entry for their config with a replay
+    from disk and makes the others record their output; `close` commits what was
+    recorded, and must only be called after a complete, successful run.
+    """
+    def __init__(self, root: str, video_key: str, chunk_frames: int = 1024):
+        self.logger = logging.getLogger(__name__)
+        self.directory = os.path.join(root, video_key)
+        self.chunk_frames = chunk_frames
+        self.replayed = []
+        self._live_pixel_stages = set()
+        self._writers: List[_EntryWriter] = []
+        self._readers: Dict[str, _EntryReader] = {}
+
+    def entry_dir(self, stage: str, key: str) -> str:
+        return os.path.join(self.directory, f"{stage}-{key}")
+
+    def wrap(self, stages: List[Stage], configs: Dict[str, dict] = None) -> List[Stage]:
+        """
+        Args:
+            stages: Pipeline stages in order, e.g. from `build_stages`.
+            configs: Per stage name, the settings its output depends on (see `module_config`),
+                including any stage graph rate that makes it skip frames.
+
+        Returns:
+            The stages with cacheable ones replayed or recording. The "crops" stage is
+            dropped when every stage reading crops is replayed.
+        """
+        configs = configs or {}
+        chain = ""
+        wrapped = []
+        for stage in stages:
+            if stage.name not in CACHEABLE_STAGES:
+                wrapped.append(stage)
+                continue
+            chain = config_hash([chain, stage.name, configs.get(stage.name)])
+            directory = self.entry_dir(stage.name, chain)
+            if os.path.exists(os.path.join(directory, META)):
+                reader = _EntryReader(directory, stage.name)
+                self._readers[stage.name] = reader
+                self.replayed.append(stage.name)
+                wrapped.append(Stage(stage.name, self._replaying(reader, stage.on_skip), workers=stage.workers,
+                                     on_skip=stage.on_skip))
+            else:
+                meta = {"stage": stage.name, "key": chain, "config": configs.get(stage.name)}
+                writer = _EntryWriter(directory, stage.name, meta, self.chunk_frames)
+                self._writers.append(writer)
+                wrapped.append(Stage(stage.name, self._recording(stage.fn, writer), workers=stage.workers,
+                                     on_skip=self._skipping(stage.on_skip, writer)))
+        if self.replayed:
+            self.logger.info(f"Replaying cached stages: {', '.join(self.replayed)}")
+
+        crop_readers = {"cluster", "ocr"} & {s.name for s in wrapped}
+        if crop_readers and crop_readers <= set(self.replayed):
+            wrapped = [s for s in wrapped if s.name != "crops"]
+        self._live_pixel_stages = {s.name for s in wrapped if s.name in PIXEL_STAGES} - set(self.replayed)
+        return wrapped
+
+    @staticmethod
+    def _recording(fn, writer: _EntryWriter):
+        def run(ctx):
+            ctx = fn(ctx)
+            writer.record(ctx)
+            return ctx
+        return run
+
+    @staticmethod
+    def _skipping(on_skip, writer: _EntryWriter):
+        def skip(ctx):
+            if on_skip is not None:
+                on_skip(ctx)
+            writer.record(ctx, ran=False)
+        return skip
+
+    @staticmethod
+    def _replaying(reader: _EntryReader, on_skip):
+        # The stage's own work is skipped, so its skip hook runs (e.g. releasing shared crops)
+        def run(ctx):
+            ctx = reader.replay(ctx)
+            if on_skip is not None:
+                on_skip(ctx)
+            return ctx
+        return run
+
+    def replay_source(self) -> Optional[Iterator[dict]]:
+        """
+        A frame-less source over the cached frames when no stage left by `wrap` reads
+        pixels (every such stage is replayed), else None. Contexts carry 'frame_shape'
+        and 'frame' set to None.
+        """
+        if not self.replayed or self._live_pixel_stages:
+            return None
+        reader = self._readers[self.replayed[0]]
+        shape = reader.meta.get("frame_shape")
+        return ({"frame_idx": int(f), "frame": None, "frame_shape": shape} for f in reader.frames)
+
+    def close(self):
+        """
+        Commits every entry recorded during the run.
+        """
+        for writer in self._writers:
+            writer.commit()
+            self.logger.info(f"Cached '{writer.stage}' results in {writer.directory}")
+        self._writers = []
+
+    def abort(self):
+        """
+        Discards what was recorded (e.g. after a failed or partial run).
+        """
+        for writer in self._writers:
+            writer.abort()
+        self._writers = []
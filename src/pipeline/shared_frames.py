@@ -0,0 +1,292 @@
+import queue
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Iterator
+import numpy as np
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Opens an existing block without handing it to this process's resource tracker,
+    which would otherwise unlink it when the first attached process exits.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        # Processes started by multiprocessing share the creator's tracker, which keeps
+        # one entry per name: attaching re-adds it, and unregistering here would drop the
+        # creator's entry (its unlink then trips a KeyError in the tracker)
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedFrameRing:
+    """
+    Ring of preallocated frame slots in shared memory for handing frames between
+    processes without pickling them.
+    The producer writes a frame into a free slot and passes only the slot index
+    through its queues; consumers read the slot as a NumPy view. Each published slot
+    carries a reference count (one per consumer) and is reused only once every
+    consumer has released it.
+
+    Instances are passed to worker processes when they are started (Process args
+    or a pool initializer), which attaches them to the same memory and locks.
+
+        ring = SharedFrameRing(8, (1080, 1920, 3), consumers=2)
+        slot = ring.write(frame, frame_idx)   # producer
+        frame = ring.view(slot)               # consumer, zero-copy
+        ring.release(slot)                    # consumer done
+    """
+    def __init__(self, num_slots: int, frame_shape: tuple, dtype=np.uint8, consumers: int = 1, ctx=None):
+        """
+        Args:
+            num_slots: Frames that can be in flight at once.
+            frame_shape: Shape of every frame, e.g. (height, width, 3).
+            dtype: Pixel dtype.
+            consumers: Default number of releases before a published slot is free again.
+            ctx: multiprocessing context used for the lock (default context if None).
+        """
+        if num_slots < 1:
+            raise ValueError(f"num_slots must be >= 1, got {num_slots}")
+        self.logger = logging.getLogger(__name__)
+        self.num_slots = num_slots
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.consumers = consumers
+
+        frame_bytes = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        self._frames_shm = shared_memory.SharedMemory(create=True, size=max(frame_bytes * num_slots, 1))
+        self._meta_shm = shared_memory.SharedMemory(create=True, size=num_slots * 2 * 8)
+        self._cond = (ctx or multiprocessing).Condition()
+        self._owner = True
+        self._map()
+        self.refcounts[:] = 0
+        self.frame_idx[:] = -1
+
+    def _map(self):
+        self.frames = np.ndarray((self.num_slots,) + self.frame_shape, dtype=self.dtype, buffer=self._frames_shm.buf)
+        meta = np.ndarray((2, self.num_slots), dtype=np.int64, buffer=self._meta_shm.buf)
+        self.refcounts = meta[0]   # -1 while being written, 0 free, > 0 pending consumers
+        self.frame_idx = meta[1]
+        self._next = 0
+
+    def __getstate__(self):
+        return {
+            "num_slots": self.num_slots,
+            "frame_shape": self.frame_shape,
+            "dtype": self.dtype.str,
+            "consumers": self.consumers,
+            "frames_name": self._frames_shm.name,
+            "meta_name": self._meta_shm.name,
+            "cond": self._cond,
+        }
+
+    def __setstate__(self, state):
+        self.logger = logging.getLogger(__name__)
+        self.num_slots = state["num_slots"]
+        self.frame_shape = state["frame_shape"]
+        self.dtype = np.dtype(state["dtype"])
+        self.consumers = state["consumers"]
+        self._frames_shm = _attach(state["frames_name"])
+        self._meta_shm = _attach(state["meta_name"])
+        self._cond = state["cond"]
+        self._owner = False
+        self._map()
+
+    def acquire(self, timeout: float = None) -> int:
+        """
+        Reserves a free slot for writing, waiting up to `timeout` seconds for one.
+        Raises TimeoutError if none became free.
+        """
+        with self._cond:
+            slot = self._find_free()
+            while slot is None:
+                if not self._cond.wait(timeout):
+                    raise TimeoutError("No free frame slot")
+                slot = self._find_free()
+            self.refcounts[slot] = -1
+            return slot
+
+    def publish(self, slot: int, frame_idx: int = -1, refs: int = None):
+        """
+        Hands a written slot to `refs` consumers (default: `consumers`).
+        """
+        with self._cond:
+            self.frame_idx[slot] = frame_idx
+            self.refcounts[slot] = self.consumers if refs is None else refs
+            if self.refcounts[slot] == 0:
+                self._cond.notify_all()
+
+    def write(self, frame: np.ndarray, frame_idx: int = -1, refs: int = None, timeout: float = None) -> int:
+        """
+        Copies `frame` into a free slot and publishes it. Returns the slot index.
+        """
+        slot = self.acquire(timeout)
+        try:
+            self.frames[slot] = frame
+        except Exception:
+            self.publish(slot, refs=0)
+            raise
+        self.publish(slot, frame_idx, refs)
+        return slot
+
+    def view(self, slot: int) -> np.ndarray:
+        """
+        Zero-copy view of a slot; only valid until this consumer releases it.
+        """
+        return self.frames[slot]
+
+    def retain(self, slot: int, count: int = 1):
+        """
+        Adds consumers to a published slot (e.g. when a frame is forwarded to an extra stage).
+        """
+        with self._cond:
+            if self.refcounts[slot] <= 0:
+                raise ValueError(f"Slot {slot} is not published")
+            self.refcounts[slot] += count
+
+    def release(self, slot: int):
+        """
+        Marks one consumer as done with the slot; the last release frees it.
+        """
+        with self._cond:
+            if self.refcounts[slot] <= 0:
+                raise ValueError(f"Slot {slot} released more often than it was published")
+            self.refcounts[slot] -= 1
+            if self.refcounts[slot] == 0:
+                self._cond.notify_all()
+
+    @property
+    def free_slots(self) -> int:
+        with self._cond:
+            return int(np.count_nonzero(self.refcounts == 0))
+
+    def close(self):
+        """
+        Detaches this process; the creating process also frees the shared memory.
+        """
+        # Views into the buffers must be gone before the mapping can be closed
+        self.frames = self.refcounts = self.frame_idx = None
+        self._frames_shm.close()
+        self._meta_shm.close()
+        if self._owner:
+            self._frames_shm.unlink()
+            self._meta_shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _find_free(self):
+        # Round-robin from the last written slot, so slots are reused oldest first
+        for i in range(self.num_slots):
+            slot = (self._next + i) % self.num_slots
+            if self.refcounts[slot] == 0:
+                self._next = (slot + 1) % self.num_slots
+                return slot
+        return None
+
+
+def _decode_into(ring: SharedFrameRing, video_path: str, slots, stop, max_frames: int = None):
+    """
+    Decode process of `SharedFrameSource`: writes each frame into the ring and passes
+    its slot index on; ends with None, or with the error message if decoding failed.
+    """
+    from src.pipeline.video_io import read_video
+
+    try:
+        for frame_idx, frame in enumerate(read_video(video_path, max_frames)):
+            slot = None
+            while slot is None:
+                if stop.is_set():
+                    return
+                try:
+                    slot = ring.acquire(timeout=0.1)
+                except TimeoutError:
+                    continue
+            ring.frames[slot] = frame
+            ring.publish(slot, frame_idx)
+            slots.put(slot)
+        slots.put(None)
+    except Exception as e:
+        slots.put(f"{type(e).__name__}: {e}")
+    finally:
+        ring.close()
+
+
+class SharedFrameSource:
+    """
+    Pipeline source decoding a video in a separate process into a `SharedFrameRing`:
+    only slot indices cross the process boundary, and the pipeline reads every frame
+    in place. Items are dicts with 'frame_idx', 'frame' (a view of the slot) and
+    'frame_slot'. The slot stays reserved until `release(ctx)`, normally called by
+    the sink once the writer and exporters are done with the frame; with all
+    `num_slots` frames in flight the decoder waits. Stages must not keep a frame past
+    its context, and `close()` frees the ring once the pipeline has run.
+
+        source = SharedFrameSource("match.mp4", num_slots=16)
+        try:
+            Pipeline(stages).run(source, lambda ctx: (writer(ctx), source.release(ctx)))
+        finally:
+            source.close()
+    """
+    def __init__(self, video_path: str, num_slots: int = 16, max_frames: int = None, mp_context: str = "spawn"):
+        from src.pipeline.video_io import video_frame_shape
+
+        self.logger = logging.getLogger(__name__)
+        self.video_path = video_path
+        self.max_frames = max_frames
+        self._ctx = multiprocessing.get_context(mp_context)
+        self.ring = SharedFrameRing(num_slots, video_frame_shape(video_path), consumers=1, ctx=self._ctx)
+        self._slots = self._ctx.Queue()
+        self._stop = self._ctx.Event()
+        self._process = None
+
+    def __iter__(self) -> Iterator[dict]:
+        self._process = self._ctx.Process(target=_decode_into, name="frame-decoder", daemon=True,
+                                          args=(self.ring, self.video_path, self._slots, self._stop, self.max_frames))
+        self._process.start()
+        try:
+            while True:
+                try:
+                    item = self._slots.get(timeout=1.0)
+                except queue.Empty:
+                    if not self._process.is_alive():
+                        raise RuntimeError(f"Decode process exited with code {self._process.exitcode}")
+                    continue
+                if item is None:
+                    return
+                if isinstance(item, str):
+                    raise RuntimeError(f"Decoding {self.video_path} failed: {item}")
+                yield {"frame_idx": int(self.ring.frame_idx[item]), "frame": self.ring.view(item), "frame_slot": item}
+        finally:
+            self.stop()
+
+    def release(self, ctx: dict):
+        """
+        Frees the slot of a frame from this source (no-op for other contexts).
+        """
+        slot = ctx.pop("frame_slot", None)
+        if slot is not None:
+            self.ring.release(slot)
+
+    def stop(self):
+        """
+        Stops the decode process (also called when iteration ends or is abandoned).
+        """
+        self._stop.set()
+        if self._process is not None:
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+            self._process = None
+
+    def close(self):
+        """
+        Stops decoding and frees the shared memory; frames already yielded become invalid.
+        """
+        self.stop()
+        self.ring.close()
@@ -0,0 +1,215 @@
+import time
+
+from src.pipeline.engine import Stage
+from src.pipeline.crops import CropPool
+from src.pipeline.graph import StageGraph, parse_rate, EVERY_FRAME
+
+# Optional stages and the stages whose output they read ("detect" always runs)
+STAGE_DEPENDENCIES = {
+    "detect": (),
+    "track": ("detect",),
+    "cluster": ("track",),
+    "ocr": ("track",),
+    "homography": ("track",),
+    "events": ("track",),
+    "visualize": ("track",),
+}
+
+
+def resolve_stages(names) -> set:
+    """
+    The requested stage names plus every stage they depend on.
+    Raises ValueError for unknown names.
+    """
+    enabled = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in STAGE_DEPENDENCIES:
+            raise ValueError(f"Unknown stage '{name}', expected one of {sorted(STAGE_DEPENDENCIES)}")
+        if name not in enabled:
+            enabled.add(name)
+            pending.extend(STAGE_DEPENDENCIES[name])
+    return enabled
+
+
+def _release_crops(ctx):
+    # The last crop consumer drops the batch, whose buffer is back in the pool
+    # (there is none when every crop consumer replays cached results)
+    batch = ctx.get("crops")
+    if batch is not None and batch.release():
+        del ctx["crops"]
+
+
+def build_stages(detector, segmenter, identifier, reader, analyzer, visualizer,
+                 ocr_interval: int = 30, render_workers: int = 1, detect_workers: int = 1,
+                 ocr_service=None, transformer=None, minimap_size: tuple = None, keyframes=None,
+                 crop_pool: CropPool = None, graph: dict = None,
+                 result_cache=None, cache_configs: dict = None) -> list:
+    """
+    Wraps the pipeline modules into the ordered list of stages run by `Pipeline`.
+    Every stage reads and extends the per-frame context dict
+    ('frame_idx', 'frame' -> 'detections', 'tracks', 'events', 'recent_events', 'out_frame').
+    `detector` may be a `MicroBatcher`; give it `detect_workers` >= its batch size
+    so enough frames are in flight to fill a batch.
+    With an `ocr_service` (OCRService), OCR runs asynchronously instead of every
+    `ocr_interval` frames and readings show up on tracks in later frames.
+    With a `transformer`, tracks get 'map_xy' before events are evaluated, and
+    `minimap_size` (width, height) adds a top-down inset to the rendered frame.
+    Without a `visualizer` (headless), no frame is rendered and 'out_frame' is not set.
+    With a `keyframes` scheduler (KeyframeScheduler), the detector only runs on
+    keyframes ('keyframe' in the context) and the segmenter propagates tracks on the
+    frames in between; the detect + track latency of every frame is reported back.
+    The "crops" stage extracts every crop the identifier and OCR need for a frame in
+    one pass into a pooled buffer (`crop_pool`), shared by both; the last of them
+    releases it and removes 'crops' from the context.
+    Modules passed as None drop their stage: no `segmenter` leaves detection only, and
+    without an `identifier`, a `reader`/`ocr_service` or an `analyzer` there is no
+    cluster, ocr or events stage (and no 'events' in the context). See `resolve_stages`.
+    With a `graph` config (see `StageGraph`), stage order, execution rates and
+    parallel branches come from the graph instead: `ocr_interval` is then ignored in
+    favour of the ocr node's rate (which must be every_frame with an `ocr_service`,
+    whose own retry interval decides what is read), and the returned stages are the graph's nodes, to
+    be arranged by `build_graph`.
+    With a `result_cache` (StageResultCache), detect, track, cluster and ocr replay
+    results cached for their `cache_configs` entry (plus the OCR interval and any graph
+    rate), or record them for the next run.
+    """
+    crop_pool = crop_pool or CropPool()
+    if segmenter is None and keyframes is not None:
+        raise ValueError("Keyframe scheduling needs a segmenter to propagate tracks")
+    use_ocr = reader is not None or ocr_service is not None
+    if graph is not None and ocr_service is not None:
+        # A skipped ocr node would also skip attaching the service's readings to tracks
+        spec = (graph.get("stages") or {}).get("ocr") or {}
+        if parse_rate("ocr", spec.get("rate")) != EVERY_FRAME:
+            raise ValueError("With an OCR service the stage graph's ocr node must run every frame; "
+                             "the service's retry interval decides when tracks are read")
+    crop_consumers = (identifier is not None) + use_ocr
+    # Under a graph, the ocr node's rate decides on which frames OCR runs
+    ocr_every = 1 if graph is not None else ocr_interval
+
+    def detect(ctx):
+        start = time.perf_counter()
+        ctx["keyframe"] = keyframes is None or keyframes.is_keyframe(ctx["frame_idx"], ctx["frame"], segmenter.min_confidence)
+        ctx["detections"] = detector.detect(ctx["frame"]) if ctx["keyframe"] else None
+        ctx["detect_ms"] = (time.perf_counter() - start) * 1000.0
+        return ctx
+
+    def track(ctx):
+        start = time.perf_counter()
+        if ctx["detections"] is None:
+            ctx["tracks"] = segmenter.propagate(ctx["frame_idx"], ctx["frame"])
+        else:
+            ctx["tracks"] = segmenter.track_objects(ctx["frame_idx"], ctx["frame"], ctx["detections"])
+        if keyframes is not None:
+            keyframes.report_latency(ctx["detect_ms"] + (time.perf_counter() - start) * 1000.0)
+        return ctx
+
+    def crops(ctx):
+        tracks = ctx["tracks"]
+        frame_idx = ctx["frame_idx"]
+        batch = crop_pool.batch(ctx["frame"], [t['bbox'] for t in tracks], consumers=crop_consumers)
+        needed = set(identifier.tracks_to_embed(tracks, frame_idx)) if identifier is not None else set()
+        if ocr_service is not None:
+            needed.update(i for i, t in enumerate(tracks) if ocr_service.should_query(t['id'], frame_idx))
+        elif reader is not None and graph is None and frame_idx % ocr_interval == 0:
+            # (under a graph, OCR crops are extracted lazily if the ocr node runs)
+            needed.update(range(len(tracks)))
+        batch.extract(sorted(needed))
+        ctx["crops"] = batch
+        return ctx
+
+    def cluster(ctx):
+        tracks = ctx["tracks"]
+        embeddings = identifier.embed_tracks(ctx["frame"], tracks, ctx["frame_idx"], ctx["crops"])
+        ctx["embeddings"] = embeddings
+        _release_crops(ctx)
+        cluster_labels = identifier.cluster_embeddings(embeddings)
+
+        # updates tracks with cluster info
+        for i, t in enumerate(tracks):
+            if i < len(cluster_labels):
+                t['cluster_id'] = int(cluster_labels[i])
+        return ctx
+
+    def ocr(ctx):
+        batch = ctx["crops"]
+        try:
+            if ocr_service is not None:
+                for i, t in enumerate(ctx["tracks"]):
+                    if batch.valid[i] and ocr_service.should_query(t['id'], ctx["frame_idx"]):
+                        ocr_service.submit(t['id'], batch[i], ctx["frame_idx"])
+                ocr_service.annotate(ctx["tracks"], ctx["frame_idx"])
+                return ctx
+
+            # On demand, e.g. every `ocr_interval` frames
+            if ctx["frame_idx"] % ocr_every == 0:
+                for i, t in enumerate(ctx["tracks"]):
+                    if batch.valid[i]:
+                        text = reader.read_text(batch[i])
+                        if text:
+                            t['ocr_text'] = text
+        finally:
+            _release_crops(ctx)
+        return ctx
+
+    def homography(ctx):
+        transformer.project_tracks(ctx["tracks"])
+        return ctx
+
+    def events(ctx):
+        # Only the events raised in this frame
+        ctx["events"] = analyzer.update(ctx["tracks"], ctx["frame_idx"])
+        if visualizer is not None:
+            # Snapshot for the overlay now: the render workers lag behind the analyzer
+            ctx["recent_events"] = analyzer.recent_events(ctx["frame_idx"], visualizer.event_ttl_frames)
+        return ctx
+
+    def visualize(ctx):
+        # Warp before drawing: an in-place visualizer annotates ctx["frame"] itself
+        minimap = transformer.warp_to_map(ctx["frame"], minimap_size) if minimap_size is not None else None
+        ctx["out_frame"] = visualizer.draw(ctx["frame"], ctx["tracks"], ctx.get("recent_events", []), ctx["frame_idx"])
+        if minimap is not None:
+            visualizer.draw_minimap(ctx["out_frame"], minimap, ctx["tracks"])
+        return ctx
+
+    stages = [Stage("detect", detect, workers=detect_workers)]
+    if segmenter is not None:
+        stages.append(Stage("track", track))
+        if crop_consumers:
+            stages.append(Stage("crops", crops))
+        if identifier is not None:
+            stages.append(Stage("cluster", cluster, on_skip=_release_crops))
+        if use_ocr:
+            stages.append(Stage("ocr", ocr, on_skip=_release_crops))
+        if transformer is not None:
+            stages.append(Stage("homography", homography))
+        if analyzer is not None:
+            stages.append(Stage("events", events))
+        if visualizer is not None:
+            stages.append(Stage("visualize", visualize, workers=render_workers))
+
+    if result_cache is not None:
+        cache_configs = dict(cache_configs or {})
+        if reader is not None and ocr_service is None:
+            cache_configs["ocr"] = {"config": cache_configs.get("ocr"), "every": ocr_every}
+        if graph is not None:
+            # A stage that skips frames records different results than one running on all
+            specs = graph.get("stages") or {}
+            for name in {s.name for s in stages}:
+                rate = parse_rate(name, (specs.get(name) or {}).get("rate"))
+                if rate != EVERY_FRAME:
+                    cache_configs[name] = {"config": cache_configs.get(name), "rate": rate}
+        stages = result_cache.wrap(stages, cache_configs)
+    return stages
+
+
+def build_graph(stages: list, graph: dict, metrics=None) -> StageGraph:
+    """
+    Arranges the stages of `build_stages(..., graph=graph)` by the `graph` config;
+    `metrics` times each node of a parallel level. The caller owns the returned
+    `StageGraph`: run its `to_stages()` and `close()` it after the run.
+    """
+    known = set(STAGE_DEPENDENCIES) | {"crops"}
+    return StageGraph(graph, {s.name: s for s in stages}, known=known, metrics=metrics)
@@ -0,0 +1,242 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Iterator, List
+import cv2
+import numpy as np
+
+# Team jersey colors (BGR); objects alternate between them so clustering has two groups
+TEAM_COLORS = ((40, 40, 200), (200, 160, 40))
+SHORTS_COLORS = ((20, 20, 100), (100, 80, 20))
+OCCLUDER_COLOR = (90, 90, 90)
+# Visibility is estimated on a grid this many times coarser than the frame
+_VISIBILITY_SCALE = 4
+
+
+def _triangle(s: np.ndarray, length: np.ndarray) -> np.ndarray:
+    """
+    Folds positions into [0, length], bouncing off both ends.
+    """
+    length = np.maximum(length, 1e-6)
+    return length - np.abs(np.mod(s, 2 * length) - length)
+
+
+class SyntheticScene:
+    """
+    Seeded synthetic video with `num_objects` moving, person-sized boxes and exact
+    ground truth. Objects bounce around the frame at constant speeds, a `churn`
+    fraction of them enters from the frame edge and leaves again part-way through,
+    and static occluders (pillars) plus nearer objects hide parts of others.
+
+    The frame index is stamped into pixel (0, 0) so `SyntheticDetector` can recover
+    it from an uncompressed frame. Everything is a function of (seed, frame index):
+    two scenes with the same arguments produce identical frames and ground truth.
+    """
+    def __init__(self, num_objects: int = 20, width: int = 1280, height: int = 720, num_frames: int = 300,
+                 seed: int = 0, num_occluders: int = 3, churn: float = 0.3, speed: tuple = (1.0, 6.0)):
+        if not 1 <= num_objects <= 1000:
+            raise ValueError(f"num_objects must be between 1 and 1000, got {num_objects}")
+        self.logger = logging.getLogger(__name__)
+        self.num_objects = num_objects
+        self.width = width
+        self.height = height
+        self.num_frames = num_frames
+
+        rng = np.random.default_rng(seed)
+        k = num_objects
+        # Person-sized boxes, scaled with the frame
+        self.sizes = np.stack([rng.uniform(0.02, 0.05, k) * width, rng.uniform(0.08, 0.18, k) * height], axis=1)
+        travel = np.array([width, height], dtype=np.float64) - self.sizes
+        self.start = rng.uniform(0, 1, (k, 2)) * travel
+        angle = rng.uniform(0, 2 * np.pi, k)
+        self.velocity = rng.uniform(speed[0], speed[1], k)[:, None] * np.stack([np.cos(angle), np.sin(angle)], axis=1)
+
+        # Entries and exits: churning objects appear at the left or right edge heading inwards
+        self.enter = np.zeros(k, dtype=np.int64)
+        self.exit = np.full(k, np.iinfo(np.int64).max)
+        churning = rng.uniform(0, 1, k) < churn
+        n = int(churning.sum())
+        self.enter[churning] = rng.integers(0, max(num_frames, 1), n)
+        self.exit[churning] = self.enter[churning] + rng.integers(max(num_frames // 4, 1), max(num_frames, 2), n)
+        from_left = rng.uniform(0, 1, n) < 0.5
+        self.start[churning, 0] = np.where(from_left, 0.0, travel[churning, 0])
+        self.velocity[churning, 0] = np.abs(self.velocity[churning, 0]) * np.where(from_left, 1, -1)
+
+        self.teams = (np.arange(k) % 2).tolist()
+        self.occluders = [
+            (int(x), 0, int(x + width * 0.03), int(height * rng.uniform(0.5, 1.0)))
+            for x in rng.uniform(0, width * 0.97, num_occluders)
+        ]
+
+        # Static background (pitch with a few lines), rendered once
+        self.background = np.empty((height, width, 3), dtype=np.uint8)
+        self.background[:] = (40, 110, 40)
+        self.background[:, ::max(width // 8, 1)] = (200, 200, 200)
+        self.background[height // 2] = (200, 200, 200)
+
+        # The source and the detector both ask for each frame's ground truth
+        self._truth = OrderedDict()
+        self._truth_lock = threading.Lock()
+
+    def boxes(self, frame_idx: int) -> tuple:
+        """
+        Ground-truth (K, 4) float boxes at `frame_idx` and the mask of objects in the scene.
+        """
+        travel = np.array([self.width, self.height], dtype=np.float64) - self.sizes
+        t = frame_idx - self.enter
+        xy = _triangle(self.start + self.velocity * t[:, None], travel)
+        present = (t >= 0) & (frame_idx < self.exit)
+        return np.concatenate([xy, xy + self.sizes], axis=1), present
+
+    def _depth_order(self, boxes: np.ndarray, present: np.ndarray) -> np.ndarray:
+        # Painter's order: objects lower in the frame are nearer the camera and drawn last
+        idx = np.flatnonzero(present)
+        return idx[np.argsort(boxes[idx, 3], kind="stable")]
+
+    def ground_truth(self, frame_idx: int) -> List[dict]:
+        """
+        Objects present at `frame_idx` with their integer box and visible fraction
+        (after occlusion by occluders and nearer objects), in id order.
+        """
+        with self._truth_lock:
+            if frame_idx in self._truth:
+                return self._truth[frame_idx]
+        truth = self._ground_truth(frame_idx)
+        with self._truth_lock:
+            self._truth[frame_idx] = truth
+            if len(self._truth) > 64:
+                self._truth.popitem(last=False)
+        return truth
+
+    def _ground_truth(self, frame_idx: int) -> List[dict]:
+        boxes, present = self.boxes(frame_idx)
+        order = self._depth_order(boxes, present)
+
+        s = _VISIBILITY_SCALE
+        ids = np.zeros((self.height // s + 1, self.width // s + 1), dtype=np.int32)
+        cells = np.round(boxes / s).astype(np.int64)
+        for k in order.tolist():
+            x1, y1, x2, y2 = cells[k].tolist()
+            ids[y1:y2, x1:x2] = k + 1
+        for x1, y1, x2, y2 in self.occluders:
+            ids[y1 // s:-(-y2 // s), x1 // s:-(-x2 // s)] = 0
+        visible_cells = np.bincount(ids.ravel(), minlength=self.num_objects + 1)[1:]
+        area = np.maximum((cells[:, 2] - cells[:, 0]) * (cells[:, 3] - cells[:, 1]), 1)
+
+        int_boxes = np.round(boxes).astype(int)
+        return [
+            {
+                "id": int(k + 1),
+                "bbox": int_boxes[k].tolist(),
+                "class_id": 0,
+                "label": "person",
+                "team": self.teams[k],
+                "visible": float(min(visible_cells[k] / area[k], 1.0))
+            }
+            for k in np.flatnonzero(present)
+        ]
+
+    def render(self, frame_idx: int, out: np.ndarray = None) -> np.ndarray:
+        """
+        Draws the scene at `frame_idx` into `out` (allocated when None).
+        """
+        if out is None:
+            out = np.empty_like(self.background)
+        np.copyto(out, self.background)
+
+        boxes, present = self.boxes(frame_idx)
+        int_boxes = np.round(boxes).astype(np.int64)
+        for k in self._depth_order(boxes, present).tolist():
+            x1, y1, x2, y2 = int_boxes[k].tolist()
+            team = self.teams[k]
+            cv2.rectangle(out, (x1, y1), (x2 - 1, y2 - 1), TEAM_COLORS[team], -1)
+            # Darker "shorts" so crops are not flat
+            cv2.rectangle(out, (x1, (y1 + y2) // 2), (x2 - 1, y2 - 1), SHORTS_COLORS[team], -1)
+        for x1, y1, x2, y2 in self.occluders:
+            out[y1:y2, x1:x2] = OCCLUDER_COLOR
+
+        self.stamp_timecode(out, frame_idx)
+        return out
+
+    def frames(self, reuse_buffer: bool = False) -> Iterator[dict]:
+        """
+        Yields pipeline source items {'frame_idx', 'frame', 'ground_truth'}.
+        With `reuse_buffer`, every frame is rendered into the same array, which is
+        only safe when each frame is consumed before the next one is requested.
+        """
+        buffer = np.empty_like(self.background) if reuse_buffer else None
+        for frame_idx in range(self.num_frames):
+            frame = self.render(frame_idx, buffer)
+            yield {"frame_idx": frame_idx, "frame": frame, "ground_truth": self.ground_truth(frame_idx)}
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.frames()
+
+    @staticmethod
+    def stamp_timecode(frame: np.ndarray, frame_idx: int):
+        frame[0, 0] = (frame_idx & 0xFF, (frame_idx >> 8) & 0xFF, (frame_idx >> 16) & 0xFF)
+
+    @staticmethod
+    def read_timecode(frame: np.ndarray) -> int:
+        b, g, r = (int(v) for v in frame[0, 0])
+        return b | (g << 8) | (r << 16)
+
+
+class SyntheticDetector:
+    """
+    Mock detector returning a `SyntheticScene`'s ground-truth boxes for a frame.
+    Objects less than `min_visible` visible are missed; `box_noise` (pixels) jitters
+    boxes and `miss_rate` drops detections at random, both seeded per frame so runs
+    are reproducible. Drop-in for `ObjectDetector` (also usable behind a MicroBatcher).
+    """
+    def __init__(self, scene: SyntheticScene, min_visible: float = 0.3, box_noise: float = 0.0,
+                 miss_rate: float = 0.0, seed: int = 0, mock_call_overhead_ms: float = 0.0,
+                 mock_per_frame_ms: float = 0.0):
+        self.scene = scene
+        self.min_visible = min_visible
+        self.box_noise = box_noise
+        self.miss_rate = miss_rate
+        self.seed = seed
+        self.mock_call_overhead_ms = mock_call_overhead_ms
+        self.mock_per_frame_ms = mock_per_frame_ms
+        self.mock_mode = True
+
+    def detect(self, frame: np.ndarray, frame_idx: int = None) -> List[dict]:
+        """
+        Detections for `frame`; its index is read from the frame's timecode unless given.
+        """
+        if frame_idx is None:
+            frame_idx = SyntheticScene.read_timecode(frame)
+        self._simulate_latency(1)
+        return self._detections(frame_idx)
+
+    def detect_batch(self, frames: List[np.ndarray]) -> List[List[dict]]:
+        if not frames:
+            return []
+        self._simulate_latency(len(frames))
+        return [self._detections(SyntheticScene.read_timecode(frame)) for frame in frames]
+
+    def _detections(self, frame_idx: int) -> List[dict]:
+        rng = np.random.default_rng((self.seed, frame_idx))
+        truth = [t for t in self.scene.ground_truth(frame_idx) if t["visible"] >= self.min_visible]
+        keep = rng.uniform(0, 1, len(truth)) >= self.miss_rate
+        noise = rng.normal(0, self.box_noise, (len(truth), 4)) if self.box_noise > 0 else np.zeros((len(truth), 4))
+
+        detections = []
+        for t, kept, jitter in zip(truth, keep, noise):
+            if not kept:
+                continue
+            x1, y1, x2, y2 = (np.asarray(t["bbox"]) + jitter).round().astype(int).tolist()
+            detections.append({
+                "bbox": [x1, y1, max(x2, x1 + 1), max(y2, y1 + 1)],
+                "label": t["label"],
+                "score": round(0.5 + 0.5 * t["visible"], 3),
+                "class_id": t["class_id"]
+            })
+        return detections
+
+    def _simulate_latency(self, batch_size: int):
+        delay_ms = self.mock_call_overhead_ms + self.mock_per_frame_ms * batch_size
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
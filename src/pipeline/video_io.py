@@ -0,0 +1,187 @@
+import time
+import logging
+import threading
+from typing import Iterable, Iterator, Optional
+import cv2
+import numpy as np
+
+
+def read_video(video_path: str, max_frames: Optional[int] = None, start_frame: int = 0) -> Iterator[np.ndarray]:
+    """
+    Yields BGR frames from a video file until it ends or `max_frames` is reached,
+    starting at frame `start_frame`.
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if start_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        count = 0
+        while max_frames is None or count < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+            count += 1
+    finally:
+        cap.release()
+
+
+def video_fps(video_path: str, default: float = 30.0) -> float:
+    """
+    Native frame rate of a video file, or `default` when the container does not report one.
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+    finally:
+        cap.release()
+    return fps if fps and fps > 0 else default
+
+
+def video_frame_count(video_path: str) -> int:
+    """
+    Number of frames reported by the container (0 if unknown).
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+    finally:
+        cap.release()
+
+
+def video_frame_shape(video_path: str) -> tuple:
+    """
+    Shape of the decoded frames (height, width, channels), from the first frame.
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        ret, frame = cap.read()
+    finally:
+        cap.release()
+    if not ret:
+        raise IOError(f"Cannot decode a frame from {video_path}")
+    return frame.shape
+
+
+def mock_frames(num_frames: int, width: int = 1280, height: int = 720) -> Iterator[np.ndarray]:
+    """
+    Yields noisy dark frames standing in for a video stream.
+    """
+    for _ in range(num_frames):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        # Add noise to make it look alive
+        noise = np.random.randint(0, 50, (height, width, 3), dtype=np.uint8)
+        yield cv2.addWeighted(frame, 0.8, noise, 0.2, 0)
+
+
+class VideoWriterSink:
+    """
+    Pipeline sink encoding the rendered frames ('out_frame') with cv2.VideoWriter.
+    The writer is opened on the first frame, once the frame size is known.
+    """
+    def __init__(self, output_path: str, fps: float = 30, fourcc: str = "mp4v"):
+        self.logger = logging.getLogger(__name__)
+        self.output_path = output_path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.writer = None
+
+    def __call__(self, ctx: dict):
+        frame = ctx["out_frame"]
+        if self.writer is None:
+            h, w = frame.shape[:2]
+            self.writer = cv2.VideoWriter(self.output_path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (w, h))
+            self.logger.info(f"Writing {w}x{h} video to {self.output_path}")
+        self.writer.write(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+
+
+class LiveSource:
+    """
+    Real-time frame source: a reader thread pulls frames from `frames` at `fps`
+    (wall-clock pacing stands in for a camera or RTSP feed) into a single slot.
+    Iterating yields only the freshest frame; frames overwritten before the pipeline
+    took them are counted as dropped. Items are dicts with 'frame_idx' (the capture
+    index, so indices skip over drops) and 'capture_ts' (time.monotonic()). An error
+    reading `frames` is re-raised by the iterator after the last captured frame.
+    """
+    def __init__(self, frames: Iterable[np.ndarray], fps: float = 30.0, metrics=None):
+        self.logger = logging.getLogger(__name__)
+        self.frames = frames
+        self.fps = fps
+        self.metrics = metrics
+
+        self.captured = 0
+        self.delivered = 0
+        self._slot = None  # (frame_idx, frame, capture_ts)
+        self._done = False
+        self._error = None  # exception that ended the reader thread
+        self._stop = threading.Event()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    @property
+    def dropped(self) -> int:
+        with self._cond:
+            return self.captured - self.delivered - (self._slot is not None)
+
+    @property
+    def drop_rate(self) -> float:
+        return self.dropped / self.captured if self.captured else 0.0
+
+    def __iter__(self) -> Iterator[dict]:
+        self._thread = threading.Thread(target=self._read, name="live-source", daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                with self._cond:
+                    while self._slot is None and not self._done:
+                        self._cond.wait()
+                    if self._slot is None:
+                        if self._error is not None:
+                            raise self._error
+                        return
+                    frame_idx, frame, capture_ts = self._slot
+                    self._slot = None
+                    self.delivered += 1
+                yield {"frame_idx": frame_idx, "frame": frame, "capture_ts": capture_ts}
+        finally:
+            self.stop()
+
+    def stop(self):
+        """
+        Stops the reader thread (also called when iteration ends or is abandoned).
+        """
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _read(self):
+        interval = 1.0 / self.fps
+        start = time.monotonic()
+        try:
+            for frame_idx, frame in enumerate(self.frames):
+                if self._stop.is_set():
+                    break
+                # Pace at the native rate: a live feed never runs ahead of real time
+                delay = start + frame_idx * interval - time.monotonic()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+                with self._cond:
+                    if self._slot is not None and self.metrics is not None:
+                        self.metrics.inc("frames_dropped")
+                    self._slot = (frame_idx, frame, time.monotonic())
+                    self.captured += 1
+                    self._cond.notify()
+        except Exception as e:
+            # Raised by __iter__, so the pipeline reports it instead of ending the run normally
+            with self._cond:
+                self._error = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify()
@@ -0,0 +1,108 @@
+import numpy as np
+
+
+class CompactMask:
+    """
+    Binary object mask stored as a bitmap cropped to the object's bounding box.
+    It reports the shape and dtype of the full-frame (H, W) uint8 mask and converts
+    to it through `np.asarray`, but the full mask is only allocated on demand.
+    """
+    __slots__ = ("bbox", "local", "frame_shape")
+
+    def __init__(self, local: np.ndarray, bbox, frame_shape):
+        """
+        Args:
+            local: Boolean bitmap of shape (y2 - y1, x2 - x1).
+            bbox: Region [x1, y1, x2, y2] covered by `local`, inside the frame.
+            frame_shape: (H, W) of the frame the mask belongs to.
+        """
+        self.bbox = [int(v) for v in bbox]
+        self.local = np.asarray(local, dtype=bool)
+        self.frame_shape = (int(frame_shape[0]), int(frame_shape[1]))
+
+        expected = (self.bbox[3] - self.bbox[1], self.bbox[2] - self.bbox[0])
+        if self.local.shape != expected:
+            raise ValueError(f"Local mask shape {self.local.shape} does not match bbox size {expected}")
+
+    @classmethod
+    def from_box(cls, bbox, frame_shape) -> "CompactMask":
+        """
+        Solid rectangular mask for an xyxy box, clipped to the frame.
+        """
+        x1, y1, x2, y2 = _clip_box(bbox, frame_shape)
+        return cls(np.ones((y2 - y1, x2 - x1), dtype=bool), [x1, y1, x2, y2], frame_shape)
+
+    @classmethod
+    def from_full(cls, mask: np.ndarray) -> "CompactMask":
+        """
+        Crops a full-frame mask to the bounding box of its foreground pixels.
+        """
+        mask = np.asarray(mask)
+        rows = np.flatnonzero(mask.any(axis=1))
+        if rows.size == 0:
+            return cls(np.zeros((0, 0), dtype=bool), [0, 0, 0, 0], mask.shape)
+        cols = np.flatnonzero(mask.any(axis=0))
+        y1, y2 = rows[0], rows[-1] + 1
+        x1, x2 = cols[0], cols[-1] + 1
+        return cls(mask[y1:y2, x1:x2] != 0, [x1, y1, x2, y2], mask.shape)
+
+    @property
+    def shape(self) -> tuple:
+        return self.frame_shape
+
+    @property
+    def dtype(self):
+        return np.dtype(np.uint8)
+
+    @property
+    def area(self) -> int:
+        return int(np.count_nonzero(self.local))
+
+    def to_full(self, dtype=np.uint8) -> np.ndarray:
+        """
+        Materializes the (H, W) mask.
+        """
+        full = np.zeros(self.frame_shape, dtype=dtype)
+        x1, y1, x2, y2 = self.bbox
+        full[y1:y2, x1:x2] = self.local
+        return full
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_full(dtype or np.uint8)
+
+    def to_rle(self) -> dict:
+        """
+        Run-length encodes the local bitmap (row-major, first run counts zeros).
+        """
+        flat = self.local.ravel()
+        if flat.size == 0:
+            counts = np.zeros(0, dtype=np.int32)
+        else:
+            change = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+            bounds = np.concatenate(([0], change, [flat.size]))
+            counts = np.diff(bounds).astype(np.int32)
+            if flat[0]:
+                counts = np.concatenate(([0], counts)).astype(np.int32)
+        return {"size": list(self.frame_shape), "bbox": list(self.bbox), "counts": counts}
+
+    @classmethod
+    def from_rle(cls, rle: dict) -> "CompactMask":
+        """
+        Inverse of `to_rle`.
+        """
+        x1, y1, x2, y2 = rle["bbox"]
+        counts = np.asarray(rle["counts"], dtype=np.int64)
+        flat = np.repeat(np.arange(counts.size) % 2 == 1, counts)
+        return cls(flat.reshape(y2 - y1, x2 - x1), rle["bbox"], rle["size"])
+
+    def __repr__(self):
+        return f"CompactMask(bbox={self.bbox}, frame_shape={self.frame_shape}, area={self.area})"
+
+
+def _clip_box(bbox, frame_shape) -> list:
+    h, w = frame_shape[:2]
+    x1 = min(max(int(bbox[0]), 0), w)
+    y1 = min(max(int(bbox[1]), 0), h)
+    x2 = min(max(int(bbox[2]), x1), w)
+    y2 = min(max(int(bbox[3]), y1), h)
+    return [x1, y1, x2, y2]
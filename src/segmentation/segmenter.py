@@ -1,24 +1,63 @@
 
 import logging
+import threading
 import numpy as np
+from src.segmentation.masks import CompactMask
+from src.pipeline.lazy import LazyModelMixin
 # from sam2.build_sam import build_sam2_video_predictor
 
-class VideoSegmenter:
+def box_iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU between (N, 4) and (M, 4) xyxy boxes.
+    """
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.where(union > 0, union, 1), 0.0)
+
+
+class VideoSegmenter(LazyModelMixin):
     """
     Wrapper for SAM2 (Segment Anything Model 2) for video segmentation and tracking.
     Handles memory state for persistent tracking across frames.
+    Detections are associated with existing tracks by IoU so ids persist, and
+    `propagate` carries tracks through frames without detections using a
+    constant-velocity motion model whose confidence decays every frame.
     """
-    def __init__(self, model_cfg: str = "sam2_hiera_l.yaml", checkpoint: str = "sam2_hiera_large.pt", device: str = "cuda"):
+    def __init__(self, model_cfg: str = "sam2_hiera_l.yaml", checkpoint: str = "sam2_hiera_large.pt", device: str = "cuda",
+                 iou_threshold: float = 0.3, confidence_decay: float = 0.95, max_missed: int = 2, lazy: bool = False):
+        """
+        Args:
+            iou_threshold: Minimum IoU between a detection and a track's predicted box to match.
+            confidence_decay: Factor applied to a track's confidence per propagated frame.
+            max_missed: Keyframes a track may go unmatched before it is dropped.
+            lazy: Build SAM2 when the first video or frame is processed instead of here.
+        """
         self.logger = logging.getLogger(__name__)
         self.device = device
+        self.model_cfg = model_cfg
+        self.checkpoint = checkpoint
         self.predictor = None
         self.inference_state = None
+
+        self.iou_threshold = iou_threshold
+        self.confidence_decay = confidence_decay
+        self.max_missed = max_missed
+        self._lock = threading.Lock()
+        self._tracks = {}  # id -> motion state
+        self._next_id = 1
+        self._last_frame = 0  # newest frame tracked or propagated
         
-        self._load_model(model_cfg, checkpoint)
+        self._init_model(lazy)
 
-    def _load_model(self, cfg, checkpoint):
-        self.logger.info(f"Initializing SAM2 with config {cfg}...")
-        # self.predictor = build_sam2_video_predictor(cfg, checkpoint, device=self.device)
+    def _load_model(self):
+        self.logger.info(f"Initializing SAM2 with config {self.model_cfg}...")
+        # self.predictor = build_sam2_video_predictor(self.model_cfg, self.checkpoint, device=self.device)
         self.logger.info("SAM2 Initialized (MOCK MODE).")
         self.mock_mode = True
 
@@ -27,6 +66,7 @@ class VideoSegmenter:
         Initialize the inference state for a new video.
         """
         self.logger.info(f"Processing video for SAM2 embedding: {video_path}")
+        self.ensure_loaded()
         if not self.mock_mode:
             # self.inference_state = self.predictor.init_state(video_path=video_path)
             pass
@@ -44,34 +84,146 @@ class VideoSegmenter:
             
         Returns:
             List of object dictionaries with 'id', 'mask', 'bbox', 'class_id'.
+            'mask' is a `CompactMask` (bbox-local bitmap); use `np.asarray` for the full frame mask.
         """
         # In a real SAM2 pipeline, you would:
         # 1. Add new prompts (bboxes) for new objects found by detector.
         # 2. Propagate masks for existing tracked objects.
+        # 3. Wrap each predicted mask with CompactMask.from_full to keep only its bbox region.
+        self.ensure_loaded()
         
+        with self._lock:
+            ids = self._associate(frame_idx, detections)
+
         results = []
         
         # MOCK LOGIC: Just convert boxes to dummy masks
-        for i, det in enumerate(detections):
+        for obj_id, det in zip(ids, detections):
             bbox = det['bbox'] # xyxy
             # Create a simple rectangular mask for the mock
-            mask = np.zeros((frame.shape[0], frame.shape[1]), dtype=np.uint8)
-            mask[bbox[1]:bbox[3], bbox[0]:bbox[2]] = 1
-            
-            obj_id = i + 1 # Simple ID assignment for mock
+            mask = CompactMask.from_box(bbox, frame.shape[:2])
             
             results.append({
                 "id": obj_id,
                 "mask": mask,
                 "bbox": bbox,
                 "class_id": det['class_id'],
-                "label": det['label']
+                "label": det['label'],
+                "confidence": float(det.get('score', 1.0))
             })
             
         return results
 
+    def propagate(self, frame_idx: int, frame: np.ndarray) -> list:
+        """
+        Carries the tracks matched at the last keyframe forward to `frame_idx` without detections.
+        Boxes follow each track's estimated velocity and confidence decays by
+        `confidence_decay` per frame since the track was last detected.
+
+        Returns:
+            Track dicts in the same format as `track_objects`.
+        """
+        # A real SAM2 pipeline would call predictor.propagate_in_video here;
+        # the motion model only moves the box (and mask) of each track.
+        height, width = frame.shape[:2]
+        results = []
+        with self._lock:
+            self._last_frame = max(self._last_frame, frame_idx)
+            for obj_id, state in self._tracks.items():
+                if state["missed"]:
+                    continue
+                gap = frame_idx - state["frame"]
+                box = state["bbox"] + state["velocity"] * gap
+                box = np.clip(np.round(box), 0, [width, height, width, height]).astype(int)
+                if box[2] <= box[0] or box[3] <= box[1]:
+                    continue
+                bbox = box.tolist()
+                results.append({
+                    "id": obj_id,
+                    "mask": CompactMask.from_box(bbox, (height, width)),
+                    "bbox": bbox,
+                    "class_id": state["class_id"],
+                    "label": state["label"],
+                    "confidence": state["confidence"] * self.confidence_decay ** max(gap, 0)
+                })
+        return results
+
+    @property
+    def min_confidence(self) -> float:
+        """
+        Lowest confidence among the currently tracked objects (1.0 when there are none),
+        decayed to the most recently tracked frame.
+        """
+        with self._lock:
+            live = [s for s in self._tracks.values() if not s["missed"]]
+            if not live:
+                return 1.0
+            return min(s["confidence"] * self.confidence_decay ** max(self._last_frame - s["frame"], 0) for s in live)
+
+    def _associate(self, frame_idx: int, detections: list) -> list:
+        """
+        Greedily matches detections to the predicted boxes of existing tracks by IoU,
+        updates their motion state and opens new tracks for the rest.
+        Returns the track id of every detection.
+        """
+        track_ids = list(self._tracks)
+        ids = [None] * len(detections)
+
+        if track_ids and detections:
+            predicted = np.array([
+                self._tracks[t]["bbox"] + self._tracks[t]["velocity"] * (frame_idx - self._tracks[t]["frame"])
+                for t in track_ids
+            ])
+            boxes = np.array([d['bbox'] for d in detections], dtype=np.float64)
+            iou = box_iou_matrix(predicted, boxes)
+
+            # Best pairs first; each track and detection is used at most once
+            order = np.argsort(-iou, axis=None)
+            used_tracks = set()
+            for flat in order:
+                t, d = divmod(int(flat), len(detections))
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if t in used_tracks or ids[d] is not None:
+                    continue
+                used_tracks.add(t)
+                ids[d] = track_ids[t]
+
+        for k, det in enumerate(detections):
+            obj_id = ids[k]
+            bbox = np.asarray(det['bbox'], dtype=np.float64)
+            if obj_id is None:
+                obj_id = ids[k] = self._next_id
+                self._next_id += 1
+                velocity = np.zeros(4)
+            else:
+                state = self._tracks[obj_id]
+                velocity = (bbox - state["bbox"]) / max(frame_idx - state["frame"], 1)
+            self._tracks[obj_id] = {
+                "bbox": bbox,
+                "velocity": velocity,
+                "frame": frame_idx,
+                "class_id": det['class_id'],
+                "label": det['label'],
+                "confidence": float(det.get('score', 1.0)),
+                "missed": 0
+            }
+
+        matched = set(ids)
+        for obj_id in track_ids:
+            if obj_id not in matched:
+                self._tracks[obj_id]["missed"] += 1
+                if self._tracks[obj_id]["missed"] > self.max_missed:
+                    del self._tracks[obj_id]
+        self._last_frame = frame_idx
+        return ids
+
     def reset(self):
         if self.inference_state and not self.mock_mode:
             # self.predictor.reset_state(self.inference_state)
             pass
         self.inference_state = None
+        with self._lock:
+            self._tracks = {}
+            self._next_id = 1
+            self._last_frame = 0
@@ -1,79 +1,168 @@
 
+import threading
+from collections import OrderedDict
 import cv2
 import numpy as np
-import supervision as sv # Use supervision if available, else standard opencv
+from src.segmentation.masks import CompactMask
 
 class PipelineVisualizer:
     """
     Draws analysis results onto the frame.
     Uses 'supervision' library style aesthetics or fallback to OpenCV.
+    Rendering touches only the annotated pixels: masks are blended inside their
+    bboxes, label and event texts are pre-rendered once into cached sprites, and
+    with `in_place` the input frame is annotated without a copy.
     """
-    def __init__(self):
-        # Initialize annotators
+    FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+    def __init__(self, in_place: bool = False, event_ttl_frames: int = 90, max_events_shown: int = 5,
+                 max_sprites: int = 512):
+        """
+        Args:
+            in_place: Draw on the given frame instead of a copy.
+            event_ttl_frames: Events stay on screen this many frames after they fired.
+            max_events_shown: Most recent events listed in the overlay.
+            max_sprites: Text sprites kept in the LRU cache.
+        """
+        # Colors follow supervision's default palette when it is available
         try:
-            self.box_annotator = sv.BoxAnnotator()
-            self.mask_annotator = sv.MaskAnnotator()
-            self.label_annotator = sv.LabelAnnotator()
+            import supervision as sv  # deferred: only needed once a visualizer is built
+            self.palette = sv.ColorPalette.DEFAULT
             self.use_supervision = True
-        except ImportError:
+        except (AttributeError, ImportError):
             self.use_supervision = False
 
-    def draw(self, frame: np.ndarray, tracks: list, events: list) -> np.ndarray:
+        # Masks are blended by hand inside each object's bbox (see _draw_masks)
+        self.mask_opacity = 0.5
+        self.in_place = in_place
+        self.event_ttl_frames = event_ttl_frames
+        self.max_events_shown = max_events_shown
+
+        self.max_sprites = max_sprites
+        self._sprites = OrderedDict()  # (text, background, scale) -> BGR image
+        self._sprites_lock = threading.Lock()  # render stages may run several workers
+        self._colors = {}
+
+    def draw(self, frame: np.ndarray, tracks: list, events: list, frame_idx: int = None) -> np.ndarray:
         """
         Draws bounding boxes, masks, IDs, and events on the frame.
+        With `frame_idx`, only events from the last `event_ttl_frames` frames are shown
+        (newest first, at most `max_events_shown`); otherwise all of `events` are.
         """
-        annotated_frame = frame.copy()
-
-        if not tracks:
-            return annotated_frame
-
-        if self.use_supervision:
-            # Convert pipeline tracks to supervision Detections object
-            xyxy = np.array([t['bbox'] for t in tracks])
-            mask = np.array([t['mask'] for t in tracks])
-            confidence = np.array([0.9] * len(tracks)) # Placeholder
-            class_id = np.array([t['class_id'] for t in tracks])
-            tracker_id = np.array([t['id'] for t in tracks])
-
-            detections = sv.Detections(
-                xyxy=xyxy,
-                mask=mask,
-                confidence=confidence,
-                class_id=class_id,
-                tracker_id=tracker_id
-            )
-
-            # Annotate
-            annotated_frame = self.mask_annotator.annotate(scene=annotated_frame, detections=detections)
-            annotated_frame = self.box_annotator.annotate(scene=annotated_frame, detections=detections)
-            
-            # Create labels: ID + Class + (Cluster ID if available)
-            labels = []
-            for t in tracks:
-                label_text = f"#{t['id']} {t.get('label', '')}" 
-                if 'cluster_id' in t:
-                   label_text += f"-G{t['cluster_id']}"
-                if 'ocr_text' in t and t['ocr_text']:
-                   label_text += f" [{t['ocr_text']}]"
-                labels.append(label_text)
-                
-            annotated_frame = self.label_annotator.annotate(scene=annotated_frame, detections=detections, labels=labels)
-
-        else:
-            # Fallback OpenCV drawing
-            for t in tracks:
-                x1, y1, x2, y2 = t['bbox']
-                color = (0, 255, 0)
-                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(annotated_frame, f"ID: {t['id']}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        annotated_frame = frame if self.in_place else frame.copy()
+
+        self._draw_masks(annotated_frame, tracks)
+
+        for t in tracks:
+            x1, y1, x2, y2 = (int(v) for v in t['bbox'])
+            color = self._color(t.get('class_id', 0))
+            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
+
+            # Label: ID + Class + (Cluster ID if available) + (OCR text if available)
+            label_text = f"#{t['id']} {t.get('label', '')}"
+            if 'cluster_id' in t:
+                label_text += f"-G{t['cluster_id']}"
+            if 'ocr_text' in t and t['ocr_text']:
+                label_text += f" [{t['ocr_text']}]"
+            sprite = self._sprite(label_text, color, 0.5)
+            # Above the box, or inside it when there is no room
+            y = y1 - sprite.shape[0] if y1 - sprite.shape[0] >= 0 else y1
+            self._paste(annotated_frame, sprite, x1, y)
 
         # Draw Events
-        y_offset = 30
-        for event in events:
-            # Show events that happened recently (e.g., in this frame)
-            if event['frame'] >= 0: # Check relevant logic
-                 text = f"EVENT: {event['type']} - {event['details']}"
-                 cv2.putText(annotated_frame, text, (10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                 y_offset += 30
-                 
+        y_offset = 10
+        for event in self._visible_events(events, frame_idx):
+            sprite = self._sprite(f"EVENT: {event['type']} - {event['details']}", (0, 0, 0), 0.7, text_color=(0, 0, 255))
+            self._paste(annotated_frame, sprite, 10, y_offset)
+            y_offset += sprite.shape[0] + 4
+
         return annotated_frame
+
+    def _visible_events(self, events: list, frame_idx: int = None) -> list:
+        if frame_idx is None:
+            return events
+        recent = [e for e in events if 0 <= frame_idx - e['frame'] < self.event_ttl_frames]
+        recent.sort(key=lambda e: e['frame'], reverse=True)
+        return recent[:self.max_events_shown]
+
+    def draw_minimap(self, frame: np.ndarray, minimap: np.ndarray, tracks: list, margin: int = 10) -> np.ndarray:
+        """
+        Pastes a top-down view (e.g. `PerspectiveTransformer.warp_to_map`) into the
+        bottom-right corner of `frame` in place, with a dot per track at its 'map_xy'.
+        """
+        h, w = minimap.shape[:2]
+        y0, x0 = frame.shape[0] - h - margin, frame.shape[1] - w - margin
+        if y0 < 0 or x0 < 0:
+            return frame
+
+        inset = frame[y0:y0 + h, x0:x0 + w]
+        inset[:] = minimap
+        for t in tracks:
+            if 'map_xy' in t:
+                x, y = int(round(t['map_xy'][0])), int(round(t['map_xy'][1]))
+                if 0 <= x < w and 0 <= y < h:
+                    cv2.circle(inset, (x, y), 3, self._color(t.get('class_id', 0)), -1)
+        cv2.rectangle(frame, (x0, y0), (x0 + w - 1, y0 + h - 1), (255, 255, 255), 1)
+        return frame
+
+    def _draw_masks(self, frame: np.ndarray, tracks: list):
+        """
+        Blends each track's mask into the frame in place, touching only its bbox region.
+        """
+        for t in tracks:
+            mask = t.get('mask')
+            if mask is None:
+                continue
+            if not isinstance(mask, CompactMask):
+                mask = CompactMask.from_full(mask)
+
+            x1, y1, x2, y2 = mask.bbox
+            if x2 <= x1 or y2 <= y1:
+                continue
+            roi = frame[y1:y2, x1:x2]
+            tint = np.empty_like(roi)
+            tint[:] = self._color(t.get('class_id', 0))
+            blended = cv2.addWeighted(roi, 1 - self.mask_opacity, tint, self.mask_opacity, 0)
+            np.copyto(roi, blended, where=mask.local[..., None])
+
+    def _sprite(self, text: str, background: tuple, scale: float, text_color: tuple = (255, 255, 255)) -> np.ndarray:
+        """
+        Text rendered on a filled background, built once and reused from an LRU cache.
+        """
+        key = (text, background, text_color, scale)
+        with self._sprites_lock:
+            sprite = self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+                return sprite
+
+        thickness = 1 if scale < 0.6 else 2
+        (w, h), baseline = cv2.getTextSize(text, self.FONT, scale, thickness)
+        pad = 4
+        sprite = np.empty((h + baseline + 2 * pad, w + 2 * pad, 3), dtype=np.uint8)
+        sprite[:] = background
+        cv2.putText(sprite, text, (pad, pad + h), self.FONT, scale, text_color, thickness, cv2.LINE_AA)
+
+        with self._sprites_lock:
+            self._sprites[key] = sprite
+            while len(self._sprites) > self.max_sprites:
+                self._sprites.popitem(last=False)
+        return sprite
+
+    @staticmethod
+    def _paste(frame: np.ndarray, sprite: np.ndarray, x: int, y: int):
+        """
+        Copies `sprite` into `frame` with its top-left corner at (x, y), clipped to the frame.
+        """
+        h, w = sprite.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, frame.shape[1]), min(y + h, frame.shape[0])
+        if x1 > x0 and y1 > y0:
+            frame[y0:y1, x0:x1] = sprite[y0 - y:y1 - y, x0 - x:x1 - x]
+
+    def _color(self, class_id: int) -> tuple:
+        color = self._colors.get(class_id)
+        if color is None:
+            color = self.palette.by_idx(int(class_id)).as_bgr() if self.use_supervision else (0, 255, 0)
+            self._colors[class_id] = color
+        return color
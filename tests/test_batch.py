@@ -0,0 +1,130 @@
+import sys
+import os
+import json
+import tempfile
+import unittest
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.pipeline import batch
+from src.pipeline.batch import find_videos, plan_jobs, run_batch, TrackIdStitcher
+
+
+def write_video(path, num_frames, width=160, height=120):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (width, height))
+    for i in range(num_frames):
+        writer.write(np.full((height, width, 3), i % 255, dtype=np.uint8))
+    writer.release()
+
+
+def failing_job(job, output_dir):
+    """process_job stand-in whose second segment of long.mp4 fails after writing a partial file"""
+    if os.path.basename(job["video_path"]) == "long.mp4" and job["segment"] == 1:
+        with open(batch.result_path(output_dir, job), "w") as f:
+            f.write('{"frame_idx": 20}\n')
+        raise RuntimeError("decoder crashed")
+    return PROCESS_JOB(job, output_dir)
+
+
+PROCESS_JOB = batch.process_job
+
+
+class TestBatchRunner(unittest.TestCase):
+    """Unit tests for the multi-process batch runner"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.video_dir = os.path.join(self.tmp.name, "videos")
+        os.makedirs(self.video_dir)
+        self.long_video = os.path.join(self.video_dir, "long.mp4")
+        self.short_video = os.path.join(self.video_dir, "short.mp4")
+        write_video(self.long_video, 50)
+        write_video(self.short_video, 10)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_find_videos_expands_directories(self):
+        """Test that directories are expanded to their video files"""
+        open(os.path.join(self.video_dir, "notes.txt"), "w").close()
+        self.assertEqual(find_videos([self.video_dir]), [self.long_video, self.short_video])
+
+    def test_plan_jobs_splits_long_videos(self):
+        """Test that only videos longer than a segment are split, with overlap"""
+        jobs = plan_jobs([self.long_video, self.short_video], segment_frames=20, overlap=5)
+        ranges = [(j["start"], j["own_start"], j["end"]) for j in jobs if j["video_path"] == self.long_video]
+        self.assertEqual(ranges, [(0, 0, 20), (15, 20, 40), (35, 40, 50)])
+        short = [j for j in jobs if j["video_path"] == self.short_video]
+        self.assertEqual(len(short), 1)
+        self.assertIsNone(short[0]["end"])
+
+    def test_stitcher_matches_tracks_at_seam(self):
+        """Test that overlapping tracks keep their ids and new ones get fresh ids"""
+        stitcher = TrackIdStitcher()
+        first = stitcher.remap({"tracks": [{"id": 1, "bbox": [0, 0, 10, 10]}, {"id": 2, "bbox": [50, 50, 60, 60]}],
+                                "events": []})
+        self.assertEqual([t["id"] for t in first["tracks"]], [1, 2])
+
+        # Next segment numbered its tracks independently (2 <-> 1 swapped, plus a new one)
+        previous = {10: first["tracks"]}
+        overlap = {10: [{"id": 1, "bbox": [50, 50, 60, 60]}, {"id": 2, "bbox": [0, 0, 10, 10]}]}
+        stitcher.start_segment(previous, overlap)
+        record = stitcher.remap({
+            "tracks": [{"id": 1, "bbox": [51, 50, 61, 60]}, {"id": 2, "bbox": [1, 0, 11, 10]},
+                       {"id": 3, "bbox": [90, 90, 99, 99]}],
+            "events": [{"type": "PROXIMITY", "object_id": 1, "other_id": 3}]
+        })
+        self.assertEqual([t["id"] for t in record["tracks"]], [2, 1, 3])
+        self.assertEqual((record["events"][0]["object_id"], record["events"][0]["other_id"]), (2, 3))
+
+    def test_run_batch_writes_stitched_results(self):
+        """Test the process pool end to end, including a split video"""
+        output_dir = os.path.join(self.tmp.name, "results")
+        summary = run_batch([self.video_dir], output_dir, workers=2, segment_frames=20, overlap=5)
+
+        self.assertEqual(summary["failed"], [])
+        self.assertEqual(summary["jobs"], 4)
+        self.assertEqual(sorted(os.listdir(output_dir)), ["long.jsonl", "short.jsonl", "summary.json"])
+
+        with open(summary["outputs"][self.long_video]) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["frame_idx"] for r in records], list(range(50)))
+        # The mock objects keep the same ids across both seams
+        self.assertTrue(all(sorted(t["id"] for t in r["tracks"]) == [1, 2] for r in records))
+
+    def test_failed_video_leaves_no_part_files(self):
+        """Test that the finished and partial part files of a failed video are removed"""
+        output_dir = os.path.join(self.tmp.name, "results")
+        batch.process_job = failing_job
+        try:
+            summary = run_batch([self.video_dir], output_dir, workers=2, segment_frames=20, overlap=5,
+                                mp_context="fork")
+        finally:
+            batch.process_job = PROCESS_JOB
+
+        self.assertEqual([(os.path.basename(job["video_path"]), job["segment"]) for job in summary["failed"]],
+                         [("long.mp4", 1)])
+        self.assertEqual(list(summary["outputs"]), [self.short_video])
+        self.assertEqual(sorted(os.listdir(output_dir)), ["short.jsonl", "summary.json"])
+
+    def test_worker_builds_configured_stages_only(self):
+        """Test that a worker skips the models of disabled stages"""
+        batch.init_worker({"stages": ["events"]})
+        try:
+            self.assertIsNone(batch._worker["identifier"])
+            self.assertIsNone(batch._worker["reader"])
+            job = plan_jobs([self.short_video])[0]
+            result = batch.process_job(job, self.tmp.name)
+        finally:
+            batch._worker.clear()
+
+        with open(result["result_path"]) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 10)
+        self.assertTrue(all("cluster_id" not in t and "ocr_text" not in t for r in records for t in r["tracks"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.bench_pipeline import run_benchmarks, compare_results, parse_resolution, synthetic_detections
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Unit tests for the benchmark suite"""
+
+    def test_parse_resolution(self):
+        """Test presets and explicit sizes"""
+        self.assertEqual(parse_resolution("1080p"), (1920, 1080))
+        self.assertEqual(parse_resolution("320x240"), (320, 240))
+
+    def test_synthetic_detections_are_deterministic(self):
+        """Test that boxes are reproducible and inside the frame"""
+        first = synthetic_detections(10, 320, 240)
+        self.assertEqual(first, synthetic_detections(10, 320, 240))
+        for det in first:
+            x1, y1, x2, y2 = det['bbox']
+            self.assertTrue(0 <= x1 < x2 <= 320 and 0 <= y1 < y2 <= 240)
+
+    def test_small_run_reports_every_stage(self):
+        """Test that a tiny run times all stages and the full loop"""
+        report = run_benchmarks(["320x240"], [3], repeats=2, num_frames=3)
+        stages = {key.split("/")[-1] for key in report["results"]}
+        self.assertEqual(stages, {"detect", "track_objects", "extract_crops", "extract_embeddings", "cluster_embeddings",
+                                  "events_update", "draw", "encode", "end_to_end"})
+        self.assertEqual(report["results"]["320x240/3obj/end_to_end"]["frames"], 3)
+        self.assertIn("python", report["meta"])
+
+    def test_compare_flags_only_regressions(self):
+        """Test that only slowdowns beyond the threshold are reported"""
+        baseline = {"results": {
+            "a": {"p50_ms": 10.0, "mean_ms": 10.0},
+            "b": {"p50_ms": 10.0, "mean_ms": 10.0},
+            "e2e": {"mean_ms": 20.0, "fps": 50.0},
+        }}
+        current = {"results": {
+            "a": {"p50_ms": 11.0, "mean_ms": 11.0},
+            "b": {"p50_ms": 15.0, "mean_ms": 15.0},
+            "e2e": {"mean_ms": 30.0, "fps": 33.3},
+            "new": {"p50_ms": 99.0, "mean_ms": 99.0},
+        }}
+        regressions = compare_results(current, baseline, threshold=0.2)
+        self.assertEqual([(r["benchmark"], r["metric"]) for r in regressions], [("b", "p50_ms"), ("e2e", "mean_ms")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,14 @@
 import sys
 import os
 import unittest
+import subprocess
 import numpy as np
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.clustering.identifier import VisualIdentifier
+from src.clustering.online import OnlineKMeans
+from src.clustering.cache import EmbeddingCache
 
 
 class TestVisualIdentifier(unittest.TestCase):
@@ -20,6 +23,13 @@ class TestVisualIdentifier(unittest.TestCase):
         self.assertIsNotNone(self.identifier)
         self.assertTrue(self.identifier.mock_mode)
         
+    def test_import_defers_sklearn(self):
+        """Test that importing the identifier does not import sklearn"""
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        code = "import sys; import src.clustering.identifier; print('sklearn' in sys.modules)"
+        out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip(), "False")
+
     def test_extract_embeddings_returns_array(self):
         """Test that extract_embeddings returns numpy array"""
         crops = [np.zeros((50, 50, 3), dtype=np.uint8) for _ in range(3)]
@@ -53,6 +63,120 @@ class TestVisualIdentifier(unittest.TestCase):
         embeddings = self.identifier.extract_embeddings([])
         self.assertEqual(len(embeddings), 0)
 
+    def test_online_mode_labels_single_crop(self):
+        """Test that online clustering labels even a single crop after warm-up"""
+        identifier = VisualIdentifier(online_clustering=True, warmup_samples=8)
+        identifier.cluster_embeddings(np.random.rand(8, 768).astype(np.float32))
+        labels = identifier.cluster_embeddings(np.random.rand(1, 768).astype(np.float32))
+        self.assertEqual(len(labels), 1)
+        self.assertIn(int(labels[0]), {0, 1})
+
+
+def make_blobs(n_per_cluster, rng, dim=16):
+    """Two well separated blobs, in shuffled order"""
+    a = rng.normal(0.0, 0.1, (n_per_cluster, dim))
+    b = rng.normal(5.0, 0.1, (n_per_cluster, dim))
+    samples = np.concatenate([a, b]).astype(np.float32)
+    truth = np.array([0] * n_per_cluster + [1] * n_per_cluster)
+    order = rng.permutation(len(samples))
+    return samples[order], truth[order]
+
+
+class TestOnlineKMeans(unittest.TestCase):
+    """Unit tests for the incremental clustering model"""
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def test_warmup_returns_none(self):
+        """Test that no labels are produced until the warm-up window is full"""
+        model = OnlineKMeans(warmup_samples=20)
+        self.assertIsNone(model.partial_fit_predict(np.zeros((5, 4), dtype=np.float32)))
+        self.assertFalse(model.fitted)
+
+    def test_labels_are_stable_and_ordered(self):
+        """Test that the blob near the origin is always label 0"""
+        model = OnlineKMeans(warmup_samples=40, update_interval=2)
+        samples, truth = make_blobs(20, self.rng)
+        labels = model.partial_fit_predict(samples)
+        np.testing.assert_array_equal(labels, truth)
+
+        for _ in range(10):
+            samples, truth = make_blobs(3, self.rng)
+            np.testing.assert_array_equal(model.partial_fit_predict(samples), truth)
+
+    def test_centroids_follow_drift(self):
+        """Test that mini-batch updates move centroids towards new data"""
+        model = OnlineKMeans(warmup_samples=40, update_interval=1)
+        samples, _ = make_blobs(20, self.rng)
+        model.partial_fit_predict(samples)
+        before = model.centroids[1].copy()
+
+        for _ in range(20):
+            model.partial_fit_predict(self.rng.normal(6.0, 0.1, (4, 16)).astype(np.float32))
+        self.assertGreater(model.centroids[1].mean(), before.mean())
+        np.testing.assert_array_equal(model.predict(np.zeros((1, 16))), [0])
+
+    def test_reduced_dimensions(self):
+        """Test that PCA-reduced clustering still separates the blobs"""
+        model = OnlineKMeans(warmup_samples=40, n_components=2)
+        samples, truth = make_blobs(20, self.rng, dim=64)
+        labels = model.partial_fit_predict(samples)
+        self.assertEqual(model.centroids.shape, (2, 2))
+        # PCA may flip the axis; the grouping must still match the truth
+        self.assertTrue(np.array_equal(labels, truth) or np.array_equal(labels, 1 - truth))
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    """Unit tests for the per-track embedding cache"""
+
+    def setUp(self):
+        self.cache = EmbeddingCache(refresh_interval=10, iou_threshold=0.5, momentum=0.5, ttl_frames=5, max_entries=3)
+        self.bbox = [100, 100, 200, 200]
+
+    def test_hit_after_store(self):
+        """Test that a stored track is served from the cache"""
+        self.assertIsNone(self.cache.lookup(1, self.bbox, 0))
+        self.cache.store(1, np.ones(4), self.bbox, 0)
+        np.testing.assert_array_equal(self.cache.lookup(1, [102, 101, 203, 200], 1), np.ones(4))
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_refresh_on_move_and_age(self):
+        """Test that moved or stale tracks miss"""
+        self.cache.store(1, np.ones(4), self.bbox, 0)
+        self.assertIsNone(self.cache.lookup(1, [300, 300, 400, 400], 1))
+        self.assertIsNone(self.cache.lookup(1, self.bbox, 10))
+
+    def test_running_average(self):
+        """Test that refreshed embeddings are blended with the cached one"""
+        self.cache.store(1, np.zeros(4), self.bbox, 0)
+        blended = self.cache.store(1, np.ones(4), self.bbox, 10)
+        np.testing.assert_allclose(blended, np.full(4, 0.5))
+
+    def test_ttl_and_lru_eviction(self):
+        """Test that lost tracks expire and the cache stays bounded"""
+        for tid in range(4):
+            self.cache.store(tid, np.ones(4), self.bbox, tid)
+        self.assertEqual(len(self.cache), 3)
+        self.assertNotIn(0, self.cache.entries)
+
+        self.assertEqual(self.cache.evict(7), 1)  # track 1 last seen at frame 1
+        self.assertEqual(sorted(self.cache.entries), [2, 3])
+        self.assertEqual(self.cache.stats()["evictions"], 2)
+
+    def test_identifier_embeds_only_misses(self):
+        """Test that VisualIdentifier only re-embeds uncached tracks"""
+        identifier = VisualIdentifier(cache=self.cache)
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        tracks = [{'id': 1, 'bbox': self.bbox}, {'id': 2, 'bbox': [0, 0, 0, 0]}]
+
+        first = identifier.embed_tracks(frame, tracks, 0)
+        second = identifier.embed_tracks(frame, tracks, 1)
+        self.assertEqual(first.shape, (2, 768))
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
 
 if __name__ == '__main__':
     unittest.main()
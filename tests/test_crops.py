@@ -0,0 +1,73 @@
+import sys
+import os
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.pipeline.crops import CropPool, clip_boxes
+
+
+class TestCropPool(unittest.TestCase):
+    """Unit tests for pooled crop extraction"""
+
+    def setUp(self):
+        self.frame = np.zeros((100, 200, 3), dtype=np.uint8)
+        self.frame[10:50, 20:60] = 200
+
+    def test_clip_boxes(self):
+        """Test that boxes are clipped to the frame and degenerate ones flagged"""
+        boxes, valid = clip_boxes([[-10, 5, 50, 150], [190, 10, 250, 20], [50, 50, 50, 60], [300, 0, 400, 10]],
+                                  self.frame.shape)
+        self.assertEqual(boxes.tolist(), [[0, 5, 50, 100], [190, 10, 200, 20], [50, 50, 50, 60], [200, 0, 200, 10]])
+        self.assertEqual(valid.tolist(), [True, True, False, False])
+
+    def test_crops_are_resized_views_of_one_buffer(self):
+        """Test that crops land resized in the shared buffer"""
+        pool = CropPool(size=32)
+        batch = pool.batch(self.frame, [[20, 10, 60, 50], [0, 0, 0, 0]])
+        crops = batch.extract()
+        self.assertEqual([c.shape for c in crops], [(32, 32, 3)] * 2)
+        self.assertTrue(all(np.shares_memory(c, batch.images) for c in crops))
+        self.assertTrue((crops[0] == 200).all())
+        self.assertFalse(crops[1].any())
+
+    def test_lazy_extraction(self):
+        """Test that only requested crops are extracted"""
+        batch = CropPool(size=16).batch(self.frame, [[20, 10, 60, 50], [100, 0, 150, 50]])
+        batch.extract([1])
+        self.assertEqual(batch._ready.tolist(), [False, True])
+        self.assertTrue((batch[0] == 200).all())
+
+    def test_buffers_are_reused(self):
+        """Test that released buffers serve later frames without allocating"""
+        pool = CropPool(size=16, capacity=2)
+        for _ in range(5):
+            batch = pool.batch(self.frame, [[0, 0, 10, 10]])
+            batch.extract()
+            batch.release()
+        self.assertEqual(pool.allocations, 1)
+
+        # More tracks than the capacity grows the buffer
+        batch = pool.batch(self.frame, [[0, 0, 10, 10]] * 5)
+        self.assertEqual(len(batch.extract()), 5)
+        self.assertEqual(pool.capacity, 8)
+
+    def test_shared_batch_released_by_last_consumer(self):
+        """Test that a batch with several consumers is returned once all released it, or when dropped"""
+        pool = CropPool(size=16, capacity=2)
+        batch = pool.batch(self.frame, [[0, 0, 10, 10]], consumers=2)
+        self.assertFalse(batch.release())
+        self.assertEqual(len(pool._free), 0)
+        self.assertTrue(batch.release())
+        self.assertEqual(len(pool._free), 1)
+
+        batch = pool.batch(self.frame, [[0, 0, 10, 10]], consumers=2)
+        batch.release()
+        del batch
+        self.assertEqual(len(pool._free), 1)
+        self.assertEqual(pool.allocations, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
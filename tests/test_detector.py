@@ -7,6 +7,8 @@ import numpy as np
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.detection.detector import ObjectDetector
+from src.detection.batching import MicroBatcher
+from src.detection.keyframes import KeyframeScheduler
 
 
 class TestObjectDetector(unittest.TestCase):
@@ -21,6 +23,20 @@ class TestObjectDetector(unittest.TestCase):
         self.assertIsNotNone(self.detector)
         self.assertTrue(self.detector.mock_mode)
         
+    def test_lazy_loading(self):
+        """Test that a lazy detector loads its model on the first detection only"""
+        detector = ObjectDetector(lazy=True)
+        self.assertFalse(detector.loaded)
+        loads = []
+        load = detector._load_model
+        detector._load_model = lambda: loads.append(1) or load()
+        frame = np.zeros((72, 128, 3), dtype=np.uint8)
+        detector.detect(frame)
+        detector.detect_batch([frame, frame])
+        self.assertTrue(detector.loaded and detector.mock_mode)
+        self.assertEqual(len(loads), 1)
+        self.assertTrue(self.detector.loaded)
+
     def test_detect_returns_list(self):
         """Test that detect returns a list"""
         frame = np.zeros((720, 1280, 3), dtype=np.uint8)
@@ -64,6 +80,112 @@ class TestObjectDetector(unittest.TestCase):
         for det in detections:
             self.assertGreaterEqual(det['score'], self.detector.confidence_threshold)
 
+    def test_detect_batch_matches_detect(self):
+        """Test that batched detection returns one result per frame in the same format"""
+        frames = [np.zeros((720, 1280, 3), dtype=np.uint8), np.zeros((480, 640, 3), dtype=np.uint8)]
+        results = self.detector.detect_batch(frames)
+
+        self.assertEqual(len(results), 2)
+        for frame, detections in zip(frames, results):
+            self.assertEqual(detections, self.detector.detect(frame))
+
+    def test_detect_batch_empty(self):
+        """Test that an empty batch returns no results"""
+        self.assertEqual(self.detector.detect_batch([]), [])
+
+
+class TestMicroBatcher(unittest.TestCase):
+    """Unit tests for the detection micro-batcher"""
+
+    def test_full_batches_are_dispatched(self):
+        """Test that concurrently submitted frames are grouped into one call"""
+        detector = ObjectDetector(mock_call_overhead_ms=5)
+        batcher = MicroBatcher(detector, max_batch_size=4, max_wait_ms=500)
+        frames = [np.zeros((100 + i, 200, 3), dtype=np.uint8) for i in range(4)]
+
+        futures = [batcher.submit(frame) for frame in frames]
+        results = [f.result(timeout=5) for f in futures]
+        batcher.close()
+
+        self.assertEqual(batcher.batches, 1)
+        self.assertEqual(batcher.mean_batch_size, 4)
+        for frame, detections in zip(frames, results):
+            self.assertEqual(detections, detector.detect(frame))
+
+    def test_partial_batch_after_timeout(self):
+        """Test that a lone frame is processed once max_wait_ms expires"""
+        batcher = MicroBatcher(ObjectDetector(), max_batch_size=8, max_wait_ms=1)
+        detections = batcher.detect(np.zeros((720, 1280, 3), dtype=np.uint8))
+        batcher.close()
+
+        self.assertEqual(len(detections), 2)
+        self.assertEqual(batcher.batches, 1)
+
+    def test_submit_after_close(self):
+        """Test that a closed batcher rejects new frames"""
+        batcher = MicroBatcher(ObjectDetector())
+        batcher.close()
+        with self.assertRaises(RuntimeError):
+            batcher.submit(np.zeros((10, 10, 3), dtype=np.uint8))
+
+    def test_short_batch_result_fails_every_frame(self):
+        """Test that a detector returning fewer lists than frames fails the whole batch"""
+        class ShortDetector:
+            def detect_batch(self, frames):
+                return [[]]
+
+        batcher = MicroBatcher(ShortDetector(), max_batch_size=3, max_wait_ms=500)
+        futures = [batcher.submit(np.zeros((10, 10, 3), dtype=np.uint8)) for _ in range(3)]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+        batcher.close()
+
+
+class TestKeyframeScheduler(unittest.TestCase):
+    """Unit tests for keyframe scheduling"""
+
+    def test_fixed_interval(self):
+        """Test that every K-th frame is a keyframe"""
+        scheduler = KeyframeScheduler(interval=3)
+        keyframes = [i for i in range(10) if scheduler.is_keyframe(i)]
+        self.assertEqual(keyframes, [0, 3, 6, 9])
+        self.assertAlmostEqual(scheduler.keyframe_ratio, 0.4)
+
+    def test_low_confidence_forces_keyframe(self):
+        """Test that a confidence drop triggers detection early"""
+        scheduler = KeyframeScheduler(interval=10, confidence_threshold=0.5)
+        self.assertTrue(scheduler.is_keyframe(0, track_confidence=0.9))
+        self.assertFalse(scheduler.is_keyframe(1, track_confidence=0.9))
+        self.assertTrue(scheduler.is_keyframe(2, track_confidence=0.4))
+        self.assertFalse(scheduler.is_keyframe(3, track_confidence=0.9))
+
+    def test_motion_forces_keyframe(self):
+        """Test that a scene change triggers detection early"""
+        scheduler = KeyframeScheduler(interval=10, motion_threshold=10)
+        dark = np.zeros((72, 128, 3), dtype=np.uint8)
+        self.assertTrue(scheduler.is_keyframe(0, dark))
+        self.assertFalse(scheduler.is_keyframe(1, dark))
+        self.assertTrue(scheduler.is_keyframe(2, np.full_like(dark, 200)))
+
+    def test_interval_adapts_to_latency_budget(self):
+        """Test that K grows over budget and shrinks well under it"""
+        scheduler = KeyframeScheduler(interval=2, max_interval=5, latency_budget_ms=10, smoothing=1.0)
+        for _ in range(10):
+            scheduler.report_latency(50)
+        self.assertEqual(scheduler.interval, 5)
+        for _ in range(10):
+            scheduler.report_latency(1)
+        self.assertEqual(scheduler.interval, 1)
+
+        scheduler.set_interval(100)
+        self.assertEqual(scheduler.interval, 5)
+
+    def test_invalid_bounds(self):
+        """Test that inconsistent interval bounds are rejected"""
+        with self.assertRaises(ValueError):
+            KeyframeScheduler(min_interval=5, max_interval=2)
+
 
 if __name__ == '__main__':
     unittest.main()
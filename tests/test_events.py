@@ -0,0 +1,313 @@
+import sys
+import os
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.events.analyzer import EventAnalyzer
+from src.events.history import TrackHistory
+from src.events.zones import ZoneEngine
+from src.events.proximity import ProximityIndex
+from src.events.replay import EventReplay
+from src.homography.transformer import PerspectiveTransformer
+from src.pipeline.synthetic import SyntheticScene
+
+
+def box_at(x, y, size=20):
+    return [x - size // 2, y - size // 2, x + size // 2, y + size // 2]
+
+
+class TestTrackHistory(unittest.TestCase):
+    """Unit tests for the ring-buffer track history"""
+
+    def test_ring_buffer_keeps_latest_samples(self):
+        """Test that a full row overwrites its oldest samples"""
+        history = TrackHistory(capacity=4, initial_tracks=1)
+        for f in range(6):
+            history.append(7, f, 2 * f, f)
+        samples = history.samples(7)
+        np.testing.assert_array_equal(samples[:, 2], [2, 3, 4, 5])
+        np.testing.assert_array_equal(samples[:, 1], [4, 6, 8, 10])
+
+    def test_rows_grow_and_recycle(self):
+        """Test that rows are added on demand and reused after eviction"""
+        history = TrackHistory(capacity=4, initial_tracks=1)
+        for tid in range(3):
+            history.append(tid, 0, 0, 0)
+        rows = len(history.ids)
+        history.append(1, 0, 0, 10)
+
+        self.assertEqual(sorted(history.evict_stale(10, max_age=5)), [0, 2])
+        history.append(99, 0, 0, 11)
+        self.assertEqual(len(history.ids), rows)
+        self.assertEqual(len(history), 2)
+        self.assertEqual(len(history.samples(99)), 1)
+
+
+class TestEventAnalyzer(unittest.TestCase):
+    """Unit tests for EventAnalyzer"""
+
+    def setUp(self):
+        self.analyzer = EventAnalyzer(fps=10)  # dwell = 30 frames
+
+    def run_frames(self, frames, position_fn, obj_id=1):
+        raised = []
+        for f in frames:
+            raised.extend(self.analyzer.update([{'id': obj_id, 'bbox': box_at(*position_fn(f))}], f))
+        return raised
+
+    def test_stationary_event_fires_once(self):
+        """Test that a stationary object raises a single debounced event"""
+        raised = self.run_frames(range(100), lambda f: (100, 100))
+        self.assertEqual(len(raised), 1)
+        self.assertEqual(raised[0]['type'], "STATIONARY_WARNING")
+        self.assertEqual(raised[0]['frame'], 30)
+
+    def test_update_returns_only_new_events(self):
+        """Test that later frames do not repeat earlier events"""
+        self.run_frames(range(40), lambda f: (100, 100))
+        self.assertEqual(self.analyzer.update([{'id': 1, 'bbox': box_at(100, 100)}], 40), [])
+        self.assertEqual(len(self.analyzer.events), 1)
+
+    def test_moving_object_rearms_event(self):
+        """Test that a stationary object that moves and stops again fires twice"""
+        def position(f):
+            if f < 40:
+                return (100, 100)
+            if f < 50:
+                return (100 + 20 * (f - 39), 100)
+            return (300, 100)
+
+        raised = self.run_frames(range(120), position)
+        # Frame 77 compares against frame 47 (x=260), already within the 50 px radius
+        self.assertEqual([e['frame'] for e in raised], [30, 77])
+
+    def test_moving_object_has_no_event(self):
+        """Test that a steadily moving object is never stationary"""
+        self.assertEqual(self.run_frames(range(100), lambda f: (5 * f, 100)), [])
+
+    def test_lost_tracks_are_evicted(self):
+        """Test that tracks unseen for max_track_age frames are dropped"""
+        self.run_frames(range(5), lambda f: (100, 100), obj_id=1)
+        self.run_frames(range(5, 40), lambda f: (100, 100), obj_id=2)
+        self.assertNotIn(1, self.analyzer.track_history)
+        self.assertIn(2, self.analyzer.track_history)
+
+    def test_history_is_bounded(self):
+        """Test that history memory does not grow with stream length"""
+        self.run_frames(range(1000), lambda f: (f % 300, 100))
+        self.assertEqual(len(self.analyzer.track_history.samples(1)), self.analyzer.track_history.capacity)
+
+    def test_recent_events(self):
+        """Test that recent_events returns the logged events within the window"""
+        self.analyzer.add_zone("gate", [[100, 0], [200, 0], [200, 200], [100, 200]])
+        self.run_frames(range(30), lambda f: (10 * f, 100))
+        self.assertEqual([e['frame'] for e in self.analyzer.recent_events(29, 15)], [20])
+        self.assertEqual([e['frame'] for e in self.analyzer.recent_events(29, 30)], [20, 10])
+        self.assertEqual(self.analyzer.recent_events(60, 30), [])
+
+    def test_frame_gaps(self):
+        """Test that dwell time is measured in frames even with dropped frames"""
+        raised = self.run_frames(range(0, 60, 7), lambda f: (100, 100))
+        self.assertEqual([e['frame'] for e in raised], [35])
+
+    def test_line_crossing_with_frame_gaps(self):
+        """Test that a crossing between two sparse samples is still detected once"""
+        self.analyzer.add_line("door", (0, 100), (400, 100))
+        raised = self.run_frames(range(0, 20, 6), lambda f: (200, 50 + 10 * f))
+        self.assertEqual([(e['type'], e['frame']) for e in raised], [("LINE_CROSS", 6)])
+
+    def test_many_tracks_in_one_pass(self):
+        """Test that only the stationary tracks among many raise events"""
+        raised = []
+        for f in range(40):
+            tracks = [{'id': i, 'bbox': box_at(10 * i + (3 * f if i % 2 else 0), 100)} for i in range(200)]
+            raised.extend(self.analyzer.update(tracks, f))
+        self.assertEqual(sorted(e['object_id'] for e in raised), list(range(0, 200, 2)))
+
+    def test_zone_enter_and_exit(self):
+        """Test that crossing a zone boundary raises enter/exit once each"""
+        self.analyzer.add_zone("gate", [[100, 0], [200, 0], [200, 200], [100, 200]])
+        raised = self.run_frames(range(30), lambda f: (10 * f, 100))
+        # Membership is half-open along x: x=100 is inside, x=200 is outside
+        self.assertEqual([(e['type'], e['frame']) for e in raised], [("ZONE_ENTER", 10), ("ZONE_EXIT", 20)])
+        self.assertEqual(raised[0]['zone'], "gate")
+
+    def test_line_crossing_direction(self):
+        """Test that tripwire crossings report their direction"""
+        self.analyzer.add_line("door", (0, 100), (400, 100))
+        raised = self.run_frames(range(20), lambda f: (200, 50 + 10 * f))
+        raised += self.run_frames(range(20, 40), lambda f: (200, 240 - 10 * (f - 20)))
+        raised = [e for e in raised if e['type'] == "LINE_CROSS"]
+        self.assertEqual([(e['frame'], e['direction']) for e in raised], [(5, "forward"), (35, "backward")])
+
+
+class TestZoneEngine(unittest.TestCase):
+    """Unit tests for vectorized zone and line geometry"""
+
+    def setUp(self):
+        self.engine = ZoneEngine()
+        # Concave "L" shape and a triangle with fewer vertices (exercises padding)
+        self.engine.add_zone("L", [[0, 0], [10, 0], [10, 4], [4, 4], [4, 10], [0, 10]])
+        self.engine.add_zone("tri", [[20, 0], [30, 0], [20, 10]])
+
+    def test_contains(self):
+        """Test point-in-polygon for convex and concave zones"""
+        points = np.array([[2, 2], [8, 2], [8, 8], [2, 8], [22, 2], [29, 9], [-1, -1]])
+        expected = np.array([
+            [True, False], [True, False], [False, False], [True, False],
+            [False, True], [False, False], [False, False]
+        ])
+        np.testing.assert_array_equal(self.engine.contains(points), expected)
+
+    def test_contains_without_points(self):
+        """Test that empty queries return an empty matrix"""
+        self.assertEqual(self.engine.contains(np.zeros((0, 2))).shape, (0, 2))
+
+    def test_invalid_zone(self):
+        """Test that a zone needs at least three vertices"""
+        with self.assertRaises(ValueError):
+            self.engine.add_zone("bad", [[0, 0], [1, 1]])
+
+    def test_crossings(self):
+        """Test that only moves through the segment count as crossings"""
+        self.engine.add_line("wire", (0, 0), (10, 0))
+        prev = np.array([[5, -1], [5, 1], [15, -1], [5, 1]])
+        curr = np.array([[5, 1], [5, -1], [15, 1], [5, 2]])
+        np.testing.assert_array_equal(self.engine.crossings(prev, curr)[:, 0], [1, -1, 0, 0])
+
+
+class TestProximityEvents(unittest.TestCase):
+    """Unit tests for KD-tree backed proximity and crowd events"""
+
+    def test_close_pairs_match_brute_force(self):
+        """Test that the KD-tree finds exactly the all-pairs result"""
+        rng = np.random.default_rng(1)
+        points = rng.uniform(0, 100, (300, 2))
+        found = {tuple(p) for p in ProximityIndex(points).close_pairs(5.0)}
+
+        dist = np.linalg.norm(points[:, None] - points[None], axis=2)
+        i, j = np.nonzero(np.triu(dist <= 5.0, k=1))
+        self.assertEqual(found, set(zip(i.tolist(), j.tolist())))
+
+    def test_empty_index(self):
+        """Test queries on a frame without tracks"""
+        index = ProximityIndex(np.zeros((0, 2)))
+        self.assertEqual(index.close_pairs(1.0).shape, (0, 2))
+        self.assertEqual(len(index.neighbour_counts(1.0)), 0)
+
+    def test_proximity_is_debounced(self):
+        """Test that a pair fires once while close and again after separating"""
+        analyzer = EventAnalyzer(fps=10, proximity_distance=30)
+        gaps = [100, 20, 20, 20, 100, 10]
+        raised = []
+        for f, gap in enumerate(gaps):
+            tracks = [{'id': 1, 'bbox': box_at(100, 100)}, {'id': 2, 'bbox': box_at(100 + gap, 100)}]
+            raised.extend(e for e in analyzer.update(tracks, f) if e['type'] == "PROXIMITY")
+        self.assertEqual([e['frame'] for e in raised], [1, 5])
+        self.assertEqual((raised[0]['object_id'], raised[0]['other_id']), (1, 2))
+
+    def test_crowd_density(self):
+        """Test that tracks in a dense group raise one crowd event each"""
+        analyzer = EventAnalyzer(fps=10, crowd_radius=50, crowd_size=4)
+        crowd = [{'id': i, 'bbox': box_at(100 + 10 * i, 100)} for i in range(4)]
+        loner = [{'id': 9, 'bbox': box_at(600, 600)}]
+        first = analyzer.update(crowd + loner, 0)
+        second = analyzer.update(crowd + loner, 1)
+        self.assertEqual(sorted(e['object_id'] for e in first if e['type'] == "CROWD_DENSITY"), [0, 1, 2, 3])
+        self.assertEqual([e for e in second if e['type'] == "CROWD_DENSITY"], [])
+
+    def test_map_coordinates_from_transformer(self):
+        """Test that distances are measured in map space"""
+        transformer = PerspectiveTransformer(
+            src_points=np.array([[0, 0], [1000, 0], [1000, 1000], [0, 1000]], dtype=np.float32),
+            dst_points=np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float32)
+        )
+        analyzer = EventAnalyzer(transformer=transformer, proximity_distance=1.0)
+        # 80 px apart: 0.8 map units
+        tracks = [{'id': 1, 'bbox': box_at(100, 100)}, {'id': 2, 'bbox': box_at(180, 100)}]
+        raised = analyzer.update(tracks, 0)
+        self.assertEqual(len(raised), 1)
+        self.assertAlmostEqual(raised[0]['distance'], 0.8, places=3)
+
+
+class TestEventReplay(unittest.TestCase):
+    """Unit tests for the offline event replay"""
+
+    def make_analyzer(self, **kwargs):
+        analyzer = EventAnalyzer(fps=5, max_track_age=3, history_size=20, proximity_distance=25.0,
+                                 crowd_radius=60.0, crowd_size=4, **kwargs)
+        analyzer.add_zone("left", [[0, 0], [300, 0], [300, 720], [0, 720]])
+        analyzer.add_zone("centre", [[400, 200], [900, 150], [850, 600], [450, 550]])
+        analyzer.add_line("mid", (640, 0), (640, 720))
+        return analyzer
+
+    def trajectories(self):
+        """Synthetic tracks with dropped rows, skipped frames and an empty frame"""
+        scene = SyntheticScene(40, num_frames=150, seed=5, speed=(0.5, 8.0))
+        rng = np.random.default_rng(1)
+        frames = []
+        for f in range(150):
+            if f % 17 == 16:
+                continue
+            tracks = [{'id': g['id'], 'bbox': g['bbox']} for g in scene.ground_truth(f) if rng.random() > 0.1]
+            frames.append((f, [] if f == 60 else tracks))
+        return frames
+
+    def online(self, analyzer, frames):
+        return [e for f, tracks in frames for e in analyzer.update(tracks, f)]
+
+    def test_matches_online_analyzer(self):
+        """Test that replaying whole trajectories raises the online events in the same order"""
+        frames = self.trajectories()
+        expected = self.online(self.make_analyzer(), frames)
+        self.assertTrue({"STATIONARY_WARNING", "ZONE_ENTER", "ZONE_EXIT", "LINE_CROSS", "PROXIMITY",
+                         "CROWD_DENSITY"} <= {e['type'] for e in expected})
+
+        rows = [(f, t['id'], t['bbox']) for f, tracks in frames for t in tracks]
+        frame_idx, ids, bboxes = (np.array(c) for c in zip(*rows))
+        replay = EventReplay(self.make_analyzer(), chunk_rows=500)
+        self.assertEqual(replay.run(frame_idx, ids, bboxes, frames=[f for f, _ in frames]), expected)
+
+    def test_matches_online_with_map_coordinates(self):
+        """Test proximity in map space, from stored map coordinates or the transformer"""
+        transformer = PerspectiveTransformer(
+            src_points=np.array([[0, 0], [1280, 0], [1280, 720], [0, 720]], dtype=np.float32),
+            dst_points=np.array([[0, 0], [105, 0], [105, 68], [0, 68]], dtype=np.float32)
+        )
+        frames = self.trajectories()[:60]
+        analyzer = self.make_analyzer(transformer=transformer)
+        analyzer.proximity_distance, analyzer.crowd_radius = 2.0, 5.0
+        expected = self.online(analyzer, frames)
+
+        rows = [(f, t['id'], t['bbox']) for f, tracks in frames for t in tracks]
+        frame_idx, ids, bboxes = (np.array(c) for c in zip(*rows))
+        replay = EventReplay(analyzer)
+        self.assertEqual(replay.run(frame_idx, ids, bboxes), expected)
+
+        map_xy = analyzer.map_positions([{}], bboxes)
+        map_xy[frame_idx == 5] = np.nan  # falls back to the transformer
+        self.assertEqual(replay.run(frame_idx, ids, bboxes, map_xy=map_xy), expected)
+
+    def test_export(self):
+        """Test replaying a columnar export"""
+        import tempfile
+        from src.export.columnar import ColumnarWriter, ColumnarReader
+
+        frames = self.trajectories()
+        expected = self.online(self.make_analyzer(), frames)
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = ColumnarWriter(tmp, chunk_frames=32)
+            for f, tracks in frames:
+                writer.write(f, tracks, [])
+            writer.close()
+            self.assertEqual(EventReplay(self.make_analyzer()).run_export(ColumnarReader(tmp)), expected)
+
+    def test_empty(self):
+        """Test that no trajectories raise no events"""
+        self.assertEqual(EventReplay(self.make_analyzer()).run([], [], np.zeros((0, 4))), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys
+import os
+import json
+import tempfile
+import unittest
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.export.columnar import ColumnarWriter, ColumnarReader
+from src.export.render import render_export
+from src.segmentation.masks import CompactMask
+
+
+def frame_tracks(f):
+    tracks = [{'id': 1, 'bbox': [10 + f, 10, 30 + f, 40], 'class_id': 0, 'label': 'person', 'confidence': 0.9,
+               'cluster_id': f % 2, 'map_xy': (1.5, 2.5), 'mask': CompactMask.from_box([10 + f, 10, 30 + f, 40], (60, 80))}]
+    if f % 3 == 0:
+        tracks.append({'id': 2, 'bbox': [50, 5, 70, 25], 'class_id': 32, 'label': 'sports ball',
+                       'ocr_text': "23", 'mask': CompactMask.from_box([50, 5, 70, 25], (60, 80))})
+    return tracks
+
+
+class TestColumnarExport(unittest.TestCase):
+    """Unit tests for the chunked columnar export"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = os.path.join(self.tmp.name, "export")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, num_frames=10, chunk_frames=4, include_masks=False, skip=()):
+        writer = ColumnarWriter(self.dir, chunk_frames=chunk_frames, include_masks=include_masks)
+        for f in range(num_frames):
+            if f in skip:
+                continue
+            events = [{'frame': f, 'type': "ZONE_ENTER", 'object_id': 1, 'zone': "gate", 'details': "in"}] if f == 5 else []
+            writer.write(f, frame_tracks(f), events, (60, 80))
+        writer.close()
+        return writer
+
+    def test_chunks_and_manifest(self):
+        """Test that frames are flushed in chunks listed in the manifest"""
+        writer = self.write()
+        with open(os.path.join(self.dir, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.assertEqual([c["frames"] for c in manifest["chunks"]], [4, 4, 2])
+        self.assertEqual(manifest["frames"], 10)
+        self.assertEqual(writer.frames_written, 10)
+
+    def test_round_trip(self):
+        """Test that tracks and events come back as the pipeline produced them"""
+        self.write()
+        reader = ColumnarReader(self.dir)
+        frames = list(reader.iter_frames())
+        self.assertEqual([f for f, _, _ in frames], list(range(10)))
+
+        _, tracks, events = frames[3]
+        self.assertEqual([t['id'] for t in tracks], [1, 2])
+        self.assertEqual(tracks[0]['bbox'], [13, 10, 33, 40])
+        self.assertEqual(tracks[0]['cluster_id'], 1)
+        self.assertEqual(tracks[0]['map_xy'], (1.5, 2.5))
+        self.assertEqual(tracks[1]['ocr_text'], "23")
+        self.assertNotIn('cluster_id', tracks[1])
+        self.assertNotIn('mask', tracks[0])
+        self.assertEqual(frames[5][2], [{'frame': 5, 'type': "ZONE_ENTER", 'object_id': 1, 'details': "in", 'zone': "gate"}])
+
+        columns = reader.tracks()
+        self.assertEqual(len(columns['id']), 14)
+        self.assertEqual(columns['bbox'].shape, (14, 4))
+
+    def test_masks_round_trip(self):
+        """Test that RLE masks are restored when exported"""
+        self.write(include_masks=True)
+        _, tracks, _ = next(ColumnarReader(self.dir).iter_frames())
+        expected = frame_tracks(0)
+        for t, e in zip(tracks, expected):
+            np.testing.assert_array_equal(np.asarray(t['mask']), np.asarray(e['mask']))
+
+    def test_render_later(self):
+        """Test that the annotated video can be rendered from the export"""
+        self.write(skip=(2,))
+        output = os.path.join(self.tmp.name, "render.mp4")
+        frames = (np.zeros((60, 80, 3), dtype=np.uint8) for _ in range(10))
+        written = render_export(self.dir, frames, output)
+        self.assertEqual(written, 9)
+        cap = cv2.VideoCapture(output)
+        self.assertEqual(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 9)
+        cap.release()
+
+
+if __name__ == '__main__':
+    unittest.main()
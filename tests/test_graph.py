@@ -0,0 +1,172 @@
+import sys
+import os
+import time
+import tempfile
+import threading
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.pipeline.engine import Pipeline, Stage
+from src.pipeline.graph import StageGraph, load_stage_graph
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def recorder(name, calls, delay=0.0):
+    def fn(ctx):
+        time.sleep(delay)
+        calls.append((name, ctx["frame_idx"], threading.current_thread().name))
+        ctx.setdefault("ran", []).append(name)
+        return ctx
+    return Stage(name, fn)
+
+
+class TestStageGraph(unittest.TestCase):
+    """Unit tests for the config-driven stage graph"""
+
+    def setUp(self):
+        self.calls = []
+        self.stages = {name: recorder(name, self.calls) for name in ("a", "b", "c", "d")}
+
+    def run_graph(self, config, frames=4, stages=None):
+        graph = StageGraph(config, stages or self.stages)
+        seen = []
+        try:
+            Pipeline(graph.to_stages()).run([np.zeros((2, 2, 3), np.uint8)] * frames, seen.append)
+        finally:
+            graph.close()
+        return graph, seen
+
+    def test_levels_from_dependencies(self):
+        """Test that independent branches share a level and dependents follow"""
+        config = {"stages": {"a": {}, "b": {"depends_on": ["a"]}, "c": {"depends_on": ["a"]},
+                             "d": {"depends_on": ["b", "c"]}}}
+        graph = StageGraph(config, self.stages)
+        self.assertEqual(graph.levels, [["a"], ["b", "c"], ["d"]])
+        self.assertEqual([s.name for s in graph.to_stages()], ["a", "b+c", "d"])
+        graph.close()
+
+    def test_parallel_branches_run_concurrently(self):
+        """Test that the nodes of one level overlap in time"""
+        stages = {"a": recorder("a", self.calls), "b": recorder("b", self.calls, 0.05),
+                  "c": recorder("c", self.calls, 0.05)}
+        config = {"stages": {"a": {}, "b": {"depends_on": ["a"]}, "c": {"depends_on": ["a"]}}}
+        start = time.perf_counter()
+        _, seen = self.run_graph(config, frames=4, stages=stages)
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.35)  # 4 frames x 2 x 50 ms sequentially would be 0.4 s
+        self.assertEqual([ctx["frame_idx"] for ctx in seen], [0, 1, 2, 3])
+        self.assertTrue(all(sorted(ctx["ran"]) == ["a", "b", "c"] for ctx in seen))
+        self.assertTrue(any(thread.startswith("stage-graph") for _, _, thread in self.calls))
+
+    def test_rates(self):
+        """Test every-N, on-new-track and on-demand execution rates"""
+        stages = dict(self.stages)
+        track_ids = {0: [1], 1: [1], 2: [1, 2], 3: [2]}
+
+        def track(ctx):
+            ctx["tracks"] = [{"id": i} for i in track_ids[ctx["frame_idx"]]]
+            if ctx["frame_idx"] == 3:
+                ctx["run"] = {"d"}
+            return ctx
+        stages["track"] = Stage("track", track)
+        config = {"stages": {
+            "track": {},
+            "a": {"depends_on": ["track"], "rate": {"every": 2}},
+            "b": {"depends_on": ["track"], "rate": "on_new_track"},
+            "c": {"depends_on": ["track"], "rate": 1},
+            "d": {"depends_on": ["a"], "rate": "on_demand"},
+        }}
+        _, seen = self.run_graph(config, frames=4, stages=stages)
+
+        ran = [sorted(ctx.get("ran", [])) for ctx in seen]
+        self.assertEqual(ran, [["a", "b", "c"], ["c"], ["a", "b", "c"], ["c", "d"]])
+
+    def test_missing_stages_are_bridged(self):
+        """Test that a configured but unavailable stage passes its dependencies on"""
+        config = {"stages": {"a": {}, "x": {"depends_on": ["a"]}, "b": {"depends_on": ["x"]}}}
+        graph = StageGraph(config, {name: self.stages[name] for name in ("a", "b")}, known={"x"})
+        self.assertEqual(graph.levels, [["a"], ["b"]])
+        self.assertEqual(graph.nodes["b"].depends_on, ["a"])
+
+    def test_unplaced_stages_are_rejected(self):
+        """Test that a config leaving out an available stage names it instead of dropping it"""
+        config = {"stages": {"a": {}, "b": {"depends_on": ["a"]}}}
+        with self.assertRaisesRegex(ValueError, "c, d"):
+            StageGraph(config, self.stages)
+
+    def test_invalid_configs(self):
+        """Test that unknown stages, dangling dependencies, cycles and bad rates are rejected"""
+        for config in (
+            {"stages": {}},
+            {"stages": {"zzz": {}}},
+            {"stages": {"a": {"depends_on": ["q"]}}},
+            {"stages": {"a": {"depends_on": ["b"]}, "b": {"depends_on": ["a"]}}},
+            {"stages": {"a": {"rate": "sometimes"}}},
+            {"stages": {"a": {"rate": {"every": 0}}}},
+        ):
+            with self.assertRaises(ValueError):
+                StageGraph(config, self.stages)
+
+    def test_default_config_builds_pipeline_stages(self):
+        """Test that the shipped YAML graph wires the standard stages with parallel branches"""
+        from src.pipeline.stages import build_stages, build_graph
+        from src.detection.detector import ObjectDetector
+        from src.segmentation.segmenter import VideoSegmenter
+        from src.clustering.identifier import VisualIdentifier
+        from src.ocr.reader import SceneTextReader
+        from src.events.analyzer import EventAnalyzer
+
+        config = load_stage_graph(os.path.join(ROOT, "configs", "stage_graph.yaml"))
+        stages = build_stages(ObjectDetector(), VideoSegmenter(), VisualIdentifier(online_clustering=True),
+                              SceneTextReader(), EventAnalyzer(), None, graph=config)
+        graph = build_graph(stages, config)
+        self.assertEqual([s.name for s in graph.to_stages()], ["detect", "track", "crops", "cluster+ocr", "events"])
+
+        frames = (np.zeros((120, 160, 3), dtype=np.uint8) for _ in range(5))
+        seen = []
+        try:
+            Pipeline(graph.to_stages()).run(frames, seen.append)
+        finally:
+            graph.close()
+        self.assertIsNone(graph._pool)
+        self.assertEqual(len(seen), 5)
+        self.assertTrue(all("cluster_id" in t for ctx in seen for t in ctx["tracks"]))
+        # Every batch is back in the pool once its last consumer released it
+        self.assertTrue(all("crops" not in ctx for ctx in seen))
+
+    def test_ocr_service_needs_every_frame_rate(self):
+        """Test that an OCR service rejects an ocr node that would skip attaching readings"""
+        from src.pipeline.stages import build_stages
+        config = {"stages": {"detect": {}, "track": {"depends_on": ["detect"]},
+                             "ocr": {"depends_on": ["track"], "rate": {"every": 30}}}}
+        module = object()
+        with self.assertRaises(ValueError):
+            build_stages(module, module, None, None, None, None, ocr_service=module, graph=config)
+        self.assertEqual(len(build_stages(module, module, None, module, None, None, graph=config)), 4)
+
+    def test_skipped_nodes_run_on_skip(self):
+        """Test that a node skipped by its rate calls its on_skip hook"""
+        skipped = []
+        stages = {name: self.stages[name] for name in ("a", "c")}
+        stages["b"] = Stage("b", self.stages["b"].fn, on_skip=lambda ctx: skipped.append(ctx["frame_idx"]))
+        config = {"stages": {"a": {}, "b": {"depends_on": ["a"], "rate": {"every": 2}},
+                             "c": {"depends_on": ["a"], "rate": {"every": 3}}}}
+        self.run_graph(config, frames=6, stages=stages)
+        self.assertEqual(skipped, [1, 3, 5])
+
+    def test_load_yaml(self):
+        """Test reading a graph from a YAML file"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "graph.yaml")
+            with open(path, "w") as f:
+                f.write("stages:\n  a: {}\n  b:\n    depends_on: [a]\n    rate: {every: 5}\n")
+            config = load_stage_graph(path)
+        self.assertEqual(config, {"stages": {"a": {}, "b": {"depends_on": ["a"], "rate": {"every": 5}}}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import sys
+import os
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.homography.transformer import PerspectiveTransformer
+
+
+class TestPerspectiveTransformer(unittest.TestCase):
+    """Unit tests for PerspectiveTransformer"""
+
+    def setUp(self):
+        """Map a trapezoid in the frame onto a 100 x 200 rectangle"""
+        self.transformer = PerspectiveTransformer(
+            src_points=np.array([[400, 200], [880, 200], [1280, 720], [0, 720]], dtype=np.float32),
+            dst_points=np.array([[0, 0], [100, 0], [100, 200], [0, 200]], dtype=np.float32)
+        )
+
+    def test_batch_matches_single_point(self):
+        """Test that batched projection agrees with transform_point"""
+        points = np.array([[640, 400], [100, 700], [800, 250]], dtype=np.float32)
+        batch = self.transformer.transform_points(points)
+        for point, projected in zip(points, batch):
+            single = self.transformer.transform_point(tuple(point))
+            np.testing.assert_allclose(projected, single, atol=1.0)
+
+    def test_project_tracks_uses_foot_point(self):
+        """Test that tracks get the map position of their bbox bottom-centre"""
+        tracks = [{'bbox': [600, 500, 680, 720]}, {'bbox': [380, 100, 420, 200]}]
+        map_xy = self.transformer.project_tracks(tracks)
+        self.assertEqual(map_xy.shape, (2, 2))
+        np.testing.assert_allclose(tracks[0]['map_xy'], (50, 200), atol=0.5)
+        np.testing.assert_allclose(tracks[1]['map_xy'], (0, 0), atol=0.5)
+        self.assertEqual(self.transformer.project_tracks([]).shape, (0, 2))
+
+    def test_warp_to_map_matches_warp_perspective(self):
+        """Test that the cached remap equals a full warpPerspective"""
+        import cv2
+        frame = np.random.default_rng(0).integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+        frame = cv2.GaussianBlur(frame, (9, 9), 0)  # smooth, so fixed-point rounding is negligible
+        expected = cv2.warpPerspective(frame, self.transformer.homography_matrix, (100, 200))
+        warped = self.transformer.warp_to_map(frame, (100, 200))
+        self.assertEqual(warped.shape, (200, 100, 3))
+        diff = np.abs(warped.astype(int) - expected.astype(int))
+        self.assertLess(diff[2:-2, 2:-2].mean(), 2.0)
+
+    def test_remap_tables_are_cached(self):
+        """Test that tables are built once per size and reset with the homography"""
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+        self.transformer.warp_to_map(frame, (100, 200))
+        tables = self.transformer._remap_tables("to_map", (100, 200))
+        self.transformer.warp_to_map(frame, (100, 200))
+        self.assertIs(self.transformer._remap_tables("to_map", (100, 200)), tables)
+
+        self.transformer.compute_homography(
+            np.array([[0, 0], [1280, 0], [1280, 720], [0, 720]], dtype=np.float32),
+            np.array([[0, 0], [100, 0], [100, 200], [0, 200]], dtype=np.float32)
+        )
+        self.assertIsNot(self.transformer._remap_tables("to_map", (100, 200)), tables)
+
+    def test_round_trip_to_frame(self):
+        """Test that the inverse table maps the map image back into the frame"""
+        map_image = np.full((200, 100, 3), 255, dtype=np.uint8)
+        back = self.transformer.warp_to_frame(map_image, (1280, 720))
+        self.assertEqual(back.shape, (720, 1280, 3))
+        self.assertEqual(back[500, 640, 0], 255)  # inside the trapezoid
+        self.assertEqual(back[50, 50, 0], 0)      # outside it
+
+    def test_no_homography(self):
+        """Test that points pass through and warping fails without a matrix"""
+        transformer = PerspectiveTransformer()
+        points = np.array([[1, 2]], dtype=np.float32)
+        np.testing.assert_array_equal(transformer.transform_points(points), points)
+        with self.assertRaises(RuntimeError):
+            transformer.warp_to_map(np.zeros((10, 10, 3), dtype=np.uint8), (5, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
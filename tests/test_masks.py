@@ -0,0 +1,66 @@
+import sys
+import os
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.segmentation.masks import CompactMask
+
+
+class TestCompactMask(unittest.TestCase):
+    """Unit tests for the bbox-local mask representation"""
+
+    def setUp(self):
+        """Build an irregular full-frame mask"""
+        self.full = np.zeros((120, 160), dtype=np.uint8)
+        self.full[30:60, 40:90] = 1
+        self.full[45, 40:50] = 0
+        self.full[59, 89] = 0
+
+    def test_from_full_roundtrip(self):
+        """Test that cropping and materializing gives back the same mask"""
+        mask = CompactMask.from_full(self.full)
+        self.assertEqual(mask.bbox, [40, 30, 90, 60])
+        self.assertEqual(mask.local.shape, (30, 50))
+        np.testing.assert_array_equal(mask.to_full(), self.full)
+
+    def test_array_protocol(self):
+        """Test that the mask behaves like the full uint8 mask"""
+        mask = CompactMask.from_full(self.full)
+        self.assertEqual(mask.shape, (120, 160))
+        self.assertEqual(mask.dtype, np.uint8)
+        np.testing.assert_array_equal(np.asarray(mask), self.full)
+        self.assertEqual(mask.area, int(self.full.sum()))
+
+    def test_rle_roundtrip(self):
+        """Test that RLE encoding is lossless"""
+        mask = CompactMask.from_full(self.full)
+        rle = mask.to_rle()
+        self.assertEqual(int(rle["counts"].sum()), mask.local.size)
+        restored = CompactMask.from_rle(rle)
+        np.testing.assert_array_equal(restored.to_full(), self.full)
+
+    def test_rle_starting_with_foreground(self):
+        """Test that a leading foreground run gets a zero-length background run"""
+        mask = CompactMask.from_box([0, 0, 4, 2], (10, 10))
+        rle = mask.to_rle()
+        self.assertEqual(list(rle["counts"]), [0, 8])
+        np.testing.assert_array_equal(CompactMask.from_rle(rle).local, mask.local)
+
+    def test_from_box_clips_to_frame(self):
+        """Test that boxes outside the frame are clipped"""
+        mask = CompactMask.from_box([-10, 5, 50, 200], (100, 40))
+        self.assertEqual(mask.bbox, [0, 5, 40, 100])
+        self.assertEqual(mask.area, 40 * 95)
+
+    def test_empty_mask(self):
+        """Test that an all-zero mask stays empty"""
+        mask = CompactMask.from_full(np.zeros((20, 20), dtype=np.uint8))
+        self.assertEqual(mask.area, 0)
+        self.assertEqual(np.asarray(mask).sum(), 0)
+        np.testing.assert_array_equal(CompactMask.from_rle(mask.to_rle()).to_full(), mask.to_full())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import sys
+import os
+import json
+import tempfile
+import tracemalloc
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.pipeline.metrics import LatencyHistogram, PipelineMetrics, NullMetrics, MetricsReporter
+from src.pipeline.engine import Pipeline, Stage
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Unit tests for the streaming latency histogram"""
+
+    def test_quantiles_are_close(self):
+        """Test that bucketed percentiles stay within the bucket resolution"""
+        values = np.random.default_rng(0).lognormal(1.0, 1.0, 5000)
+        histogram = LatencyHistogram()
+        for v in values:
+            histogram.observe(v)
+        for q in (0.5, 0.95, 0.99):
+            exact = np.quantile(values, q)
+            self.assertLessEqual(abs(histogram.quantile(q) - exact) / exact, 0.13)
+        self.assertEqual(histogram.count, 5000)
+
+    def test_empty_histogram(self):
+        """Test that an empty histogram reports zero"""
+        self.assertEqual(LatencyHistogram().quantile(0.5), 0.0)
+
+
+class TestPipelineMetrics(unittest.TestCase):
+    """Unit tests for pipeline instrumentation"""
+
+    def test_pipeline_records_stages(self):
+        """Test that the engine times every stage and counts frames"""
+        metrics = PipelineMetrics()
+        stages = [Stage("double", lambda ctx: ctx), Stage("noop", lambda ctx: ctx)]
+        Pipeline(stages, metrics=metrics).run(range(20), lambda ctx: None)
+
+        snap = metrics.snapshot()
+        for name in ("decode", "double", "noop", "sink"):
+            self.assertEqual(snap["stages"][name]["count"], 20)
+        self.assertEqual(snap["counters"]["frames_processed"], 20)
+        self.assertIn("double", snap["queue_depth"])
+        self.assertGreater(snap["throughput_fps"], 0)
+
+    def test_prometheus_export(self):
+        """Test the Prometheus text format"""
+        metrics = PipelineMetrics()
+        metrics.observe("detect", 2.0)
+        metrics.inc("frames_dropped", 3)
+        metrics.set_queue_depth("detect", 4)
+        text = metrics.to_prometheus()
+        self.assertIn('pipeline_stage_latency_ms_count{stage="detect"} 1', text)
+        self.assertIn('pipeline_queue_depth{queue="detect"} 4', text)
+        self.assertIn("pipeline_frames_dropped_total 3", text)
+        self.assertIn("pipeline_rss_bytes ", text)
+        self.assertNotIn("pipeline_stage_rss", text)
+
+    def test_jsonl_reporter(self):
+        """Test that the reporter appends a final JSON snapshot on stop"""
+        metrics = PipelineMetrics(trace_allocations=True)
+        with metrics.time("alloc"):
+            buffers = [bytearray(1024) for _ in range(100)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "metrics.jsonl")
+            MetricsReporter(metrics, path, fmt="jsonl", interval=60).start().stop()
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(len(lines), 1)
+        self.assertGreater(lines[0]["stages"]["alloc"]["alloc_delta_bytes"], 100 * 1024)
+        del buffers
+        tracemalloc.stop()
+
+    def test_null_metrics(self):
+        """Test that disabled metrics accept every call"""
+        metrics = NullMetrics()
+        with metrics.time("x"):
+            pass
+        metrics.observe("x", 1.0)
+        metrics.inc("frames_dropped")
+        metrics.set_queue_depth("x", 1)
+        self.assertFalse(metrics.enabled)
+
+    def test_unknown_format(self):
+        """Test that unsupported export formats are rejected"""
+        with self.assertRaises(ValueError):
+            PipelineMetrics().export("unused", fmt="xml")
+
+
+if __name__ == '__main__':
+    unittest.main()
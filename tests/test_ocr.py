@@ -0,0 +1,147 @@
+import sys
+import os
+import time
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.ocr.reader import SceneTextReader
+from src.ocr.service import OCRService, TextVoteStore
+
+
+class FixedReader:
+    """Reader stub returning a fixed text and recording batch sizes"""
+
+    def __init__(self, text="23"):
+        self.text = text
+        self.batch_sizes = []
+
+    def read_batch(self, crops):
+        self.batch_sizes.append(len(crops))
+        return [self.text] * len(crops)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestSceneTextReader(unittest.TestCase):
+    """Unit tests for SceneTextReader"""
+
+    def test_read_batch_returns_one_text_per_crop(self):
+        """Test that batched reading keeps one result per crop"""
+        reader = SceneTextReader()
+        crops = [np.zeros((40, 20, 3), dtype=np.uint8) for _ in range(5)]
+        texts = reader.read_batch(crops)
+        self.assertEqual(len(texts), 5)
+        self.assertTrue(all(isinstance(t, str) for t in texts))
+        self.assertEqual(reader.read_batch([]), [])
+
+
+class TestTextVoteStore(unittest.TestCase):
+    """Unit tests for per-track OCR voting"""
+
+    def test_majority_becomes_stable(self):
+        """Test that repeated agreeing readings settle the track"""
+        votes = TextVoteStore(min_votes=2, min_agreement=0.6)
+        votes.add(1, "23")
+        votes.add(1, "")
+        self.assertFalse(votes.is_stable(1))
+        votes.add(1, "23")
+        self.assertTrue(votes.is_stable(1))
+        self.assertEqual(votes.best(1), ("23", 1.0))
+
+    def test_disagreement_is_not_stable(self):
+        """Test that conflicting readings do not settle the track"""
+        votes = TextVoteStore(min_votes=2, min_agreement=0.6)
+        for text in ["23", "28", "23", "28"]:
+            votes.add(1, text)
+        self.assertFalse(votes.is_stable(1))
+
+    def test_exhausted_after_max_attempts(self):
+        """Test that empty readings still count as attempts"""
+        votes = TextVoteStore(max_attempts=2)
+        votes.add(1, "")
+        votes.add(1, "")
+        self.assertTrue(votes.is_exhausted(1))
+        self.assertEqual(votes.best(1), (None, 0.0))
+
+
+class TestOCRService(unittest.TestCase):
+    """Unit tests for the asynchronous OCR service"""
+
+    def test_crops_are_batched_and_attached(self):
+        """Test that crops from one frame are read in one call and annotated later"""
+        reader = FixedReader()
+        service = OCRService(reader, max_wait_ms=200, votes=TextVoteStore(min_votes=1))
+        crop = np.zeros((40, 20, 3), dtype=np.uint8)
+        for track_id in range(4):
+            self.assertTrue(service.submit(track_id, crop, 0))
+        self.assertTrue(wait_until(lambda: service.queries == 4))
+        service.close()
+
+        self.assertEqual(reader.batch_sizes, [4])
+        tracks = [{'id': i} for i in range(4)]
+        service.annotate(tracks, 1)
+        self.assertTrue(all(t['ocr_text'] == "23" for t in tracks))
+
+    def test_stable_tracks_are_not_requeried(self):
+        """Test that a settled reading stops further queries"""
+        service = OCRService(FixedReader(), max_wait_ms=1, retry_interval=1, votes=TextVoteStore(min_votes=2))
+        crop = np.zeros((40, 20, 3), dtype=np.uint8)
+        frame_idx = 0
+        while service.queries < 2 and frame_idx < 500:
+            service.submit(7, crop, frame_idx)
+            frame_idx += 1
+            time.sleep(0.005)
+        service.close()
+
+        self.assertTrue(service.votes.is_stable(7))
+        self.assertFalse(service.should_query(7, frame_idx + 100))
+
+    def test_retry_interval_and_pending(self):
+        """Test that a track is not re-submitted while in flight or too soon"""
+        service = OCRService(FixedReader(text=""), max_wait_ms=1, retry_interval=10)
+        crop = np.zeros((40, 20, 3), dtype=np.uint8)
+        self.assertTrue(service.submit(1, crop, 0))
+        self.assertFalse(service.submit(1, crop, 1))
+        self.assertTrue(wait_until(lambda: service.queries == 1))
+        self.assertFalse(service.should_query(1, 5))
+        self.assertTrue(service.should_query(1, 10))
+        service.close()
+
+    def test_lost_tracks_are_forgotten(self):
+        """Test that votes of tracks gone for ttl_frames are dropped"""
+        service = OCRService(FixedReader(), max_wait_ms=1, ttl_frames=5)
+        service.submit(1, np.zeros((4, 4, 3), dtype=np.uint8), 0)
+        self.assertTrue(wait_until(lambda: service.queries == 1))
+        service.annotate([{'id': 1}], 0)
+        service.annotate([], 10)
+        service.close()
+        self.assertEqual(service.votes.best(1), (None, 0.0))
+
+    def test_short_batch_counts_missing_readings(self):
+        """Test that crops without a reading are counted as empty and leave the pending set"""
+        class ShortReader:
+            def read_batch(self, crops):
+                return ["7"]
+
+        service = OCRService(ShortReader(), max_wait_ms=200, retry_interval=1)
+        crop = np.zeros((40, 20, 3), dtype=np.uint8)
+        for track_id in range(3):
+            self.assertTrue(service.submit(track_id, crop, 0))
+        self.assertTrue(wait_until(lambda: service.queries == 3))
+        service.close()
+
+        self.assertEqual(service.votes.best(0), ("7", 1.0))
+        for track_id in (1, 2):
+            self.assertEqual(service.votes.attempts[track_id], 1)
+            self.assertTrue(service.should_query(track_id, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+import sys
+import os
+import time
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.pipeline.engine import Pipeline, Stage
+from src.pipeline.metrics import PipelineMetrics
+from src.pipeline.video_io import LiveSource
+
+
+class TestPipeline(unittest.TestCase):
+    """Unit tests for the threaded Pipeline engine"""
+
+    def test_frames_reach_sink_in_order(self):
+        """Test that a multi-worker stage does not reorder frames"""
+        def jitter(ctx):
+            time.sleep(np.random.rand() * 0.005)
+            ctx["value"] = ctx["frame"] * 2
+            return ctx
+
+        pipeline = Pipeline([Stage("jitter", jitter, workers=4)], queue_size=2)
+        seen = []
+        processed = pipeline.run(range(50), lambda ctx: seen.append((ctx["frame_idx"], ctx["value"])))
+
+        self.assertEqual(processed, 50)
+        self.assertEqual(seen, [(i, i * 2) for i in range(50)])
+
+    def test_stages_run_in_sequence(self):
+        """Test that each stage sees the output of the previous one"""
+        def first(ctx):
+            ctx["trace"] = ["first"]
+            return ctx
+
+        def second(ctx):
+            ctx["trace"].append("second")
+            return ctx
+
+        seen = []
+        Pipeline([Stage("first", first), Stage("second", second)]).run(range(3), seen.append)
+        self.assertEqual([ctx["trace"] for ctx in seen], [["first", "second"]] * 3)
+
+    def test_empty_source(self):
+        """Test that an empty source finishes without calling the sink"""
+        seen = []
+        processed = Pipeline([Stage("noop", lambda ctx: ctx)]).run([], seen.append)
+        self.assertEqual(processed, 0)
+        self.assertEqual(seen, [])
+
+    def test_stage_error_is_raised(self):
+        """Test that a failing stage stops the pipeline and re-raises"""
+        def boom(ctx):
+            if ctx["frame_idx"] == 3:
+                raise RuntimeError("boom")
+            return ctx
+
+        pipeline = Pipeline([Stage("boom", boom)], queue_size=1)
+        with self.assertRaises(RuntimeError):
+            pipeline.run(range(1000))
+
+    def test_source_error_is_raised(self):
+        """Test that a source failing to start iterating stops the pipeline and re-raises"""
+        class Broken:
+            def __iter__(self):
+                raise IOError("cannot open")
+
+        with self.assertRaises(IOError):
+            Pipeline([Stage("noop", lambda ctx: ctx)]).run(Broken())
+
+    def test_invalid_worker_count(self):
+        """Test that a stage needs at least one worker"""
+        with self.assertRaises(ValueError):
+            Stage("bad", lambda ctx: ctx, workers=0)
+
+    def test_dict_source_keeps_frame_idx(self):
+        """Test that sources may supply their own (gapped) frame indices"""
+        seen = []
+        source = [{"frame_idx": i * 3, "frame": i} for i in range(5)]
+        Pipeline([Stage("noop", lambda ctx: ctx)]).run(source, seen.append)
+        self.assertEqual([ctx["frame_idx"] for ctx in seen], [0, 3, 6, 9, 12])
+        self.assertEqual([ctx["seq"] for ctx in seen], list(range(5)))
+
+    def test_late_frames_skip_remaining_stages(self):
+        """Test that frames past the deadline never reach the sink"""
+        calls = []
+        metrics = PipelineMetrics()
+        source = [{"frame": i, "capture_ts": time.monotonic() - (1.0 if i % 2 else 0.0)} for i in range(6)]
+        seen = []
+        Pipeline([Stage("count", lambda ctx: calls.append(ctx["frame"]) or ctx)], metrics=metrics,
+                 deadline_ms=500).run(source, seen.append)
+
+        self.assertEqual(calls, [0, 2, 4])
+        self.assertEqual([ctx["frame"] for ctx in seen], [0, 2, 4])
+        self.assertEqual(metrics.counters["frames_late"], 3)
+        self.assertEqual(metrics.latency["end_to_end"].count, 3)
+
+
+class TestLiveSource(unittest.TestCase):
+    """Unit tests for the real-time frame source"""
+
+    def test_slow_consumer_gets_freshest_frames(self):
+        """Test that frames are dropped instead of queued when processing lags"""
+        metrics = PipelineMetrics()
+        source = LiveSource(range(20), fps=200, metrics=metrics)
+        seen = []
+        for item in source:
+            seen.append(item["frame_idx"])
+            time.sleep(0.02)
+
+        self.assertEqual(source.captured, 20)
+        self.assertLess(len(seen), 20)
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual(seen[-1], 19)
+        self.assertEqual(source.dropped, 20 - len(seen))
+        self.assertEqual(metrics.counters["frames_dropped"], source.dropped)
+        self.assertGreater(source.drop_rate, 0)
+
+    def test_fast_consumer_gets_every_frame(self):
+        """Test that nothing is dropped when the pipeline keeps up"""
+        source = LiveSource(range(10), fps=50)
+        seen = [item["frame"] for item in source]
+        self.assertEqual(seen, list(range(10)))
+        self.assertEqual(source.dropped, 0)
+
+    def test_read_error_fails_the_run(self):
+        """Test that a failing feed raises from the pipeline after its captured frames"""
+        def feed():
+            yield from range(3)
+            raise IOError("decode failed")
+
+        seen = []
+        with self.assertRaises(IOError):
+            Pipeline([Stage("noop", lambda ctx: ctx)]).run(LiveSource(feed(), fps=100), seen.append)
+        self.assertLessEqual(len(seen), 3)
+
+
+class TestKeyframeStages(unittest.TestCase):
+    """Integration test for keyframe detection in the default stages"""
+
+    def test_detector_runs_on_keyframes_only(self):
+        """Test that intermediate frames are tracked by propagation"""
+        from src.pipeline.stages import build_stages
+        from src.detection.detector import ObjectDetector
+        from src.detection.keyframes import KeyframeScheduler
+        from src.segmentation.segmenter import VideoSegmenter
+        from src.clustering.identifier import VisualIdentifier
+        from src.ocr.reader import SceneTextReader
+        from src.events.analyzer import EventAnalyzer
+        from src.visualization.drawer import PipelineVisualizer
+
+        detector = ObjectDetector()
+        calls = []
+        detect = detector.detect
+        detector.detect = lambda frame: calls.append(1) or detect(frame)
+
+        stages = build_stages(detector, VideoSegmenter(), VisualIdentifier(online_clustering=True),
+                              SceneTextReader(), EventAnalyzer(), PipelineVisualizer(),
+                              keyframes=KeyframeScheduler(interval=4))
+        frames = (np.zeros((720, 1280, 3), dtype=np.uint8) for _ in range(10))
+        seen = []
+        Pipeline(stages).run(frames, seen.append)
+
+        self.assertEqual(len(calls), 3)
+        self.assertEqual([ctx["keyframe"] for ctx in seen][:5], [True, False, False, False, True])
+        # The mock objects keep their ids on propagated frames
+        self.assertTrue(all(sorted(t['id'] for t in ctx["tracks"]) == [1, 2] for ctx in seen))
+
+    def test_headless_stages_skip_rendering(self):
+        """Test that no visualize stage is built without a visualizer"""
+        from src.pipeline.stages import build_stages
+        module = object()
+        stages = build_stages(module, module, module, module, module, None)
+        self.assertEqual([s.name for s in stages], ["detect", "track", "crops", "cluster", "ocr", "events"])
+
+    def test_stage_subsets(self):
+        """Test that modules passed as None drop their stages and dependencies are resolved"""
+        from src.pipeline.stages import build_stages, resolve_stages
+        from src.detection.detector import ObjectDetector
+        from src.segmentation.segmenter import VideoSegmenter
+        from src.clustering.identifier import VisualIdentifier
+
+        self.assertEqual(resolve_stages(["cluster"]), {"detect", "track", "cluster"})
+        self.assertEqual(resolve_stages([]), set())
+        with self.assertRaises(ValueError):
+            resolve_stages(["detect", "bogus"])
+
+        module = object()
+        self.assertEqual([s.name for s in build_stages(module, None, None, None, None, None)], ["detect"])
+        self.assertEqual([s.name for s in build_stages(module, module, None, None, module, None)],
+                         ["detect", "track", "events"])
+
+        # Clustering without OCR: the crops are released by the cluster stage
+        identifier = VisualIdentifier(online_clustering=True, lazy=True)
+        stages = build_stages(ObjectDetector(lazy=True), VideoSegmenter(lazy=True), identifier, None, None, None)
+        self.assertEqual([s.name for s in stages], ["detect", "track", "crops", "cluster"])
+        self.assertFalse(identifier.loaded)
+        frames = (np.zeros((72, 128, 3), dtype=np.uint8) for _ in range(5))
+        seen = []
+        Pipeline(stages).run(frames, seen.append)
+        self.assertEqual(len(seen), 5)
+        self.assertTrue(identifier.loaded)
+        self.assertTrue(all("events" not in ctx for ctx in seen))
+        self.assertTrue(all("crops" not in ctx for ctx in seen))
+        self.assertTrue(all("cluster_id" in t for ctx in seen for t in ctx["tracks"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
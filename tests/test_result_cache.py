@@ -0,0 +1,149 @@
+import sys
+import os
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.pipeline.engine import Pipeline, Stage
+from src.pipeline.stages import build_stages, build_graph
+from src.pipeline.synthetic import SyntheticScene, SyntheticDetector
+from src.pipeline.result_cache import StageResultCache, video_fingerprint, config_hash, module_config
+from src.segmentation.segmenter import VideoSegmenter
+from src.clustering.identifier import VisualIdentifier
+from src.events.analyzer import EventAnalyzer
+from src.ocr.reader import SceneTextReader
+
+
+class TestStageResultCache(unittest.TestCase):
+    """Unit tests for the persistent per-frame stage result cache"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.scene = SyntheticScene(12, width=320, height=180, num_frames=20, seed=2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_pipeline(self, cache=None, iou_threshold=0.3, detect_workers=1):
+        detector = SyntheticDetector(self.scene)
+        calls = []
+        detect = detector.detect
+        detector.detect = lambda frame: calls.append(1) or detect(frame)
+        segmenter = VideoSegmenter(iou_threshold=iou_threshold)
+        identifier = VisualIdentifier(online_clustering=True, warmup_samples=16)
+        configs = {"detect": module_config(detector), "track": module_config(segmenter),
+                   "cluster": module_config(identifier)}
+        stages = build_stages(detector, segmenter, identifier, None, EventAnalyzer(fps=5), None,
+                              detect_workers=detect_workers, result_cache=cache, cache_configs=configs)
+        source = (cache.replay_source() if cache else None) or self.scene
+        seen = []
+        Pipeline(stages).run(source, seen.append)
+        if cache:
+            cache.close()
+        return seen, calls, [s.name for s in stages]
+
+    def test_replay_matches_recorded_run(self):
+        """Test that a re-run replays tracks, clusters and embeddings without decoding frames"""
+        cache = StageResultCache(self.tmp.name, "video", chunk_frames=3)
+        first, calls, _ = self.run_pipeline(cache, detect_workers=3)
+        self.assertEqual(len(calls), 20)
+
+        cache = StageResultCache(self.tmp.name, "video")
+        second, calls, names = self.run_pipeline(cache)
+        self.assertEqual(calls, [])
+        self.assertEqual(cache.replayed, ["detect", "track", "cluster"])
+        self.assertNotIn("crops", names)
+        self.assertTrue(all(ctx["frame"] is None and ctx["frame_shape"] == [180, 320, 3] for ctx in second))
+
+        self.assertEqual([ctx["frame_idx"] for ctx in second], [ctx["frame_idx"] for ctx in first])
+        for a, b in zip(first, second):
+            self.assertEqual([(t["id"], t["bbox"], t.get("cluster_id")) for t in a["tracks"]],
+                             [(t["id"], t["bbox"], t.get("cluster_id")) for t in b["tracks"]])
+            np.testing.assert_allclose(np.asarray(a["embeddings"]).reshape(len(a["tracks"]), -1),
+                                       b["embeddings"].reshape(len(b["tracks"]), -1), rtol=1e-6)
+            self.assertEqual(a["events"], b["events"])
+
+    def test_config_change_invalidates_downstream(self):
+        """Test that changing the tracker recomputes tracking and clustering but replays detection"""
+        self.run_pipeline(StageResultCache(self.tmp.name, "video"))
+        cache = StageResultCache(self.tmp.name, "video")
+        _, calls, names = self.run_pipeline(cache, iou_threshold=0.5)
+        self.assertEqual(cache.replayed, ["detect"])
+        self.assertEqual(calls, [])
+        self.assertIn("crops", names)
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp.name, "video"))), 5)
+
+    def run_ocr(self, graph=None):
+        cache = StageResultCache(self.tmp.name, "video")
+        stages = build_stages(SyntheticDetector(self.scene), VideoSegmenter(), None, SceneTextReader(), None, None,
+                              ocr_interval=5, graph=graph, result_cache=cache)
+        owner = build_graph(stages, graph) if graph is not None else None
+        seen = []
+        try:
+            Pipeline(owner.to_stages() if owner else stages).run(self.scene, seen.append)
+        finally:
+            if owner:
+                owner.close()
+        cache.close()
+        return cache, [[t.get("ocr_text") for t in ctx["tracks"]] for ctx in seen]
+
+    def test_graph_rates_are_part_of_the_key(self):
+        """Test that OCR recorded at a graph rate is not replayed by a run without the graph"""
+        graph = {"stages": {"detect": {}, "track": {"depends_on": ["detect"]}, "crops": {"depends_on": ["track"]},
+                            "ocr": {"depends_on": ["crops"], "rate": {"every": 3}}}}
+        cache, first = self.run_ocr(graph)
+        self.assertEqual(cache.replayed, [])
+        cache, again = self.run_ocr(graph)
+        self.assertEqual(cache.replayed, ["detect", "track", "ocr"])
+        self.assertEqual(again, first)
+
+        cache, linear = self.run_ocr()
+        self.assertEqual(cache.replayed, ["detect", "track"])
+        self.assertTrue(any(text for frame in linear[5::5] for text in frame))
+
+    def test_skipped_frames_replay_unchanged(self):
+        """Test that frames a rate skipped while recording replay as no-ops"""
+        stage = Stage("detect", lambda ctx: dict(ctx, detections=[{"bbox": [0, 0, 4, 4], "label": "x"}]))
+        graph = {"stages": {"detect": {"rate": {"every": 2}}}}
+        frames = [np.zeros((4, 4, 3), np.uint8)] * 4
+
+        cache = StageResultCache(self.tmp.name, "video")
+        owner = build_graph(cache.wrap([stage], {"detect": "every 2"}), graph)
+        Pipeline(owner.to_stages()).run(frames, lambda ctx: None)
+        owner.close()
+        cache.close()
+
+        cache = StageResultCache(self.tmp.name, "video")
+        seen = []
+        Pipeline(cache.wrap([stage], {"detect": "every 2"})).run(frames, seen.append)
+        self.assertEqual(cache.replayed, ["detect"])
+        self.assertEqual([len(ctx["detections"]) if "detections" in ctx else None for ctx in seen], [1, None, 1, None])
+
+    def test_abort_discards_recording(self):
+        """Test that an aborted run leaves no cache entries behind"""
+        cache = StageResultCache(self.tmp.name, "video")
+        build_stages(SyntheticDetector(self.scene), None, None, None, None, None, result_cache=cache)
+        cache.abort()
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, "video")), [])
+
+    def test_keys(self):
+        """Test the video fingerprint and config hashes"""
+        path = os.path.join(self.tmp.name, "clip.bin")
+        with open(path, "wb") as f:
+            f.write(bytes(range(256)) * 1000)
+        key = video_fingerprint(path, chunk_bytes=4096)
+        self.assertEqual(key, video_fingerprint(path))
+        with open(path, "r+b") as f:
+            f.seek(123457)
+            f.write(b"\xff")
+        self.assertNotEqual(key, video_fingerprint(path, chunk_bytes=4096))
+
+        self.assertEqual(config_hash({"a": 1, "b": 2}), config_hash({"b": 2, "a": 1}))
+        self.assertNotEqual(config_hash({"a": 1}), config_hash({"a": 2}))
+        self.assertEqual(module_config(VideoSegmenter(iou_threshold=0.4))["VideoSegmenter"]["iou_threshold"], 0.4)
+
+
+if __name__ == '__main__':
+    unittest.main()
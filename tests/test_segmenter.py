@@ -56,11 +56,58 @@ class TestVideoSegmenter(unittest.TestCase):
             self.assertEqual(mask.shape, (720, 1280))
             self.assertEqual(mask.dtype, np.uint8)
             
+    def test_ids_persist_across_frames(self):
+        """Test that detections overlapping an existing track keep its id"""
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+        first = self.segmenter.track_objects(0, frame, [
+            {'bbox': [100, 100, 200, 200], 'class_id': 0, 'label': 'person'},
+            {'bbox': [500, 100, 600, 200], 'class_id': 0, 'label': 'person'}
+        ])
+        # Same objects, listed in the opposite order and moved slightly, plus a new one
+        second = self.segmenter.track_objects(1, frame, [
+            {'bbox': [900, 300, 950, 400], 'class_id': 0, 'label': 'person'},
+            {'bbox': [505, 100, 605, 200], 'class_id': 0, 'label': 'person'},
+            {'bbox': [105, 100, 205, 200], 'class_id': 0, 'label': 'person'}
+        ])
+        self.assertEqual([t['id'] for t in first], [1, 2])
+        self.assertEqual([t['id'] for t in second], [3, 2, 1])
+
+    def test_propagate_follows_velocity(self):
+        """Test that propagation extrapolates boxes and decays confidence"""
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+        det = {'class_id': 0, 'label': 'person', 'score': 0.9}
+        self.segmenter.track_objects(0, frame, [dict(det, bbox=[100, 100, 200, 200])])
+        self.segmenter.track_objects(5, frame, [dict(det, bbox=[110, 100, 210, 200])])
+
+        tracks = self.segmenter.propagate(10, frame)
+        self.assertEqual(len(tracks), 1)
+        self.assertEqual(tracks[0]['id'], 1)
+        self.assertEqual(tracks[0]['bbox'], [120, 100, 220, 200])
+        self.assertEqual(tracks[0]['mask'].shape, (720, 1280))
+        self.assertAlmostEqual(tracks[0]['confidence'], 0.9 * 0.95 ** 5)
+        self.assertAlmostEqual(self.segmenter.min_confidence, 0.9 * 0.95 ** 5)
+
+    def test_unmatched_tracks_are_dropped(self):
+        """Test that tracks missing from several keyframes are forgotten"""
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+        self.segmenter.track_objects(0, frame, [{'bbox': [100, 100, 200, 200], 'class_id': 0, 'label': 'person'}])
+        self.segmenter.track_objects(1, frame, [])
+        # Not propagated while missed, but still re-identified on return
+        self.assertEqual(self.segmenter.propagate(2, frame), [])
+        tracks = self.segmenter.track_objects(3, frame, [{'bbox': [100, 100, 200, 200], 'class_id': 0, 'label': 'person'}])
+        self.assertEqual(tracks[0]['id'], 1)
+
+        for i in range(4, 4 + self.segmenter.max_missed + 1):
+            self.segmenter.track_objects(i, frame, [])
+        tracks = self.segmenter.track_objects(10, frame, [{'bbox': [100, 100, 200, 200], 'class_id': 0, 'label': 'person'}])
+        self.assertEqual(tracks[0]['id'], 2)
+
     def test_reset(self):
         """Test that reset clears state"""
         self.segmenter.inference_state = {"test": "data"}
         self.segmenter.reset()
         self.assertIsNone(self.segmenter.inference_state)
+        self.assertEqual(self.segmenter.propagate(0, np.zeros((10, 10, 3), dtype=np.uint8)), [])
 
 
 if __name__ == '__main__':
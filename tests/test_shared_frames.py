@@ -0,0 +1,132 @@
+import sys
+import os
+import tempfile
+import unittest
+import multiprocessing
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.pipeline.engine import Pipeline, Stage
+from src.pipeline.shared_frames import SharedFrameRing, SharedFrameSource
+
+
+def _consume(ring, slots, results):
+    """Child process: sums each frame in place and releases its slot"""
+    while True:
+        slot = slots.get()
+        if slot is None:
+            break
+        frame = ring.view(slot)
+        results.put((int(ring.frame_idx[slot]), int(frame.sum())))
+        ring.release(slot)
+    ring.close()
+
+
+class TestSharedFrameRing(unittest.TestCase):
+    """Unit tests for the shared-memory frame ring"""
+
+    def setUp(self):
+        self.ring = SharedFrameRing(3, (4, 5, 3), consumers=2)
+
+    def tearDown(self):
+        self.ring.close()
+
+    def test_view_is_zero_copy(self):
+        """Test that a view shares memory with the slot"""
+        slot = self.ring.write(np.full((4, 5, 3), 7, dtype=np.uint8), frame_idx=12)
+        view = self.ring.view(slot)
+        self.assertTrue(np.shares_memory(view, self.ring.frames))
+        self.assertEqual(int(view.sum()), 7 * 60)
+        self.assertEqual(self.ring.frame_idx[slot], 12)
+
+    def test_slot_recycled_after_all_consumers(self):
+        """Test that a slot stays busy until every consumer released it"""
+        frame = np.zeros((4, 5, 3), dtype=np.uint8)
+        slots = [self.ring.write(frame, i) for i in range(3)]
+        self.assertEqual(self.ring.free_slots, 0)
+        with self.assertRaises(TimeoutError):
+            self.ring.acquire(timeout=0.01)
+
+        self.ring.release(slots[0])
+        self.assertEqual(self.ring.free_slots, 0)
+        self.ring.release(slots[0])
+        self.assertEqual(self.ring.free_slots, 1)
+        self.assertEqual(self.ring.write(frame, 3, timeout=0.01), slots[0])
+
+    def test_retain_and_over_release(self):
+        """Test extra references and release bookkeeping"""
+        slot = self.ring.write(np.zeros((4, 5, 3), dtype=np.uint8), refs=1)
+        self.ring.retain(slot)
+        self.ring.release(slot)
+        self.ring.release(slot)
+        with self.assertRaises(ValueError):
+            self.ring.release(slot)
+
+    def test_cross_process_handoff(self):
+        """Test that a spawned process reads frames written by the parent"""
+        ctx = multiprocessing.get_context("spawn")
+        ring = SharedFrameRing(2, (32, 32, 3), consumers=1, ctx=ctx)
+        slots, results = ctx.Queue(), ctx.Queue()
+        worker = ctx.Process(target=_consume, args=(ring, slots, results))
+        worker.start()
+        try:
+            # More frames than slots: the writer has to wait for the child's releases
+            for i in range(6):
+                slots.put(ring.write(np.full((32, 32, 3), i, dtype=np.uint8), frame_idx=i, timeout=10))
+            slots.put(None)
+            received = [results.get(timeout=10) for _ in range(6)]
+            worker.join(timeout=10)
+        finally:
+            if worker.is_alive():
+                worker.terminate()
+            ring.close()
+
+        self.assertEqual(received, [(i, i * 32 * 32 * 3) for i in range(6)])
+        self.assertEqual(worker.exitcode, 0)
+
+
+
+class TestSharedFrameSource(unittest.TestCase):
+    """Integration tests for the decode process feeding the pipeline"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "clip.avi")
+        writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+        for i in range(12):
+            writer.write(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+        writer.release()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pipeline_reads_frames_in_place(self):
+        """Test that every frame arrives in order through fewer slots than frames"""
+        source = SharedFrameSource(self.path, num_slots=3)
+        means = []
+
+        def sink(ctx):
+            means.append((ctx["frame_idx"], int(round(ctx["mean"]))))
+            source.release(ctx)
+        try:
+            stage = Stage("mean", lambda ctx: dict(ctx, mean=float(ctx["frame"].mean())))
+            processed = Pipeline([stage], queue_size=1).run(source, sink)
+            self.assertEqual(source.ring.free_slots, 3)
+        finally:
+            source.close()
+
+        self.assertEqual(processed, 12)
+        self.assertEqual([i for i, _ in means], list(range(12)))
+        for i, mean in means:
+            self.assertAlmostEqual(mean, i * 20, delta=3)
+
+    def test_unreadable_video_is_rejected(self):
+        """Test that the frame shape is probed before any shared memory is allocated"""
+        with self.assertRaises(IOError):
+            SharedFrameSource(os.path.join(self.tmp.name, "missing.avi"))
+
+
+if __name__ == '__main__':
+    unittest.main()
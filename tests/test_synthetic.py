@@ -0,0 +1,110 @@
+import sys
+import os
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.pipeline.synthetic import SyntheticScene, SyntheticDetector
+from src.pipeline.engine import Pipeline, Stage
+
+
+class TestSyntheticScene(unittest.TestCase):
+    """Unit tests for the seeded synthetic scene generator"""
+
+    def test_deterministic(self):
+        """Test that the same seed gives identical frames and ground truth"""
+        a = SyntheticScene(30, width=320, height=180, num_frames=10, seed=7)
+        b = SyntheticScene(30, width=320, height=180, num_frames=10, seed=7)
+        c = SyntheticScene(30, width=320, height=180, num_frames=10, seed=8)
+        for x, y in zip(a, b):
+            np.testing.assert_array_equal(x["frame"], y["frame"])
+            self.assertEqual(x["ground_truth"], y["ground_truth"])
+        self.assertNotEqual(a.ground_truth(5), c.ground_truth(5))
+
+    def test_object_count_bounds(self):
+        """Test that 1 to 1000 objects are supported and other counts rejected"""
+        for k in (1, 1000):
+            scene = SyntheticScene(k, width=640, height=360, num_frames=5, churn=0.0)
+            self.assertEqual(len(scene.ground_truth(0)), k)
+        with self.assertRaises(ValueError):
+            SyntheticScene(0)
+        with self.assertRaises(ValueError):
+            SyntheticScene(1001)
+
+    def test_boxes_stay_in_frame(self):
+        """Test that trajectories bounce inside the frame"""
+        scene = SyntheticScene(50, width=320, height=180, num_frames=200, churn=0.0)
+        for frame_idx in range(0, 200, 10):
+            boxes, present = scene.boxes(frame_idx)
+            self.assertTrue(present.all())
+            self.assertTrue((boxes[:, :2] >= 0).all())
+            self.assertTrue((boxes[:, 2] <= 320 + 1e-6).all() and (boxes[:, 3] <= 180 + 1e-6).all())
+
+    def test_entries_and_exits(self):
+        """Test that churning objects enter late and leave before the end"""
+        scene = SyntheticScene(40, width=320, height=180, num_frames=200, churn=1.0, seed=1)
+        ids = [{t["id"] for t in scene.ground_truth(f)} for f in range(200)]
+        all_ids = set().union(*ids)
+        self.assertLess(len(ids[0]), len(all_ids))
+        entered = [i for i in all_ids if i not in ids[0]]
+        exited = [i for i in all_ids if any(i in s for s in ids) and i not in ids[-1]]
+        self.assertTrue(entered)
+        self.assertTrue(exited)
+
+    def test_occlusion(self):
+        """Test that occluders and nearer objects reduce visibility"""
+        scene = SyntheticScene(200, width=320, height=180, num_frames=1, num_occluders=5)
+        visible = [t["visible"] for t in scene.ground_truth(0)]
+        self.assertTrue(all(0.0 <= v <= 1.0 for v in visible))
+        self.assertLess(min(visible), 0.5)
+        self.assertEqual(max(visible), 1.0)
+
+    def test_reused_buffer_and_timecode(self):
+        """Test that a reused render buffer carries each frame's timecode"""
+        scene = SyntheticScene(5, width=160, height=90, num_frames=300)
+        buffers = set()
+        for item in scene.frames(reuse_buffer=True):
+            buffers.add(id(item["frame"]))
+            self.assertEqual(SyntheticScene.read_timecode(item["frame"]), item["frame_idx"])
+        self.assertEqual(len(buffers), 1)
+
+
+class TestSyntheticDetector(unittest.TestCase):
+    """Unit tests for the ground-truth mock detector"""
+
+    def setUp(self):
+        self.scene = SyntheticScene(60, width=320, height=180, num_frames=20, seed=3)
+
+    def test_returns_visible_ground_truth(self):
+        """Test that detections are the ground-truth boxes of sufficiently visible objects"""
+        detector = SyntheticDetector(self.scene, min_visible=0.3)
+        frame = self.scene.render(4)
+        detections = detector.detect(frame)
+        expected = [t["bbox"] for t in self.scene.ground_truth(4) if t["visible"] >= 0.3]
+        self.assertEqual([d["bbox"] for d in detections], expected)
+        self.assertTrue(all(d["class_id"] == 0 and 0.5 <= d["score"] <= 1.0 for d in detections))
+
+    def test_batch_matches_single(self):
+        """Test that batched detection reads each frame's index"""
+        detector = SyntheticDetector(self.scene, box_noise=2.0, miss_rate=0.2, seed=1)
+        frames = [self.scene.render(i) for i in range(5)]
+        self.assertEqual(detector.detect_batch(frames), [detector.detect(f) for f in frames])
+        self.assertEqual(detector.detect_batch([]), [])
+
+    def test_pipeline_source(self):
+        """Test that the scene feeds the pipeline with its frame indices and ground truth"""
+        detector = SyntheticDetector(self.scene)
+        stages = [Stage("detect", lambda ctx: {**ctx, "detections": detector.detect(ctx["frame"])})]
+        results = []
+        processed = Pipeline(stages).run(self.scene, results.append)
+
+        self.assertEqual(processed, 20)
+        self.assertEqual([ctx["frame_idx"] for ctx in results], list(range(20)))
+        for ctx in results:
+            visible = [t["bbox"] for t in ctx["ground_truth"] if t["visible"] >= detector.min_visible]
+            self.assertEqual([d["bbox"] for d in ctx["detections"]], visible)
+
+
+if __name__ == '__main__':
+    unittest.main()
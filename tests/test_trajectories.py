@@ -0,0 +1,135 @@
+import sys
+import os
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.export.trajectories import TrajectoryWriter, TrajectoryReader
+from src.events.zones import ZoneEngine
+from src.pipeline.synthetic import SyntheticScene
+
+
+class TestTrajectoryStore(unittest.TestCase):
+    """Unit tests for the memory-mapped trajectory store"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_scene(self, frames=120, flush_rows=500, **kwargs):
+        scene = SyntheticScene(30, num_frames=frames, seed=3)
+        writer = TrajectoryWriter(self.path, flush_rows=flush_rows, **kwargs)
+        for f in range(frames):
+            tracks = [{'id': g['id'], 'bbox': g['bbox'], 'cluster_id': g['team']} for g in scene.ground_truth(f)]
+            if f % 10 == 0 and tracks:
+                tracks[0]['ocr_text'] = f"#{f % 30}"
+                tracks[-1]['map_xy'] = (1.5, 2.5)
+            writer(ctx={"frame_idx": f, "tracks": tracks})
+        writer.close()
+        return writer
+
+    def test_round_trip(self):
+        """Test that columns, OCR texts and missing map coordinates survive a round trip"""
+        writer = self.write_scene()
+        store = TrajectoryReader(self.path)
+        self.assertEqual(len(store), len(writer))
+        self.assertIsInstance(store.frame, np.memmap)
+        self.assertTrue(np.all(np.diff(store.frame) >= 0))
+        self.assertEqual(len(store.blocks), -(-len(store) // 500))
+
+        columns = store.columns(store.select(start=10, end=10))
+        self.assertTrue(np.all(columns["frame"] == 10))
+        self.assertEqual(columns["ocr_text"][0], "#10")
+        self.assertTrue(np.all(columns["ocr_text"][1:] == ""))
+        np.testing.assert_array_equal(columns["map_xy"][-1], [1.5, 2.5])
+        self.assertTrue(np.isnan(columns["map_xy"][0]).all())
+        self.assertEqual(store.ocr_texts, ["#0", "#10", "#20"])
+
+    def test_queries_match_brute_force(self):
+        """Test frame range, region and zone queries against a full scan"""
+        self.write_scene(cell_size=50.0)
+        store = TrajectoryReader(self.path)
+        centers = (store.bbox[:, :2].astype(np.int64) + store.bbox[:, 2:]) // 2
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            start, end = sorted(rng.integers(-10, 130, size=2))
+            x1, x2 = sorted(rng.integers(0, 1280, size=2))
+            y1, y2 = sorted(rng.integers(0, 720, size=2))
+            in_time = (store.frame >= start) & (store.frame <= end)
+            in_region = (centers[:, 0] >= x1) & (centers[:, 0] <= x2) & (centers[:, 1] >= y1) & (centers[:, 1] <= y2)
+            np.testing.assert_array_equal(store.select(start, end), np.flatnonzero(in_time))
+            np.testing.assert_array_equal(store.select(start, end, region=(x1, y1, x2, y2)),
+                                          np.flatnonzero(in_time & in_region))
+
+            zone = [[x1, y1], [x2, y1 + (y2 - y1) // 3], [(x1 + x2) // 2, y2]]
+            engine = ZoneEngine()
+            engine.add_zone("z", zone)
+            in_zone = engine.contains(centers)[:, 0]
+            np.testing.assert_array_equal(store.select(start, end, zone=zone), np.flatnonzero(in_time & in_zone))
+
+        self.assertEqual(len(store.select(region=(5000, 5000, 6000, 6000))), 0)
+        ids = np.unique(store.query(0, 50, region=(0, 0, 640, 720))["id"])
+        self.assertGreater(len(ids), 0)
+
+    def test_append_after_interrupted_flush(self):
+        """Test that reopening drops uncommitted bytes and keeps appending"""
+        writer = TrajectoryWriter(self.path)
+        writer.append(0, [{'id': 1, 'bbox': [0, 0, 10, 10], 'ocr_text': "A"}])
+        writer.close()
+        # Simulate a crash between writing the column files and committing the metadata
+        with open(os.path.join(self.path, "id.bin"), "ab") as f:
+            f.write(b"\x07" * 24)
+        with open(os.path.join(self.path, "ocr_text.jsonl"), "a") as f:
+            f.write('"lost"\n')
+
+        writer = TrajectoryWriter(self.path)
+        writer.append(5, [{'id': 2, 'bbox': [100, 100, 120, 120], 'ocr_text': "B"}])
+        with self.assertRaises(ValueError):
+            writer.append(4, [])
+        writer.close()
+
+        store = TrajectoryReader(self.path)
+        columns = store.columns()
+        np.testing.assert_array_equal(columns["id"], [1, 2])
+        np.testing.assert_array_equal(columns["frame"], [0, 5])
+        self.assertEqual(list(columns["ocr_text"]), ["A", "B"])
+        np.testing.assert_array_equal(store.select(region=(100, 100, 200, 200)), [1])
+
+    def test_runs_share_a_store(self):
+        """Test that a second run restarting at frame 0 is appended and queried per run"""
+        first = len(self.write_scene(frames=60, run_name="a.mp4"))
+        second = len(self.write_scene(frames=40, run_name="b.mp4")) - first
+        store = TrajectoryReader(self.path)
+        self.assertEqual([(r["name"], r["first_row"], r["rows"]) for r in store.runs],
+                         [("a.mp4", 0, first), ("b.mp4", first, second)])
+        np.testing.assert_array_equal(store.run, [0] * first + [1] * second)
+
+        self.assertEqual(store.frame_range(0), slice(0, first))
+        rows = store.frame_range(-1, 10, 20)
+        self.assertEqual(set(store.run[rows]), {1})
+        self.assertTrue(np.all((store.frame[rows] >= 10) & (store.frame[rows] <= 20)))
+
+        region = (0, 0, 640, 360)
+        centers = (store.bbox[:, :2].astype(np.int64) + store.bbox[:, 2:]) // 2
+        in_region = (centers[:, 0] <= 640) & (centers[:, 1] <= 360)
+        in_time = (store.frame >= 10) & (store.frame <= 50)
+        np.testing.assert_array_equal(store.select(10, 50, region=region), np.flatnonzero(in_time & in_region))
+        np.testing.assert_array_equal(store.select(10, 50, region=region, run=0),
+                                      np.flatnonzero(in_time & in_region & (store.run == 0)))
+
+    def test_empty_store(self):
+        """Test queries on a store without rows"""
+        TrajectoryWriter(self.path).close()
+        store = TrajectoryReader(self.path)
+        self.assertEqual(len(store), 0)
+        self.assertEqual(len(store.select(0, 10, region=(0, 0, 100, 100))), 0)
+        self.assertEqual(len(store.columns()["ocr_text"]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import sys
+import os
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.visualization.drawer import PipelineVisualizer
+from src.segmentation.masks import CompactMask
+
+
+def make_track(obj_id, bbox):
+    return {'id': obj_id, 'bbox': bbox, 'class_id': 0, 'label': 'person',
+            'mask': CompactMask.from_box(bbox, (360, 640))}
+
+
+class TestPipelineVisualizer(unittest.TestCase):
+    """Unit tests for PipelineVisualizer rendering"""
+
+    def setUp(self):
+        self.frame = np.zeros((360, 640, 3), dtype=np.uint8)
+        self.tracks = [make_track(1, [100, 100, 150, 200]), make_track(2, [400, 50, 450, 120])]
+
+    def test_copy_leaves_input_untouched(self):
+        """Test that the default mode draws on a copy"""
+        out = PipelineVisualizer().draw(self.frame, self.tracks, [])
+        self.assertIsNot(out, self.frame)
+        self.assertEqual(int(self.frame.sum()), 0)
+        self.assertGreater(int(out.sum()), 0)
+
+    def test_in_place_draws_on_input(self):
+        """Test that in-place mode annotates the given frame"""
+        out = PipelineVisualizer(in_place=True).draw(self.frame, self.tracks, [])
+        self.assertIs(out, self.frame)
+        self.assertGreater(int(self.frame.sum()), 0)
+
+    def test_only_annotated_region_changes(self):
+        """Test that pixels away from boxes, labels and masks are not touched"""
+        out = PipelineVisualizer().draw(self.frame, self.tracks[:1], [])
+        changed = np.argwhere(out.any(axis=2))
+        (y0, x0), (y1, x1) = changed.min(axis=0), changed.max(axis=0)
+        # Label sprite sits above the box; everything stays near the object
+        self.assertGreaterEqual(x0, 98)
+        self.assertLessEqual(y1, 202)
+        self.assertLess(y0, 100)
+        self.assertLess(x1, 300)
+
+    def test_text_sprites_are_cached(self):
+        """Test that repeated labels reuse their pre-rendered sprite"""
+        visualizer = PipelineVisualizer()
+        visualizer.draw(self.frame, self.tracks, [])
+        sprites = dict(visualizer._sprites)
+        visualizer.draw(self.frame, self.tracks, [])
+        self.assertEqual(len(visualizer._sprites), 2)
+        for key, sprite in visualizer._sprites.items():
+            self.assertIs(sprite, sprites[key])
+
+    def test_recent_events_overlay(self):
+        """Test that only recent events are shown, newest first and capped"""
+        visualizer = PipelineVisualizer(event_ttl_frames=10, max_events_shown=2)
+        events = [{'frame': f, 'type': 'ZONE_ENTER', 'details': f"at {f}"} for f in (0, 5, 8, 9)]
+        shown = visualizer._visible_events(events, frame_idx=12)
+        self.assertEqual([e['frame'] for e in shown], [9, 8])
+        self.assertEqual(visualizer._visible_events(events, frame_idx=30), [])
+        self.assertEqual(len(visualizer._visible_events(events)), 4)
+
+    def test_label_clipped_at_frame_edge(self):
+        """Test that labels near the border are clipped instead of failing"""
+        tracks = [make_track(1, [620, 0, 640, 30])]
+        out = PipelineVisualizer().draw(self.frame, tracks, [{'frame': 0, 'type': 'X', 'details': 'y' * 200}], 0)
+        self.assertEqual(out.shape, self.frame.shape)
+
+
+if __name__ == '__main__':
+    unittest.main()